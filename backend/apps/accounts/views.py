@@ -5,6 +5,7 @@ from django.contrib import messages
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from apps.orders.services import merge_cart_on_login
 from .models import User
 from .serializers import UserSerializer
 
@@ -35,6 +36,7 @@ def signup(request):
         try:
             user = User.objects.create_user(username=username, email=email, password=password)
             login(request, user)
+            merge_cart_on_login(request.session, user)
             messages.success(request, 'Account created successfully!')
             return redirect('product_list')
         except Exception as e:
@@ -57,6 +59,7 @@ def login_view(request):
         
         if user is not None:
             login(request, user)
+            merge_cart_on_login(request.session, user)
             messages.success(request, 'Logged in successfully!')
             next_url = request.GET.get('next')
             if next_url:
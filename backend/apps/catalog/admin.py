@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, Product, StockReservation
 
 
 @admin.register(Category)
@@ -15,3 +15,9 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
 
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'cart_key', 'quantity', 'expires_at']
+    list_filter = ['expires_at']
+    search_fields = ['cart_key', 'product__name']
@@ -0,0 +1,225 @@
+"""Versioned read-through cache for catalog data.
+
+Entries live under keys that embed a per-namespace version number. Saving or
+deleting a product or category bumps the version (see ``signals.py``), so
+stale entries are never read again and simply expire. Stock changes with
+every checkout, so it is not trusted from those entries: each product's
+level has its own short-lived key (``stock_levels``) that checkouts drop for
+just the products they sold. Every cache call is guarded: when the backend
+is unreachable callers fall through to the database.
+"""
+
+import hashlib
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_TIMEOUT = 300
+CATEGORY_TIMEOUT = 600
+# Upper bound on how stale a stock level can be if a drop races a reader.
+STOCK_TIMEOUT = 30
+
+STAT_NAMES = ('hits', 'misses', 'errors')
+
+_MISSING = object()
+
+
+def _version_key(namespace):
+    return f'catalog:version:{namespace}'
+
+
+def _stock_key(product_id):
+    return f'catalog:stock:{product_id}'
+
+
+def _stat_key(name):
+    return f'catalog:stats:{name}'
+
+
+def _record(name):
+    try:
+        cache.incr(_stat_key(name))
+    except ValueError:
+        cache.add(_stat_key(name), 1, timeout=None)
+    except Exception:
+        pass
+
+
+def get_version(namespace):
+    """Return the current version of ``namespace``, seeding it if absent.
+
+    Versions are seeded from the clock so that a version key lost to eviction
+    can never come back with a number that old entries were stored under.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every entry in ``namespace``."""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), time.time_ns() // 1000, timeout=None)
+    except Exception:
+        logger.warning('Could not bump catalog cache version for %s', namespace, exc_info=True)
+
+
+def make_key(namespace, version, key):
+    digest = hashlib.md5(key.encode()).hexdigest()
+    return f'catalog:{namespace}:v{version}:{digest}'
+
+
+def _lookup(namespace, key):
+    """Return ``(cache_key, value)``, or ``(None, _MISSING)`` when the cache is down."""
+    try:
+        cache_key = make_key(namespace, get_version(namespace), key)
+        value = cache.get(cache_key, _MISSING)
+    except Exception:
+        logger.warning('Catalog cache unavailable, reading from the database', exc_info=True)
+        _record('errors')
+        return None, _MISSING
+    _record('misses' if value is _MISSING else 'hits')
+    return cache_key, value
+
+
+def _store(cache_key, value, timeout):
+    try:
+        cache.set(cache_key, value, timeout)
+    except Exception:
+        logger.warning('Could not store catalog cache entry', exc_info=True)
+        _record('errors')
+
+
+def cached(namespace, key, producer, timeout=PRODUCT_TIMEOUT):
+    """Return the cached value for ``key``, computing it with ``producer`` on a miss."""
+    cache_key, value = _lookup(namespace, key)
+    if value is not _MISSING:
+        return value
+    value = producer()
+    if cache_key is not None:
+        _store(cache_key, value, timeout)
+    return value
+
+
+async def acached(namespace, key, producer, timeout=PRODUCT_TIMEOUT):
+    """Async ``cached``; ``producer`` is a coroutine function.
+
+    Django's cache backends have no native async methods (each ``aget``
+    is its own trip to a thread), so the lookup is done in one hop and the
+    store in another.
+    """
+    cache_key, value = await sync_to_async(_lookup)(namespace, key)
+    if value is not _MISSING:
+        return value
+    value = await producer()
+    if cache_key is not None:
+        await sync_to_async(_store)(cache_key, value, timeout)
+    return value
+
+
+def get_cached(namespace, key):
+    """Return the entry for ``key``, or ``None`` when absent or the cache is down."""
+    _, value = _lookup(namespace, key)
+    return None if value is _MISSING else value
+
+
+def set_cached(namespace, key, value, timeout=PRODUCT_TIMEOUT):
+    """Store ``value`` for ``key`` under the namespace's current version."""
+    try:
+        cache_key = make_key(namespace, get_version(namespace), key)
+    except Exception:
+        logger.warning('Could not store catalog cache entry', exc_info=True)
+        return
+    _store(cache_key, value, timeout)
+
+
+def stock_levels(product_ids):
+    """Return ``{product_id: (stock_quantity, updated_at)}`` for ``product_ids``.
+
+    Levels missing from the cache are read in one query and kept for
+    ``STOCK_TIMEOUT`` seconds; ids of deleted products are left out.
+    """
+    keys = {_stock_key(product_id): product_id for product_id in set(product_ids)}
+    if not keys:
+        return {}
+    try:
+        found = cache.get_many(list(keys))
+    except Exception:
+        logger.warning('Catalog cache unavailable, reading stock from the database', exc_info=True)
+        found = {}
+    levels = {keys[key]: level for key, level in found.items()}
+    missing = keys.values() - levels.keys()
+    if missing:
+        fresh = {
+            product_id: (stock_quantity, updated_at)
+            for product_id, stock_quantity, updated_at in Product.objects.filter(pk__in=missing)
+            .values_list('pk', 'stock_quantity', 'updated_at')
+        }
+        remember_stock(fresh)
+        levels.update(fresh)
+    return levels
+
+
+def remember_stock(levels):
+    """Cache ``{product_id: (stock_quantity, updated_at)}`` read elsewhere, for ``stock_levels``."""
+    try:
+        cache.set_many({_stock_key(product_id): level for product_id, level in levels.items()}, STOCK_TIMEOUT)
+    except Exception:
+        logger.warning('Could not store stock levels', exc_info=True)
+
+
+def forget_stock(product_ids):
+    """Drop the cached stock levels of ``product_ids`` after their stock changed."""
+    try:
+        cache.delete_many([_stock_key(product_id) for product_id in product_ids])
+    except Exception:
+        logger.warning('Could not drop cached stock levels', exc_info=True)
+
+
+def apply_stock(products):
+    """Give ``products`` (model instances, e.g. from the cache) their current stock; returns them."""
+    levels = stock_levels(product.pk for product in products)
+    for product in products:
+        if product.pk in levels:
+            product.stock_quantity, product.updated_at = levels[product.pk]
+    return products
+
+
+def catalog_etag(*parts):
+    """Return an ETag that changes whenever any product or category does.
+
+    The tag hashes the current namespace versions together with ``parts``
+    (typically the request URL and the stock levels of the products shown). Returns ``None`` when the versions cannot be
+    read, in which case callers should not send an ETag at all.
+    """
+    try:
+        versions = (get_version('product'), get_version('category'))
+    except Exception:
+        logger.warning('Catalog cache unavailable, skipping ETag', exc_info=True)
+        return None
+    if None in versions:
+        return None
+    digest = hashlib.md5(repr((versions, parts)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def get_stats():
+    """Return the shared hit/miss/error counters."""
+    try:
+        values = cache.get_many([_stat_key(name) for name in STAT_NAMES])
+    except Exception:
+        values = {}
+    return {name: values.get(_stat_key(name), 0) for name in STAT_NAMES}
+
+
+def reset_stats():
+    cache.delete_many([_stat_key(name) for name in STAT_NAMES])
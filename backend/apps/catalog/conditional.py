@@ -0,0 +1,225 @@
+"""Conditional GET support for catalog pages and API responses.
+
+Validators come from the catalog cache versions (see ``cache.py``), the
+stock levels of the products shown, the visitor's own state and, where a
+single product is shown, its ``updated_at``. They are all known before the
+view runs, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with 304 without querying the catalog or
+rendering a template.
+"""
+
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from apps.orders.services import cart_summary_tag, get_cart_summary
+from .cache import PRODUCT_TIMEOUT, catalog_etag, get_cached, remember_stock, set_cached, stock_levels
+
+# How long shared caches may serve a catalog response without revalidating.
+BROWSE_MAX_AGE = 60
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def visitor_state(request):
+    """Return what makes this visitor's page differ from an anonymous one's.
+
+    ``()`` for anonymous visitors, the user and cart summary for signed-in
+    ones, or ``None`` when flash messages are waiting to be shown and the
+    page has to be rendered.
+    """
+    if len(get_messages(request)):
+        return None
+    if not request.user.is_authenticated:
+        return ()
+    summary = get_cart_summary(request.session)
+    return (request.user.pk, cart_summary_tag(summary) if summary['count'] else 0)
+
+
+def check_validators(request, etag=None, last_modified=None):
+    """Return ``(response, timestamp)``: a 304/412 response if the validators match, else ``None``."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = None
+    if etag or timestamp:
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return response, timestamp
+
+
+def is_shareable(request, response):
+    """Whether ``response`` carries nothing specific to this visitor.
+
+    Not if it sets cookies, will get a session cookie, or embedded the
+    visitor's CSRF token (``CsrfViewMiddleware`` then sets ``csrftoken``),
+    the same cases Django's cache middleware refuses to store.
+    """
+    session = getattr(request, 'session', None)
+    return not (
+        response.cookies
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        or (session is not None and session.modified)
+    )
+
+
+def finish_response(request, response, etag=None, timestamp=None, public=True):
+    """Add the validators and ``Cache-Control`` to a rendered or 304 response.
+
+    Public with a short ``max-age`` for responses anyone may share,
+    ``private, no-cache`` (always revalidate) for everything else. Responses
+    rendered later (DRF, ``TemplateResponse``) are checked once rendered.
+    """
+    if response.status_code in (200, 304):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if timestamp:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+
+    def patch(response):
+        if public and is_shareable(request, response):
+            patch_cache_control(response, public=True, max_age=BROWSE_MAX_AGE)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+
+    if getattr(response, 'is_rendered', True):
+        patch(response)
+    else:
+        response.add_post_render_callback(patch)
+    return response
+
+
+def respond_conditionally(request, render, etag=None, last_modified=None, public=True):
+    """Return 304 if the request's validators match, otherwise ``render()``.
+
+    Both responses carry the validators and a ``Cache-Control`` header (see
+    ``finish_response``).
+    """
+    response, timestamp = check_validators(request, etag, last_modified)
+    if response is None:
+        response = render()
+    return finish_response(request, response, etag, timestamp, public)
+
+
+async def arespond_conditionally(request, render, etag=None, last_modified=None, public=True):
+    """``respond_conditionally`` for async views; ``render`` is a coroutine function."""
+    response, timestamp = check_validators(request, etag, last_modified)
+    if response is None:
+        response = await render()
+    return finish_response(request, response, etag, timestamp, public)
+
+
+def stock_state(levels):
+    """The stock quantities in ``levels`` (see ``stock_levels``) in a stable order, for an ETag."""
+    return sorted((product_id, level[0]) for product_id, level in levels.items())
+
+
+def page_validators(request, last_modified_func, products_func, *args, **kwargs):
+    """Return ``(etag, last_modified, public)`` for a catalog page request."""
+    state = visitor_state(request)
+    etag = last_modified = None
+    if state is not None:
+        stock = stock_state(stock_levels(products_func(request, *args, **kwargs))) if products_func else ()
+        etag = catalog_etag('page', request.get_full_path(), bool(request.htmx), state, stock)
+    if state == () and last_modified_func is not None:
+        last_modified = last_modified_func(request, *args, **kwargs)
+    return etag, last_modified, state == ()
+
+
+def conditional_page(last_modified_func=None, products_func=None):
+    """Decorate a catalog HTML view, sync or async, with ETag/Last-Modified handling.
+
+    The ETag covers the URL, whether the request came from HTMX, the
+    visitor's state and the stock of the products
+    ``products_func(request, *args, **kwargs)`` says the page shows.
+    ``last_modified_func(request, *args, **kwargs)`` may return a datetime; it is only used for anonymous visitors, whose page
+    depends on nothing but the catalog. It is always a sync function: for
+    async views the validators are worked out in one worker thread, since
+    they read the session and messages synchronously.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in SAFE_METHODS:
+                    return await view(request, *args, **kwargs)
+
+                etag, last_modified, public = await sync_to_async(page_validators)(
+                    request, last_modified_func, products_func, *args, **kwargs
+                )
+                response = await arespond_conditionally(
+                    request,
+                    lambda: view(request, *args, **kwargs),
+                    etag=etag,
+                    last_modified=last_modified,
+                    public=public,
+                )
+                patch_vary_headers(response, ('Cookie', 'HX-Request'))
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified, public = page_validators(
+                request, last_modified_func, products_func, *args, **kwargs
+            )
+            response = respond_conditionally(
+                request,
+                lambda: view(request, *args, **kwargs),
+                etag=etag,
+                last_modified=last_modified,
+                public=public,
+            )
+            patch_vary_headers(response, ('Cookie', 'HX-Request'))
+            return response
+        return wrapper
+    return decorator
+
+
+class ConditionalAPIMixin:
+    """Catalog-version ETags and public ``Cache-Control`` for read-only catalog API views.
+
+    Catalog API responses are the same for every visitor, so the ETag covers
+    the absolute URL, the negotiated representation headers and the stock of
+    the products in the response. Which products those are is only known once
+    the view has run; it is remembered per URL until the catalog changes, and
+    until then a matching ``If-None-Match`` is answered before the view runs.
+    """
+
+    def response_stock(self, data):
+        """Return ``{product_id: (stock_quantity, updated_at)}`` for the products in ``data``."""
+        return {}
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+
+        parts = (
+            'api',
+            request.build_absolute_uri(),
+            request.headers.get('Accept', ''),
+            request.headers.get('HX-Request', ''),
+        )
+        products = get_cached('product', f'products:{parts}')
+        if products is not None:
+            etag = catalog_etag(*parts, stock_state(stock_levels(products)))
+            response, _ = check_validators(request, etag)
+            if response is not None:
+                response = finish_response(request, response, etag)
+                patch_vary_headers(response, ('Accept', 'HX-Request'))
+                return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        etag = None
+        if response.status_code == 200:
+            data = getattr(response, 'data', None)
+            levels = self.response_stock(data) if data is not None else {}
+            remember_stock(levels)
+            set_cached('product', f'products:{parts}', list(levels), PRODUCT_TIMEOUT)
+            etag = catalog_etag(*parts, stock_state(levels))
+            not_modified, _ = check_validators(request, etag)
+            response = not_modified or response
+        response = finish_response(request, response, etag)
+        patch_vary_headers(response, ('Accept', 'HX-Request'))
+        return response
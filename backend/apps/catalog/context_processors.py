@@ -1,8 +1,39 @@
+from django.utils.functional import SimpleLazyObject
+from .cache import CATEGORY_TIMEOUT, cached, get_version
 from .models import Category
 
+# Process-local copy of the nav categories, tagged with the shared category
+# generation it was built from. Replaced wholesale so readers never see a
+# half-updated memo.
+_nav_memo = {'generation': None, 'categories': None}
+
+
+def load_nav_categories():
+    return list(Category.objects.values('name', 'slug'))
+
+
+def nav_categories():
+    """Return the serialized category list used by the navigation bar.
+
+    A warm worker answers from process memory after one cache read to check
+    the generation; a cold worker fills from the shared cache, and only a
+    cold cache touches the database.
+    """
+    global _nav_memo
+    try:
+        generation = get_version('category')
+    except Exception:
+        return load_nav_categories()
+
+    memo = _nav_memo
+    if memo['generation'] != generation:
+        categories = cached('category', 'nav', load_nav_categories, CATEGORY_TIMEOUT)
+        memo = {'generation': generation, 'categories': categories}
+        _nav_memo = memo
+    return memo['categories']
+
 
 def categories(request):
     return {
-        'all_categories': Category.objects.all(),
+        'all_categories': SimpleLazyObject(nav_categories),
     }
-
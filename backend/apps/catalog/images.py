@@ -0,0 +1,72 @@
+"""Placeholder image rules for products without an uploaded image.
+
+Rules are matched once, when a product is saved, and the result is stored
+in ``Product.image_url``; templates only read the stored value.
+"""
+
+import re
+
+# Checked in order against the lower-cased product name; the first key that
+# occurs anywhere in the name wins.
+PRODUCT_IMAGES = {
+    'smartphone': 'https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=800&h=600&fit=crop',
+    'laptop': 'https://images.unsplash.com/photo-1496181133206-80ce9b88a853?w=800&h=600&fit=crop',
+    'tablet': 'https://images.unsplash.com/photo-1544244015-0df4b3ffc6b0?w=800&h=600&fit=crop',
+    'wireless headphones': 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&h=600&fit=crop',
+    'headphones': 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&h=600&fit=crop',
+    'cotton t-shirt': 'https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=800&h=600&fit=crop',
+    'tshirt': 'https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=800&h=600&fit=crop',
+    'denim jeans': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=800&h=600&fit=crop',
+    'jeans': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=800&h=600&fit=crop',
+    'web development guide': 'https://images.unsplash.com/photo-1544716278-ca5e3f4abd8c?w=800&h=600&fit=crop',
+    'python programming book': 'https://images.unsplash.com/photo-1544947950-fa07a98d237f?w=800&h=600&fit=crop',
+    'book': 'https://images.unsplash.com/photo-1544947950-fa07a98d237f?w=800&h=600&fit=crop',
+}
+
+# Same rule against the lower-cased category name when no product key matched.
+CATEGORY_IMAGES = {
+    'electronics': 'https://images.unsplash.com/photo-1468495244123-6c6c332eeece?w=800&h=600&fit=crop',
+    'clothing': 'https://images.unsplash.com/photo-1441986300917-64674bd600d8?w=800&h=600&fit=crop',
+    'book': 'https://images.unsplash.com/photo-1544947950-fa07a98d237f?w=800&h=600&fit=crop',
+}
+
+DEFAULT_IMAGE_URL = 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&h=600&fit=crop'
+
+
+class KeywordMatcher:
+    """Find the first keyword, in rule order, contained in a string.
+
+    All keywords are compiled into one pattern of lookahead alternatives
+    anchored at the start, so a single ``match()`` call returns the
+    highest-priority keyword rather than the leftmost occurrence.
+    """
+
+    def __init__(self, rules):
+        self.urls = list(rules.values())
+        self.pattern = re.compile(
+            '|'.join(f'(?=.*?({re.escape(keyword)}))' for keyword in rules), re.DOTALL
+        )
+
+    def __call__(self, text):
+        match = self.pattern.match(text)
+        return self.urls[match.lastindex - 1] if match else None
+
+
+match_product_name = KeywordMatcher(PRODUCT_IMAGES)
+match_category_name = KeywordMatcher(CATEGORY_IMAGES)
+
+
+def match_image_url(name, category_name):
+    """Return the placeholder image for a product name and category name."""
+    return (
+        match_product_name(name.lower())
+        or match_category_name(category_name.lower())
+        or DEFAULT_IMAGE_URL
+    )
+
+
+def resolve_image_url(product):
+    """Return the uploaded image's URL, or the placeholder matching the product."""
+    if product.image:
+        return product.image.url
+    return match_image_url(product.name, product.category.name)
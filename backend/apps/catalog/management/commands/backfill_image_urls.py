@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.catalog.cache import bump_version
+from apps.catalog.models import Product
+from apps.catalog.services import refresh_image_urls
+
+
+class Command(BaseCommand):
+    help = 'Resolve and store image_url for every product whose stored URL is out of date.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--missing-only', action='store_true', help='Only rows with no stored URL.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['missing_only']:
+            products = products.filter(image_url='')
+        updated = refresh_image_urls(products, batch_size=options['batch_size'])
+        if updated:
+            bump_version('product')
+        self.stdout.write(self.style.SUCCESS(f'Updated image_url on {updated} products.'))
@@ -0,0 +1,55 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from apps.catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET and keyset latency for a shallow and a deep product page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=5000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def time_query(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        size = options['page_size']
+        products = Product.objects.filter(is_active=True).order_by('-created_at', '-id')
+        total = products.count()
+        if total < options['page'] * size:
+            raise CommandError(
+                f'Only {total} active products; generate at least {options["page"] * size} '
+                f'with `manage.py generate_products`.'
+            )
+
+        for page in (1, options['page']):
+            offset = (page - 1) * size
+
+            def offset_page():
+                products.count()
+                list(products[offset:offset + size])
+
+            if page == 1:
+                keyset = products
+            else:
+                # Cursor position is what the previous page's "next" link would carry.
+                last = products.values('created_at', 'id')[offset - 1]
+                keyset = products.filter(
+                    Q(created_at__lte=last['created_at'])
+                    & (Q(created_at__lt=last['created_at']) | Q(id__lt=last['id']))
+                )
+
+            offset_ms = self.time_query(offset_page, options['repeat'])
+            keyset_ms = self.time_query(lambda: list(keyset[:size + 1]), options['repeat'])
+            self.stdout.write(
+                f'page {page:>6}: offset+count {offset_ms:8.2f} ms   keyset {keyset_ms:8.2f} ms'
+            )
@@ -0,0 +1,47 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from apps.catalog.models import Product
+from apps.catalog.search import get_search_backend
+
+
+def icontains_search(queryset, query):
+    """The pre-search-backend implementation, kept for comparison."""
+    return queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+
+
+def p95(timings):
+    # quantiles needs two points; 'inclusive' keeps it within the timings seen
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=20, method='inclusive')[-1]
+
+
+class Command(BaseCommand):
+    help = 'Compare product search latency of the search backend against icontains scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=['laptop', 'wireless head', 'organic cook'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=20, help='Rows fetched per query, like one page.')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        base = Product.objects.filter(is_active=True)
+        self.stdout.write(f'{base.count()} active products, backend {type(backend).__name__}')
+
+        for query in options['queries']:
+            for label, run in (
+                ('icontains', lambda: list(icontains_search(base, query)[:options['limit']])),
+                ('backend', lambda: list(backend.search(base, query)[:options['limit']])),
+            ):
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f'{query!r:>18} {label:>9}: median {statistics.median(timings):7.2f} ms '
+                    f'p95 {p95(timings):7.2f} ms'
+                )
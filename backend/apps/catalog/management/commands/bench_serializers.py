@@ -0,0 +1,45 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.catalog.models import Product
+from apps.catalog.serializers import ProductSerializer, product_rows
+
+
+class Command(BaseCommand):
+    help = 'Compare products serialized per second by ProductSerializer and the row fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def rate(self, run, size, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return size / statistics.median(timings)
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(is_active=True).order_by('-created_at', '-id')
+        total = products.count()
+        if total < max(options['sizes']):
+            raise CommandError(
+                f'Only {total} active products; generate at least {max(options["sizes"])} '
+                f'with `manage.py generate_products`.'
+            )
+
+        for size in options['sizes']:
+            instances = list(products.select_related('category')[:size])
+            rows = list(product_rows.values(products)[:size])
+            cases = [
+                ('serializer', lambda: ProductSerializer(instances, many=True).data),
+                ('rows', lambda: product_rows.serialize(rows)),
+                ('serializer+query', lambda: ProductSerializer(
+                    products.select_related('category')[:size], many=True
+                ).data),
+                ('rows+query', lambda: product_rows.serialize(product_rows.values(products)[:size])),
+            ]
+            for name, run in cases:
+                per_sec = self.rate(run, size, options['repeat'])
+                self.stdout.write(f'{size:>6} products  {name:<17} {per_sec:>12,.0f} products/sec')
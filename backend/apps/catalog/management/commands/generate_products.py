@@ -0,0 +1,62 @@
+import random
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from apps.catalog.images import match_image_url
+from apps.catalog.models import Category, Product
+from apps.catalog.search import get_search_backend
+
+ADJECTIVES = [
+    'wireless', 'portable', 'premium', 'compact', 'classic', 'smart', 'organic',
+    'vintage', 'ergonomic', 'waterproof', 'lightweight', 'deluxe',
+]
+NOUNS = [
+    'laptop', 'smartphone', 'tablet', 'headphones', 'keyboard', 'camera', 'jacket',
+    'jeans', 'sneakers', 't-shirt', 'novel', 'cookbook', 'backpack', 'monitor',
+]
+CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Home', 'Sports']
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic benchmark products in bulk (default 100k).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='bench', help='Slug prefix for generated rows.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        categories = [
+            Category.objects.get_or_create(slug=f'{prefix}-{name.lower()}', defaults={'name': f'{name} ({prefix})'})[0]
+            for name in CATEGORIES
+        ]
+        start = Product.objects.filter(slug__startswith=f'{prefix}-').count()
+        batch_size = options['batch_size']
+        created = 0
+
+        while created < options['count']:
+            size = min(batch_size, options['count'] - created)
+            batch = []
+            for i in range(start + created, start + created + size):
+                name = f'{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()} {i}'
+                category = rng.choice(categories)
+                batch.append(Product(
+                    name=name,
+                    slug=f'{prefix}-{i}',
+                    description=' '.join(rng.choices(ADJECTIVES + NOUNS, k=20)),
+                    price=Decimal(rng.randint(100, 100_000)) / 100,
+                    category=category,
+                    stock_quantity=rng.randint(0, 500),
+                    # bulk_create skips save(), so resolve the placeholder here.
+                    image_url=match_image_url(name, category.name),
+                ))
+            Product.objects.bulk_create(batch, batch_size=batch_size)
+            created += size
+            self.stdout.write(f'{created}/{options["count"]} products')
+
+        indexed = get_search_backend().update_index(
+            Product.objects.filter(slug__startswith=f'{prefix}-', search_vector__isnull=True)
+        )
+        self.stdout.write(self.style.SUCCESS(f'Created {created} products, indexed {indexed}.'))
@@ -0,0 +1,48 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from apps.catalog.cache import bump_version
+from apps.catalog.models import Product
+from apps.catalog.thumbnails import generate_thumbnails
+
+
+def build(name):
+    """Pool worker: returns ``(manifest, error)`` so one bad upload does not stop the run."""
+    try:
+        return generate_thumbnails(name), None
+    except Exception as exc:
+        return None, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Regenerate responsive thumbnails for existing product images with a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--chunksize', type=int, default=4)
+        parser.add_argument('--missing-only', action='store_true', help='Skip products that already have thumbnails.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(Q(image='') | Q(image__isnull=True))
+        if options['missing_only']:
+            products = products.filter(thumbnails={})
+        jobs = list(products.order_by('pk').values_list('pk', 'image'))
+
+        # Workers only touch storage; every database write happens here.
+        updated = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            results = pool.map(build, [name for _, name in jobs], chunksize=options['chunksize'])
+            for (pk, name), (manifest, error) in zip(jobs, results):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'product {pk} ({name}): {error}')
+                    continue
+                updated += Product.objects.filter(pk=pk, image=name).update(thumbnails=manifest)
+
+        if updated:
+            bump_version('product')
+        self.stdout.write(self.style.SUCCESS(
+            f'Regenerated thumbnails for {updated} of {len(jobs)} products ({failed} failed).'
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:02
+
+from django.db import migrations, models
+from apps.catalog.images import resolve_image_url
+
+BATCH_SIZE = 1000
+
+
+def backfill_image_urls(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    products = (
+        Product.objects.select_related('category')
+        .only('id', 'name', 'image', 'category__name')
+        .order_by('pk')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for product in products:
+        product.image_url = resolve_image_url(product)
+        batch.append(product)
+        if len(batch) >= BATCH_SIZE:
+            Product.objects.bulk_update(batch, ['image_url'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['image_url'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_image_urls, migrations.RunPython.noop),
+    ]
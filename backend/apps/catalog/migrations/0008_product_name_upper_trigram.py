@@ -0,0 +1,31 @@
+from django.db import migrations
+
+UPPER_TRIGRAM_INDEX = 'catalog_product_name_upper_trgm'
+
+
+def create_upper_trigram_index(apps, schema_editor):
+    # istartswith compiles to UPPER("name"::text) LIKE UPPER(...), which the
+    # plain trigram index on name cannot serve.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {UPPER_TRIGRAM_INDEX} '
+        'ON catalog_product USING gin ((UPPER(name::text)) gin_trgm_ops)'
+    )
+
+
+def drop_upper_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {UPPER_TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_trigram_index, drop_upper_trigram_index),
+    ]
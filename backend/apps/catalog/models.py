@@ -1,5 +1,7 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
+from .images import resolve_image_url
 
 
 class Category(models.Model):
@@ -24,19 +26,68 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     stock_quantity = models.IntegerField(validators=[MinValueValidator(0)], default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resolved from image or the placeholder rules in apps.catalog.images on save.
+    image_url = models.CharField(max_length=500, blank=True, editable=False)
+    # Responsive derivatives of image, written by apps.catalog.thumbnails.
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by apps.catalog.search on PostgreSQL; GIN index is created in
+    # migration 0003 because it only exists on that backend.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['slug']),
             models.Index(fields=['category', 'is_active']),
+            models.Index(fields=['is_active', 'created_at', 'id']),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # One transaction, so the cache bump queued by post_save runs after the
+        # follow-up UPDATE below.
+        with transaction.atomic():
+            self.image_url = resolve_image_url(self)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'image_url'}
+            super().save(*args, **kwargs)
+            # A new upload is only stored, under upload_to and possibly a
+            # deduplicated name, by the save itself.
+            self.refresh_image_url()
+
+    def refresh_image_url(self):
+        """Store the resolved ``image_url`` if it differs; returns whether it did."""
+        image_url = resolve_image_url(self)
+        if image_url == self.image_url:
+            return False
+        self.image_url = image_url
+        Product.objects.filter(pk=self.pk).update(image_url=image_url)
+        return True
+
     def is_in_stock(self):
         return self.stock_quantity > 0
+
+
+class StockReservation(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    cart_key = models.CharField(max_length=64)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'cart_key'], name='unique_reservation_per_cart'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} held by {self.cart_key}"
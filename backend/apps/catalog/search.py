@@ -0,0 +1,168 @@
+"""Pluggable product search backends.
+
+``PostgresSearchBackend`` matches against the stored ``Product.search_vector``
+column (GIN indexed) with prefix queries and ``ts_rank`` ordering, and answers
+name suggestions from a ``pg_trgm`` index. ``SimpleSearchBackend`` gives the
+same interface on any database with a heuristic rank and an in-process prefix
+index, so tests and local SQLite setups work without PostgreSQL. Select one
+with ``CATALOG_SEARCH_BACKEND`` (a dotted path, or ``'auto'`` to pick by
+database vendor).
+"""
+
+import bisect
+import re
+import threading
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils.module_loading import import_string
+
+SEARCH_CONFIG = 'english'
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return _TERM_RE.findall(query or '')
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query, prefix=True):
+        """Filter ``queryset`` to products matching ``query``, annotated with ``rank``
+        and ordered best match first."""
+        raise NotImplementedError
+
+    def suggest(self, queryset, prefix, limit=8):
+        """Return up to ``limit`` product names completing ``prefix``."""
+        raise NotImplementedError
+
+    def update_index(self, queryset):
+        """Refresh stored search data for ``queryset``. Returns rows updated."""
+        return 0
+
+    @staticmethod
+    def order_by_rank(queryset):
+        return queryset.order_by('-rank', *queryset.query.order_by)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    @staticmethod
+    def vector():
+        from django.contrib.postgres.search import SearchVector
+        return (
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        )
+
+    def search(self, queryset, query, prefix=True):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        suffix = ':*' if prefix else ''
+        tsquery = SearchQuery(
+            ' & '.join(f'{term}{suffix}' for term in terms),
+            search_type='raw',
+            config=SEARCH_CONFIG,
+        )
+        queryset = queryset.filter(search_vector=tsquery).annotate(
+            rank=SearchRank(F('search_vector'), tsquery)
+        )
+        return self.order_by_rank(queryset)
+
+    def suggest(self, queryset, prefix, limit=8):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        # Each side of the OR has its own trigram index (migrations 0004 and
+        # 0008), so the planner can combine two index scans.
+        return list(
+            queryset.filter(Q(name__istartswith=prefix) | Q(name__trigram_word_similar=prefix))
+            .annotate(similarity=TrigramWordSimilarity(prefix, 'name'))
+            .order_by('-similarity', 'name')
+            .values_list('name', flat=True)[:limit]
+        )
+
+    def update_index(self, queryset):
+        return queryset.update(search_vector=self.vector())
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    def search(self, queryset, query, prefix=True):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        # Substring matching already covers prefixes, so ``prefix`` is moot here.
+        for term in terms:
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        first = terms[0]
+        queryset = queryset.annotate(
+            rank=Case(
+                When(name__istartswith=first, then=Value(1.0)),
+                When(name__icontains=first, then=Value(0.6)),
+                default=Value(0.2),
+                output_field=FloatField(),
+            )
+        )
+        return self.order_by_rank(queryset)
+
+    def suggest(self, queryset, prefix, limit=8):
+        return PrefixIndex.for_queryset(queryset).complete(prefix, limit)
+
+
+class PrefixIndex:
+    """Sorted in-memory index of every word-suffix of every product name.
+
+    ``complete('lap')`` bisects to the first key starting with ``lap`` and
+    walks forward, so lookups cost O(log n + limit). One index is kept per
+    process and rebuilt when the catalog product cache version changes.
+    """
+
+    _lock = threading.Lock()
+    _current = None
+
+    def __init__(self, names, version=None):
+        self.version = version
+        entries = set()
+        for name in names:
+            lowered = name.lower()
+            for match in _TERM_RE.finditer(lowered):
+                entries.add((lowered[match.start():], name))
+        self.entries = sorted(entries)
+        self.keys = [key for key, _ in self.entries]
+
+    @classmethod
+    def for_queryset(cls, queryset):
+        from .cache import get_version
+        try:
+            version = get_version('product')
+        except Exception:
+            version = None
+        index = cls._current
+        if version is None or index is None or index.version != version:
+            with cls._lock:
+                index = cls._current
+                if version is None or index is None or index.version != version:
+                    index = cls(queryset.values_list('name', flat=True), version)
+                    cls._current = index
+        return index
+
+    def complete(self, prefix, limit=8):
+        prefix = prefix.lower()
+        results = []
+        position = bisect.bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(results) < limit:
+            if not self.keys[position].startswith(prefix):
+                break
+            name = self.entries[position][1]
+            if name not in results:
+                results.append(name)
+            position += 1
+        return results
+
+
+def get_search_backend():
+    path = getattr(settings, 'CATALOG_SEARCH_BACKEND', 'auto')
+    if path == 'auto':
+        if connection.vendor == 'postgresql':
+            return PostgresSearchBackend()
+        return SimpleSearchBackend()
+    return import_string(path)()
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from common.serializers import RowSerializer
 from .models import Product, Category
 
 
@@ -21,3 +22,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'stock_quantity', 'image', 'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+
+
+# Read fast path for the product API; ProductSerializer stays in charge of writes.
+product_rows = RowSerializer(ProductSerializer)
@@ -1,3 +1,118 @@
 """Domain logic for pricing rules, availability checks, and recommendations."""
 
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .images import resolve_image_url
+from .models import Product, StockReservation
 
+# First key of the PostgreSQL advisory locks that serialize holds on a product
+STOCK_HOLD_LOCK = 4004
+
+
+def held_quantities(product_ids, exclude_cart=None):
+    """Return ``{product_id: units}`` held by unexpired reservations.
+
+    Holds belonging to ``exclude_cart`` are left out so a cart never competes
+    with its own reservation.
+    """
+    holds = StockReservation.objects.filter(
+        product_id__in=product_ids, expires_at__gt=timezone.now()
+    )
+    if exclude_cart:
+        holds = holds.exclude(cart_key=exclude_cart)
+    return dict(holds.values('product_id').annotate(held=Sum('quantity')).values_list('product_id', 'held'))
+
+
+def available_to_sell(product, exclude_cart=None):
+    """Stock not held by other carts. Reads reservations only, never locks the product."""
+    held = held_quantities([product.id], exclude_cart).get(product.id, 0)
+    return max(product.stock_quantity - held, 0)
+
+
+def lock_holds(product_ids):
+    """Serialize stock holds on ``product_ids`` until the transaction ends.
+
+    Takes a transaction-scoped advisory lock per product, in id order, so
+    carts queue on the reservation ledger rather than the product row and
+    browsing and pricing reads never wait on a flash sale. A no-op on
+    backends without advisory locks; SQLite serializes writers anyway.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for product_id in sorted(product_ids):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [STOCK_HOLD_LOCK, product_id])
+
+
+def reserve_stock(product, cart_key, quantity):
+    """Hold up to ``quantity`` units of ``product`` for a cart.
+
+    The hold replaces any previous one for the same cart and expires after
+    ``STOCK_RESERVATION_TTL`` seconds. Returns the quantity actually held,
+    which is clamped to what is available to sell. Holds on the product are
+    serialized with ``lock_holds`` from the availability check to the write,
+    so two carts cannot both take the last units; the product row itself is
+    only locked by ``place_order``.
+    """
+    with transaction.atomic():
+        lock_holds([product.pk])
+        # Re-read stock after the wait: a checkout may have just sold some.
+        product.stock_quantity = Product.objects.values_list('stock_quantity', flat=True).get(pk=product.pk)
+        quantity = min(quantity, available_to_sell(product, exclude_cart=cart_key))
+        if quantity <= 0:
+            release_stock(product.id, cart_key)
+            return 0
+        StockReservation.objects.update_or_create(
+            product=product,
+            cart_key=cart_key,
+            defaults={
+                'quantity': quantity,
+                'expires_at': timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL),
+            },
+        )
+    return quantity
+
+
+def release_stock(product_id, cart_key):
+    StockReservation.objects.filter(product_id=product_id, cart_key=cart_key).delete()
+
+
+def release_cart(cart_key):
+    StockReservation.objects.filter(cart_key=cart_key).delete()
+
+
+def release_expired_reservations():
+    """Delete every expired hold in one statement and return how many were released."""
+    deleted, _ = StockReservation.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def refresh_image_urls(products, batch_size=1000):
+    """Recompute the stored ``image_url`` of ``products`` in batches.
+
+    Only rows whose URL actually changed are written, with ``bulk_update``;
+    returns how many that was. Bulk writes skip model signals, so callers
+    bump the product cache version themselves.
+    """
+    rows = (
+        products.select_related('category')
+        .only('id', 'name', 'image', 'image_url', 'category__name')
+        .order_by('pk')
+        .iterator(chunk_size=batch_size)
+    )
+    changed = []
+    updated = 0
+    for product in rows:
+        url = resolve_image_url(product)
+        if url != product.image_url:
+            product.image_url = url
+            changed.append(product)
+        if len(changed) >= batch_size:
+            updated += Product.objects.bulk_update(changed, ['image_url'])
+            changed = []
+    if changed:
+        updated += Product.objects.bulk_update(changed, ['image_url'])
+    return updated
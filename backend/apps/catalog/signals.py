@@ -0,0 +1,80 @@
+import logging
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from apps.core.tasks import generate_product_thumbnails
+from .cache import bump_version, forget_stock
+from .models import Category, Product
+from .search import get_search_backend
+from .services import refresh_image_urls
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    # After commit, or a reader in between would cache the old rows under the new version.
+    product_id = instance.pk
+    
+    def bump():
+        bump_version('product')
+        forget_stock([product_id])
+    
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Product)
+def resolve_loaded_image_url(sender, instance, raw, **kwargs):
+    # loaddata saves with raw=True, which bypasses Product.save().
+    if raw:
+        try:
+            instance.refresh_image_url()
+        except Category.DoesNotExist:
+            # Category not loaded yet; `manage.py backfill_image_urls` fills these in.
+            pass
+
+
+@receiver(post_save, sender=Product)
+def update_search_vector(sender, instance, **kwargs):
+    get_search_backend().update_index(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def queue_thumbnails(sender, instance, **kwargs):
+    if (instance.image.name or '') == instance.thumbnails.get('source', ''):
+        return
+    
+    def enqueue():
+        try:
+            generate_product_thumbnails.delay(instance.pk)
+        except Exception:
+            # `manage.py regenerate_thumbnails --missing-only` picks these up later.
+            logger.warning('Could not queue thumbnails for product %s', instance.pk, exc_info=True)
+    
+    transaction.on_commit(enqueue)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    # Cached products carry their category, so both namespaces go stale.
+    def bump():
+        bump_version('category')
+        bump_version('product')
+    
+    transaction.on_commit(bump)
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, **kwargs):
+    instance._previous_name = (
+        Category.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_image_urls(sender, instance, created, **kwargs):
+    # Products without an image or name rule fall back to their category's name.
+    if not created and instance._previous_name != instance.name:
+        refresh_image_urls(instance.products.filter(Q(image='') | Q(image__isnull=True)))
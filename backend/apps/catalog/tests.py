@@ -1,11 +1,43 @@
 """Catalog-focused tests (covers unit, integration, and perf checks)."""
 
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.utils import timezone
 from decimal import Decimal
+from django.template.loader import render_to_string
 from django.urls import reverse
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APIClient
-from .models import Category, Product
+from apps.orders.models import Order, OrderItem
+from apps.orders.services import place_order, save_cart
+from apps.payments.models import Payment
+from .cache import cached, get_stats, get_version
+from .context_processors import categories, nav_categories
+from .images import CATEGORY_IMAGES, PRODUCT_IMAGES, match_product_name
+from .models import Category, Product, StockReservation
+from .search import get_search_backend
+from .serializers import ProductSerializer, product_rows
+from .views import PRODUCT_PAGE_SIZE, filter_products
+from .services import available_to_sell, release_expired_reservations, reserve_stock
+from .templatetags.product_filters import product_srcset
+from .thumbnails import generate_thumbnails, update_product_thumbnails
+
+User = get_user_model()
 
 
 class TestCategoryModel(TestCase):
@@ -108,3 +140,925 @@ class TestCatalogAPI(TestCase):
         """Test GET /api/categories/."""
         response = self.client.get('/api/categories/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(STOCK_RESERVATION_TTL=600)
+class TestStockReservations(TestCase):
+    """Unit tests for the stock reservation ledger."""
+    
+    def setUp(self):
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        self.product = Product.objects.create(
+            name='Flash Sale Product',
+            slug='flash-sale-product',
+            description='Limited stock',
+            price=Decimal('19.99'),
+            category=self.category,
+            stock_quantity=5
+        )
+    
+    def test_reservations_reduce_available_stock(self):
+        """Test holds from other carts reduce available-to-sell."""
+        self.assertEqual(reserve_stock(self.product, 'cart-a', 3), 3)
+        self.assertEqual(available_to_sell(self.product), 2)
+        self.assertEqual(available_to_sell(self.product, exclude_cart='cart-a'), 5)
+        self.assertEqual(reserve_stock(self.product, 'cart-b', 4), 2)
+    
+    def test_reserve_replaces_existing_hold(self):
+        """Test re-reserving for the same cart updates the hold in place."""
+        reserve_stock(self.product, 'cart-a', 2)
+        reserve_stock(self.product, 'cart-a', 4)
+        self.assertEqual(StockReservation.objects.get().quantity, 4)
+    
+    def test_expired_holds_are_ignored_and_swept(self):
+        """Test expired holds free stock and are deleted by the sweeper."""
+        reserve_stock(self.product, 'cart-a', 5)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(available_to_sell(self.product), 5)
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertFalse(StockReservation.objects.exists())
+    
+    def test_availability_does_not_touch_product_row(self):
+        """Test availability is one reservation query with no product access."""
+        with self.assertNumQueries(1):
+            available_to_sell(self.product)
+    
+    def test_reserve_does_not_lock_product_row(self):
+        """Test placing a hold never takes a row lock on the product."""
+        with CaptureQueriesContext(connection) as queries:
+            reserve_stock(self.product, 'cart-a', 2)
+        self.assertFalse([query['sql'] for query in queries if 'FOR UPDATE' in query['sql']])
+    
+    def test_reserve_reads_current_stock(self):
+        """Test a hold is clamped to stock sold since the product was loaded."""
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=1)
+        self.assertEqual(reserve_stock(self.product, 'cart-a', 3), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires advisory locks.')
+@override_settings(STOCK_RESERVATION_TTL=600)
+class TestStockReservationConcurrency(TransactionTestCase):
+    """Stress test for carts racing for the last units of one product."""
+    
+    def test_concurrent_holds_never_exceed_stock(self):
+        """Test simultaneous holds on the last unit leave exactly one cart holding it."""
+        category = Category.objects.create(name='Flash Sale', slug='flash-sale')
+        product = Product.objects.create(
+            name='Last Unit',
+            slug='last-unit',
+            description='One left',
+            price=Decimal('9.99'),
+            category=category,
+            stock_quantity=1
+        )
+        carts = 8
+        barrier = threading.Barrier(carts)
+        held = []
+        
+        def hold(cart_key):
+            try:
+                barrier.wait()
+                held.append(reserve_stock(product, cart_key, 1))
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=hold, args=(f'cart-{i}',)) for i in range(carts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(held), [0] * (carts - 1) + [1])
+        self.assertEqual(StockReservation.objects.get(product=product).quantity, 1)
+
+
+class TestCatalogCache(TestCase):
+    """Unit tests for the versioned catalog cache."""
+    
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        self.product = Product.objects.create(
+            name='Cached Product',
+            slug='cached-product',
+            description='Cached',
+            price=Decimal('10.00'),
+            category=self.category,
+            stock_quantity=10
+        )
+    
+    def list_products(self):
+        return cached('product', 'all', lambda: list(Product.objects.all()))
+    
+    def test_second_read_is_a_hit(self):
+        """Test repeated reads are served from the cache."""
+        self.list_products()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.list_products()), 1)
+        self.assertEqual(get_stats()['hits'], 1)
+    
+    def test_save_invalidates_entries(self):
+        """Test saving a product bumps the version and forces a reload."""
+        self.list_products()
+        self.product.name = 'Renamed Product'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.list_products()[0].name, 'Renamed Product')
+    
+    def test_version_bumped_after_commit(self):
+        """Test a read before the save commits cannot cache old rows under the new version."""
+        version = get_version('product')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+            self.assertEqual(get_version('product'), version)
+        self.assertNotEqual(get_version('product'), version)
+    
+    def test_category_delete_invalidates_products(self):
+        """Test category changes also invalidate cached products."""
+        self.list_products()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(self.list_products(), [])
+    
+    def test_unavailable_cache_falls_back_to_database(self):
+        """Test a cache outage degrades to database reads."""
+        with patch('apps.catalog.cache.cache.get', side_effect=ConnectionError):
+            self.assertEqual(len(self.list_products()), 1)
+        self.assertEqual(get_stats()['errors'], 1)
+    
+    def test_product_detail_served_from_cache(self):
+        """Test a warm product page does not query the product table."""
+        url = reverse('product_detail', args=['cached-product'])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('catalog_product' in query['sql'] for query in queries))
+
+
+class TestNavCategories(TestCase):
+    """Perf tests for the memoized navigation categories."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='navuser',
+            email='nav@example.com',
+            password='navpass123'
+        )
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        self.product = Product.objects.create(
+            name='Nav Product',
+            slug='nav-product',
+            description='Nav',
+            price=Decimal('10.00'),
+            category=self.category,
+            stock_quantity=10
+        )
+        self.order = Order.objects.create(
+            user=self.user,
+            total_amount=Decimal('10.00'),
+            shipping_address='1 Nav St',
+            shipping_city='Nav City',
+            shipping_postal_code='12345',
+            shipping_country='Nav Country'
+        )
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1, price=Decimal('10.00'))
+        self.payment = Payment.objects.create(
+            order=self.order,
+            stripe_payment_intent_id='pi_nav',
+            amount=Decimal('10.00'),
+            status='succeeded'
+        )
+    
+    def page_urls(self):
+        return [
+            reverse('product_list'),
+            reverse('product_detail', args=['nav-product']),
+            reverse('cart_view'),
+            reverse('checkout'),
+            reverse('order_list'),
+            reverse('order_detail', args=[self.order.id]),
+            reverse('payment_success', args=[self.payment.id]),
+            reverse('profile'),
+            reverse('login'),
+            reverse('signup'),
+        ]
+    
+    def test_warm_pages_skip_category_queries(self):
+        """Test no frontend page queries categories once the memo is warm."""
+        self.client.force_login(self.user)
+        session = self.client.session
+        save_cart(session, {str(self.product.id): 1})
+        session.save()
+        urls = self.page_urls()
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+        
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, '?category=electronics')
+            self.assertFalse(
+                any('catalog_category' in query['sql'] for query in queries), url
+            )
+    
+    def test_category_change_refreshes_nav(self):
+        """Test saving a category invalidates the memo."""
+        self.assertEqual([c['slug'] for c in nav_categories()], ['electronics'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Books', slug='books')
+        self.assertEqual([c['slug'] for c in nav_categories()], ['books', 'electronics'])
+    
+    def test_pages_that_skip_nav_do_no_work(self):
+        """Test the context processor is lazy."""
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(0):
+            categories(request)
+
+
+class TestProductSearch(TestCase):
+    """Integration tests for pluggable product search."""
+    
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        for name, description in [
+            ('Gaming Laptop', 'Fast laptop for games'),
+            ('Laptop Sleeve', 'Protects a laptop'),
+            ('Desk Lamp', 'Bright lamp, pairs well with any laptop'),
+            ('Coffee Mug', 'Ceramic mug'),
+        ]:
+            Product.objects.create(
+                name=name,
+                slug=name.lower().replace(' ', '-'),
+                description=description,
+                price=Decimal('10.00'),
+                category=self.category,
+                stock_quantity=5
+            )
+    
+    def test_results_are_ranked(self):
+        """Test name matches rank above description-only matches."""
+        results = list(get_search_backend().search(Product.objects.all(), 'laptop'))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[-1].name, 'Desk Lamp')
+        self.assertGreater(results[0].rank, results[-1].rank)
+    
+    def test_prefix_matching(self):
+        """Test partial words match for type-ahead."""
+        results = get_search_backend().search(Product.objects.all(), 'lapt sle')
+        self.assertEqual([product.name for product in results], ['Laptop Sleeve'])
+    
+    def test_blank_query_matches_nothing(self):
+        """Test queries without search terms return no results."""
+        self.assertFalse(get_search_backend().search(Product.objects.all(), '  %% '))
+    
+    def test_api_search_param(self):
+        """Test GET /api/products/?search= uses the search backend."""
+        response = APIClient().get('/api/catalog/api/products/', {'search': 'mug'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['name'] for p in response.data['results']], ['Coffee Mug'])
+    
+    def test_product_list_search(self):
+        """Test the product list page searches by name and description."""
+        response = self.client.get(reverse('product_list'), {'q': 'laptop'})
+        self.assertEqual(len(response.context['products']), 3)
+    
+    def test_suggest_completes_word_prefixes(self):
+        """Test GET /api/products/suggest/ completes any word in the name."""
+        response = APIClient().get(reverse('product-suggest'), {'q': 'lap'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data), ['Gaming Laptop', 'Laptop Sleeve'])
+    
+    def test_suggest_is_cached_per_prefix(self):
+        """Test a repeated prefix is answered without queries."""
+        client = APIClient()
+        client.get(reverse('product-suggest'), {'q': 'mu'})
+        with self.assertNumQueries(0):
+            response = client.get(reverse('product-suggest'), {'q': 'mu'})
+        self.assertEqual(response.data, ['Coffee Mug'])
+    
+    def test_suggest_ignores_short_prefixes(self):
+        """Test single characters return no suggestions."""
+        response = APIClient().get(reverse('product-suggest'), {'q': 'l'})
+        self.assertEqual(response.data, [])
+    
+    def test_suggest_clamps_limit(self):
+        """Test out-of-range limits are clamped rather than failing."""
+        response = APIClient().get(reverse('product-suggest'), {'q': 'lap', 'limit': -3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+    
+    def test_suggest_htmx_returns_options(self):
+        """Test HTMX requests receive datalist options."""
+        response = self.client.get(reverse('product-suggest'), {'q': 'desk'}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, '<option value="Desk Lamp">')
+
+
+class TestKeysetPagination(TestCase):
+    """Integration tests for cursor pagination on the product API."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        Product.objects.bulk_create([
+            Product(
+                name=f'Paged Product {i}',
+                slug=f'paged-product-{i}',
+                description='Paged',
+                price=Decimal(i),
+                category=self.category,
+                stock_quantity=1
+            )
+            for i in range(25)
+        ])
+        # Shared timestamps force the id tiebreaker to do its job.
+        Product.objects.filter(id__lte=Product.objects.order_by('id')[9].id).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+    
+    def walk(self, url, link='next'):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids.extend(product['id'] for product in response.data['results'])
+            url = response.data[link]
+        return ids, response
+    
+    def test_cursor_walk_visits_every_product_once(self):
+        """Test following next links returns every product in keyset order."""
+        ids, _ = self.walk(reverse('product-list') + '?page_size=4')
+        expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+    
+    def test_previous_links_walk_back(self):
+        """Test previous links return the earlier pages in order."""
+        url = reverse('product-list') + '?page_size=4'
+        for _ in range(3):
+            url = self.client.get(url).data['next']
+        back, _ = self.walk(url, link='previous')
+        pages = [back[i:i + 4] for i in range(0, len(back), 4)]
+        expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)[:16]
+        )
+        self.assertEqual([i for page in reversed(pages) for i in page], expected)
+    
+    def test_count_can_be_skipped(self):
+        """Test ?count=false avoids the COUNT query."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product-list'), {'count': 'false'})
+        self.assertIsNone(response.data['count'])
+        self.assertFalse(any('COUNT' in query['sql'] for query in queries))
+        self.assertEqual(self.client.get(reverse('product-list')).data['count'], 25)
+    
+    def test_custom_ordering_falls_back_to_page_numbers(self):
+        """Test ?ordering=price keeps working with page numbers."""
+        response = self.client.get(reverse('product-list'), {'ordering': 'price', 'page': 2})
+        self.assertEqual(response.data['results'][0]['price'], '20.00')
+    
+    def test_invalid_cursor(self):
+        """Test a garbage cursor returns 404."""
+        response = self.client.get(reverse('product-list'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestProductListPagination(TestCase):
+    """Integration tests for the paginated and streamed product list."""
+    
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        Product.objects.bulk_create([
+            Product(
+                name=f'Grid Product {i}',
+                slug=f'grid-product-{i}',
+                description='Grid',
+                price=Decimal('10.00'),
+                category=self.category,
+                stock_quantity=1
+            )
+            for i in range(PRODUCT_PAGE_SIZE + 5)
+        ])
+    
+    def test_first_page_links_to_next(self):
+        """Test the first page is capped and links to the next one."""
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual(len(response.context['products']), PRODUCT_PAGE_SIZE)
+        self.assertContains(response, 'hx-trigger="revealed"')
+    
+    def test_htmx_page_returns_cards_only(self):
+        """Test infinite scroll requests receive just the next cards."""
+        response = self.client.get(reverse('product_list'), {'page': 2}, HTTP_HX_REQUEST='true')
+        self.assertEqual(len(response.context['products']), 5)
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'hx-trigger="revealed"')
+    
+    def test_grid_rows_carry_their_category(self):
+        """Test cards read the category through select_related."""
+        with self.assertNumQueries(1):
+            names = {product.category.name for product in filter_products()}
+        self.assertEqual(names, {'Electronics'})
+    
+    @override_settings(CATALOG_STREAM_PRODUCT_LIST=True)
+    def test_streamed_page_flushes_layout_first(self):
+        """Test the layout is sent before any product row is read."""
+        response = self.client.get(reverse('product_list'))
+        chunks = iter(response.streaming_content)
+        with CaptureQueriesContext(connection) as queries:
+            head = next(chunks).decode()
+        self.assertIn('MarketPlace', head)
+        self.assertFalse(any('catalog_product' in query['sql'] for query in queries))
+        
+        body = b''.join(chunks).decode()
+        self.assertEqual(body.count('View Details'), PRODUCT_PAGE_SIZE)
+        self.assertIn('page=2', body)
+        self.assertTrue(body.rstrip().endswith('</html>'))
+
+
+class TestProductRowSerializer(TestCase):
+    """Tests for the values()-based product API read path."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics',
+            description='Gadgets'
+        )
+        self.product = Product.objects.create(
+            name='Row Product',
+            slug='row-product',
+            description='Served from rows',
+            price=Decimal('5.5'),
+            category=self.category,
+            stock_quantity=3,
+            image='products/row product.jpg'
+        )
+        Product.objects.create(
+            name='Plain Product',
+            slug='plain-product',
+            description='No image',
+            price=Decimal('12'),
+            category=self.category,
+            stock_quantity=1
+        )
+    
+    def expected(self, queryset, request):
+        return [
+            dict(item)
+            for item in ProductSerializer(queryset, many=True, context={'request': request}).data
+        ]
+    
+    def test_rows_match_model_serializer(self):
+        """Test row output is identical to ProductSerializer output."""
+        request = RequestFactory().get('/')
+        products = Product.objects.order_by('id')
+        rows = product_rows.serialize(product_rows.values(products), {'request': request})
+        self.assertEqual(rows, self.expected(products, request))
+        self.assertEqual(rows[0]['price'], '5.50')
+        self.assertTrue(rows[0]['image'].startswith('http://testserver/media/'))
+    
+    def test_list_retrieve_and_by_category_use_rows(self):
+        """Test the API endpoints return the serializer shape in one query each."""
+        with self.assertNumQueries(2):
+            listed = self.client.get(reverse('product-list')).data['results']
+        with self.assertNumQueries(1):
+            detail = self.client.get(reverse('product-detail', args=[self.product.id])).data
+        by_category = self.client.get(
+            reverse('product-by-category'), {'category': 'electronics'}
+        ).data['results']
+        
+        request = RequestFactory().get('/')
+        expected = self.expected(Product.objects.order_by('-created_at', '-id'), request)
+        self.assertEqual(listed, expected)
+        self.assertEqual(detail, next(p for p in expected if p['id'] == self.product.id))
+        self.assertEqual(by_category, expected)
+    
+    def test_retrieve_missing_product_returns_404(self):
+        """Test retrieving an inactive product returns 404."""
+        self.product.is_active = False
+        self.product.save()
+        response = self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestProductsByCategory(TestCase):
+    """Integration tests for the paginated, cached by_category endpoint."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Books', slug='books')
+        other = Category.objects.create(name='Toys', slug='toys')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Book {i}',
+                slug=f'book-{i}',
+                description='Read me',
+                price=Decimal('10.00'),
+                category=self.category if i < 5 else other,
+                stock_quantity=1
+            )
+            for i in range(8)
+        ])
+        self.url = reverse('product-by-category')
+    
+    def test_pages_through_category_only(self):
+        """Test by_category paginates and only returns the category's products."""
+        response = self.client.get(self.url, {'category': 'books', 'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+        
+        seen = []
+        url = response.data['next']
+        while url:
+            page = self.client.get(url)
+            seen.extend(product['slug'] for product in page.data['results'])
+            url = page.data['next']
+        self.assertEqual(len(seen), 3)
+        self.assertTrue(all(slug.startswith('book-') and int(slug[5:]) < 5 for slug in seen))
+    
+    def test_repeat_requests_are_served_from_cache(self):
+        """Test the second identical request runs no queries."""
+        first = self.client.get(self.url, {'category': 'books'})
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {'category': 'books'})
+        self.assertEqual(first.data, second.data)
+    
+    def test_etag_and_cache_control(self):
+        """Test ETag revalidation returns 304 until the catalog changes."""
+        response = self.client.get(self.url, {'category': 'books'})
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'category': 'books'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(slug='book-0').first().save()
+        response = self.client.get(self.url, {'category': 'books'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_cached_pages_show_current_stock(self):
+        """Test a checkout shows up in cached pages without invalidating them."""
+        response = self.client.get(self.url, {'category': 'books'})
+        etag = response['ETag']
+        book = Product.objects.get(slug='book-0')
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(
+                User.objects.create_user(username='reader'), {str(book.id): 1}, shipping_address='1 Test St',
+                shipping_city='Test City', shipping_postal_code='12345', shipping_country='US'
+            )
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'category': 'books'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        row = next(row for row in response.data['results'] if row['id'] == book.id)
+        self.assertEqual(row['stock_quantity'], 0)
+    
+    def test_unknown_category_returns_404(self):
+        """Test an unknown slug returns 404."""
+        response = self.client.get(self.url, {'category': 'missing'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestConditionalGet(TestCase):
+    """Tests for ETag/Last-Modified handling on catalog pages and API."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Conditional Product',
+            slug='conditional-product',
+            description='Cacheable',
+            price=Decimal('19.99'),
+            category=self.category,
+            stock_quantity=5
+        )
+        self.user = User.objects.create_user(username='conditional', password='condpass123')
+        self.detail_url = reverse('product_detail', args=[self.product.slug])
+    
+    def test_detail_revalidates_without_rendering(self):
+        """Test a matching If-None-Match returns 304 without invoking the template engine."""
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        
+        with patch('django.template.base.Template.render') as render:
+            with self.assertNumQueries(0):
+                response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+    
+    def test_detail_if_modified_since(self):
+        """Test If-Modified-Since is answered from the product's updated_at."""
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        with patch('django.template.base.Template.render') as render:
+            response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+    
+    def test_product_change_invalidates_etag(self):
+        """Test saving the product changes the page's ETag."""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.product.price = Decimal('9.99')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '9.99')
+    
+    def test_pages_with_csrf_token_are_private(self):
+        """Test anonymous pages embedding a CSRF token are not offered to shared caches."""
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        
+        response = Client().get(reverse('product_list'))
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertIn('public', response['Cache-Control'])
+    
+    def test_browsable_api_is_private(self):
+        """Test API pages that render forms after the view returns are checked once rendered."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('category-list'), HTTP_ACCEPT='text/html')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertNotIn('public', response['Cache-Control'])
+    
+    def test_list_and_partial_have_distinct_etags(self):
+        """Test full pages and HTMX partials never share a validator."""
+        url = reverse('product_list')
+        page = self.client.get(url)
+        partial = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertNotEqual(page['ETag'], partial['ETag'])
+        self.assertIn('HX-Request', page['Vary'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=page['ETag']).status_code, 304)
+    
+    def test_signed_in_pages_are_private_and_track_the_cart(self):
+        """Test signed-in pages are private and revalidate when the cart changes."""
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        session = self.client.session
+        save_cart(session, {str(self.product.id): 1})
+        session.save()
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_checkout_refreshes_stock_not_the_catalog(self):
+        """Test a checkout changes the shown stock while cached catalog entries stay valid."""
+        other = Product.objects.create(
+            name='Bystander', slug='bystander', description='Not ordered',
+            price=Decimal('5.00'), category=self.category, stock_quantity=3
+        )
+        detail = self.client.get(self.detail_url)
+        listed = self.client.get(reverse('product_list'))
+        api = self.client.get(reverse('product-detail', args=[self.product.id]), HTTP_ACCEPT='application/json')
+        bystander_url = reverse('product_detail', args=[other.slug])
+        bystander = self.client.get(bystander_url)
+        version = get_version('product')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(
+                self.user, {str(self.product.id): 2}, shipping_address='1 Test St',
+                shipping_city='Test City', shipping_postal_code='12345', shipping_country='US'
+            )
+        self.assertEqual(get_version('product'), version)
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '3 available')
+        response = self.client.get(reverse('product_list'), HTTP_IF_NONE_MATCH=listed['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse('product-detail', args=[self.product.id]),
+            HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=api['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], 3)
+        with self.assertNumQueries(0):
+            response = self.client.get(bystander_url, HTTP_IF_NONE_MATCH=bystander['ETag'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_api_responses_carry_validators(self):
+        """Test catalog API views answer If-None-Match without running the view."""
+        for url in (reverse('product-list'), reverse('product-detail', args=[self.product.id]),
+                    reverse('category-list')):
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertIn('public', response['Cache-Control'])
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=response['ETag']
+                )
+            self.assertEqual(response.status_code, 304)
+
+
+class TestProductImageUrls(TestCase):
+    """Tests for image URLs resolved at save time."""
+    
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Home Electronics', slug='home-electronics')
+        self.product = Product.objects.create(
+            name='Gaming Laptop',
+            slug='gaming-laptop',
+            description='Fast',
+            price=Decimal('999.00'),
+            category=self.category,
+            stock_quantity=2
+        )
+    
+    def test_matcher_keeps_rule_priority(self):
+        """Test the compiled matcher picks the same rule as scanning the rules in order."""
+        def scan(name):
+            return next((url for key, url in PRODUCT_IMAGES.items() if key in name), None)
+        
+        names = ['a book about laptops', 'python programming book', 'denim jeans', 'tshirt',
+                 'wireless headphones', 'smartphone tablet', 'garden hose', 'tablet\nlaptop']
+        for name in names:
+            self.assertEqual(match_product_name(name), scan(name), name)
+    
+    def test_url_stored_on_save(self):
+        """Test saving resolves name, category and uploaded-image rules."""
+        self.assertEqual(self.product.image_url, PRODUCT_IMAGES['laptop'])
+        
+        self.product.name = 'Desk Lamp'
+        self.product.save(update_fields=['name'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_url, CATEGORY_IMAGES['electronics'])
+        
+        self.product.image = 'products/lamp.jpg'
+        self.product.save()
+        self.assertEqual(self.product.image_url, '/media/products/lamp.jpg')
+    
+    def test_upload_url_uses_stored_name(self):
+        """Test the URL is resolved after the upload is stored under ``upload_to``."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            urls = []
+            for product in (self.product, Product.objects.create(
+                name='Camera', slug='camera', description='Sharp',
+                price=Decimal('300.00'), category=self.category, stock_quantity=1
+            )):
+                product.image = SimpleUploadedFile('camera.png', b'png', content_type='image/png')
+                product.save()
+                product.refresh_from_db()
+                self.assertEqual(product.image_url, product.image.url)
+                urls.append(product.image_url)
+        self.assertTrue(urls[0].startswith('/media/products/camera'))
+        self.assertNotEqual(urls[0], urls[1])
+    
+    def test_loaddata_resolves_urls(self):
+        """Test fixture rows, saved raw without ``save()``, get their URL."""
+        call_command('loaddata', 'sample_data', verbosity=0)
+        laptop = Product.objects.get(slug='laptop')
+        self.assertEqual(laptop.image_url, PRODUCT_IMAGES['laptop'])
+        self.assertFalse(Product.objects.filter(image_url='').exists())
+    
+    def test_category_rename_refreshes_fallbacks(self):
+        """Test renaming a category updates products that fall back to it."""
+        lamp = Product.objects.create(
+            name='Desk Lamp', slug='desk-lamp', description='Bright',
+            price=Decimal('20.00'), category=self.category, stock_quantity=1
+        )
+        self.category.name = 'Clothing Outlet'
+        self.category.save()
+        lamp.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(lamp.image_url, CATEGORY_IMAGES['clothing'])
+        self.assertEqual(self.product.image_url, PRODUCT_IMAGES['laptop'])
+    
+    def test_backfill_command(self):
+        """Test backfill_image_urls fills rows written without save()."""
+        Product.objects.update(image_url='')
+        out = StringIO()
+        call_command('backfill_image_urls', stdout=out)
+        self.assertIn('Updated image_url on 1 products', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_url, PRODUCT_IMAGES['laptop'])
+    
+    def test_cards_render_without_queries_or_matching(self):
+        """Test rendering product cards reads the stored URL only."""
+        products = list(Product.objects.all())
+        with patch('apps.catalog.templatetags.product_filters.resolve_image_url') as resolve:
+            with self.assertNumQueries(0):
+                html = render_to_string('catalog/partials/product_cards.html', {'products': products})
+        resolve.assert_not_called()
+        self.assertIn(PRODUCT_IMAGES['laptop'].replace('&', '&amp;'), html)
+
+
+class TestProductThumbnails(TestCase):
+    """Tests for the responsive thumbnail pipeline."""
+    
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root, CATALOG_THUMBNAIL_WIDTHS=[320, 640, 960])
+        media.enable()
+        self.addCleanup(media.disable)
+        
+        self.category = Category.objects.create(name='Cameras', slug='cameras')
+        self.product = Product.objects.create(
+            name='Mirrorless Camera',
+            slug='mirrorless-camera',
+            description='Sharp',
+            price=Decimal('899.00'),
+            category=self.category,
+            stock_quantity=3,
+            image=self.upload('camera.png', (1200, 800))
+        )
+    
+    def upload(self, name, size):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+    
+    def test_generates_hashed_derivatives_without_upscaling(self):
+        """Test every width and format is written once under a content-hashed name."""
+        manifest = generate_thumbnails(self.product.image.name)
+        self.assertEqual(manifest['source'], self.product.image.name)
+        self.assertEqual(sorted(manifest['webp'], key=int), ['320', '640', '960'])
+        for path in list(manifest['webp'].values()) + list(manifest['jpeg'].values()):
+            self.assertTrue(default_storage.exists(path))
+            self.assertRegex(path, r'^products/thumbs/camera-\d+w\.[0-9a-f]{12}\.(webp|jpg)$')
+        with default_storage.open(manifest['jpeg']['640']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (640, 427))
+        
+        self.assertEqual(generate_thumbnails(self.product.image.name), manifest)
+        
+        self.product.image = self.upload('tiny.png', (200, 100))
+        self.product.save()
+        self.assertEqual(list(generate_thumbnails(self.product.image.name)['jpeg']), ['200'])
+    
+    def test_manifest_stored_and_rendered_as_srcset(self):
+        """Test the task's manifest feeds the srcset filter and the product page."""
+        update_product_thumbnails(self.product.id)
+        self.product.refresh_from_db()
+        self.assertRegex(
+            product_srcset(self.product, 'webp'),
+            r'^/media/products/thumbs/\S+\.webp 320w, \S+ 640w, \S+ 960w$'
+        )
+        response = Client().get(reverse('product_detail', args=[self.product.slug]))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '.jpg 960w')
+    
+    def test_new_upload_queues_thumbnail_task(self):
+        """Test saving a changed image queues the task once, after commit."""
+        with patch('apps.catalog.signals.generate_product_thumbnails') as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.image = self.upload('camera-2.png', (800, 600))
+                self.product.save()
+            task.delay.assert_called_once_with(self.product.id)
+            
+            update_product_thumbnails(self.product.id)
+            self.product.refresh_from_db()
+            task.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.save()
+            task.delay.assert_not_called()
+    
+    def test_regenerate_command_uses_process_pool(self):
+        """Test regenerate_thumbnails fills manifests from worker processes."""
+        out = StringIO()
+        call_command('regenerate_thumbnails', workers=2, missing_only=True, stdout=out)
+        self.assertIn('Regenerated thumbnails for 1 of 1 products (0 failed)', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(set(self.product.thumbnails['jpeg']), {'320', '640', '960'})
@@ -0,0 +1,98 @@
+"""Responsive WebP/JPEG derivatives of uploaded product images.
+
+Derivatives are written next to the uploads under content-hashed names, so
+a URL always points at the same bytes and can be served with an immutable
+far-future cache header. The list of derivatives is kept on the product as
+a manifest: ``{'source': <upload name>, 'webp': {'320': <name>, ...},
+'jpeg': {...}}``.
+"""
+
+import hashlib
+import posixpath
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from .cache import bump_version
+from .models import Product
+
+THUMBNAIL_DIR = 'products/thumbs'
+THUMBNAIL_QUALITY = 80
+
+# manifest key -> (Pillow format, file extension)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=THUMBNAIL_QUALITY, optimize=image_format == 'JPEG')
+    return buffer.getvalue()
+
+
+def generate_thumbnails(name, storage=default_storage):
+    """Write every derivative of the upload ``name`` and return its manifest.
+
+    Widths come from ``CATALOG_THUMBNAIL_WIDTHS`` and are capped at the
+    original width, so images are never upscaled. Files that already exist
+    are left alone, which makes regeneration cheap and idempotent. Touches
+    storage only, never the database, so it is safe to run in a worker
+    process.
+    """
+    with storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    widths = sorted({min(width, image.width) for width in settings.CATALOG_THUMBNAIL_WIDTHS}, reverse=True)
+    manifest = {'source': name, **{key: {} for key in THUMBNAIL_FORMATS}}
+    # Resize largest first and reuse each result, keeping LANCZOS work small.
+    resized = image
+    for width in widths:
+        height = max(round(image.height * width / image.width), 1)
+        resized = resized.resize((width, height), Image.Resampling.LANCZOS)
+        for key, (image_format, extension) in THUMBNAIL_FORMATS.items():
+            data = encode(resized, image_format)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            path = f'{THUMBNAIL_DIR}/{stem}-{width}w.{digest}.{extension}'
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(data))
+            manifest[key][str(width)] = path
+    return manifest
+
+
+def update_product_thumbnails(product_id):
+    """Regenerate one product's thumbnails and store the manifest.
+
+    The manifest is only written if the product still has the image it was
+    built from, so a task racing a newer upload cannot clobber it. Returns
+    the manifest, or ``None`` if nothing was written.
+    """
+    product = Product.objects.filter(pk=product_id).only('id', 'image').first()
+    if product is None:
+        return None
+    manifest = generate_thumbnails(product.image.name) if product.image else {}
+    updated = Product.objects.filter(pk=product_id, image=product.image.name).update(thumbnails=manifest)
+    if not updated:
+        return None
+    bump_version('product')
+    return manifest
+
+
+def srcset(product, key):
+    """Return a ``srcset`` value for one manifest format, or ``''``."""
+    entries = (product.thumbnails or {}).get(key) or {}
+    return ', '.join(
+        f'{default_storage.url(path)} {width}w'
+        for width, path in sorted(entries.items(), key=lambda entry: int(entry[0]))
+    )
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common.utils import for_server
 from . import views
 
 router = DefaultRouter()
@@ -7,7 +8,7 @@ router.register(r'products', views.ProductViewSet, basename='product')
 router.register(r'categories', views.CategoryViewSet, basename='category')
 
 urlpatterns = [
-    path('', views.product_list, name='product_list'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('', for_server(views.product_list, views.aproduct_list), name='product_list'),
+    path('product/<slug:slug>/', for_server(views.product_detail, views.aproduct_detail), name='product_detail'),
     path('api/', include(router.urls)),
 ]
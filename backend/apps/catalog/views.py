@@ -1,57 +1,360 @@
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
-from rest_framework import viewsets, filters
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_datetime
+from rest_framework import fields, viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from common.mixins import EagerLoadingMixin, RowSerializerMixin
+from common.pagination import KeysetPagination
+from common.utils import arender, arender_to_string, get_page_number, get_page_url
+from .cache import CATEGORY_TIMEOUT, PRODUCT_TIMEOUT, acached, apply_stock, cached, stock_levels
+from .conditional import ConditionalAPIMixin, conditional_page
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
+from .search import get_search_backend
+from .serializers import ProductSerializer, CategorySerializer, product_rows
 
 
-def product_list(request):
-    products = Product.objects.filter(is_active=True)
-    category_slug = request.GET.get('category')
-    search_query = request.GET.get('q')
+PRODUCT_PAGE_SIZE = 24
+STREAM_BATCH_SIZE = 6
+STREAM_MARKER = '<!--product-grid-->'
+
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_MIN_PREFIX = 2
+SUGGEST_MAX_PREFIX = 64
+
+
+def filter_products(category_slug=None, search_query=None):
+    products = Product.objects.filter(is_active=True).select_related('category')
     
     if category_slug:
         products = products.filter(category__slug=category_slug)
     
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | Q(description__icontains=search_query)
+        products = get_search_backend().search(products, search_query)
+    return products
+
+
+def get_category_id(slug):
+    """Return the id of the category with ``slug`` (or ``None``), cached."""
+    return cached(
+        'category',
+        f'id:{slug}',
+        lambda: Category.objects.filter(slug=slug).values_list('id', flat=True).first(),
+        CATEGORY_TIMEOUT,
+    )
+
+
+def list_rows(category_slug, search_query, page):
+    """Return the products on a list page plus one more (to tell if there is a next page), cached.
+
+    Their stock is as of when they were cached; see ``apply_stock``.
+    """
+    offset = (page - 1) * PRODUCT_PAGE_SIZE
+    return cached(
+        'product',
+        f'list:{category_slug}:{search_query}:{page}',
+        lambda: list(filter_products(category_slug, search_query)[offset:offset + PRODUCT_PAGE_SIZE + 1]),
+        PRODUCT_TIMEOUT,
+    )
+
+
+def listed_products(request):
+    rows = list_rows(request.GET.get('category'), request.GET.get('q'), get_page_number(request))
+    return [product.pk for product in rows[:PRODUCT_PAGE_SIZE]]
+
+
+def stream_product_list(request, context, products, page):
+    """Stream the product page: layout first, then cards in small batches.
+
+    The layout is rendered once with a marker where the grid goes and split
+    around it, so the browser receives the header and starts fetching assets
+    before any product row has been read.
+    """
+    head, tail = render_to_string(
+        'catalog/product_list.html', dict(context, stream=True), request
+    ).split(STREAM_MARKER)
+    offset = (page - 1) * PRODUCT_PAGE_SIZE
+
+    def render_cards(batch, **extra):
+        return render_to_string(
+            'catalog/partials/product_cards.html', dict({'products': batch}, **extra), request
         )
-    
-    categories = Category.objects.all()
+
+    def generate():
+        yield head
+        rows = products[offset:offset + PRODUCT_PAGE_SIZE + 1].iterator(chunk_size=STREAM_BATCH_SIZE)
+        batch = []
+        seen = 0
+        for product in rows:
+            seen += 1
+            if seen > PRODUCT_PAGE_SIZE:
+                break
+            batch.append(product)
+            if len(batch) == STREAM_BATCH_SIZE:
+                yield render_cards(batch)
+                batch = []
+        has_next = seen > PRODUCT_PAGE_SIZE
+        yield render_cards(
+            batch,
+            next_page_url=get_page_url(request, page + 1) if has_next else None,
+            show_empty=seen == 0,
+        )
+        yield tail
+
+    return StreamingHttpResponse(generate())
+
+
+async def astream_product_list(request, context, products, page):
+    """Async ``stream_product_list``: rows come from ``aiterator()``.
+
+    An async iterator lets the ASGI handler send each chunk as it is made;
+    given a sync one it would collect the whole page first.
+    """
+    rendered = await arender_to_string('catalog/product_list.html', dict(context, stream=True), request)
+    head, tail = rendered.split(STREAM_MARKER)
+    offset = (page - 1) * PRODUCT_PAGE_SIZE
+
+    async def render_cards(batch, **extra):
+        return await arender_to_string(
+            'catalog/partials/product_cards.html', dict({'products': batch}, **extra), request
+        )
+
+    async def generate():
+        yield head
+        rows = products[offset:offset + PRODUCT_PAGE_SIZE + 1].aiterator(chunk_size=STREAM_BATCH_SIZE)
+        batch = []
+        seen = 0
+        async for product in rows:
+            seen += 1
+            if seen > PRODUCT_PAGE_SIZE:
+                break
+            batch.append(product)
+            if len(batch) == STREAM_BATCH_SIZE:
+                yield await render_cards(batch)
+                batch = []
+        has_next = seen > PRODUCT_PAGE_SIZE
+        yield await render_cards(
+            batch,
+            next_page_url=get_page_url(request, page + 1) if has_next else None,
+            show_empty=seen == 0,
+        )
+        yield tail
+
+    return StreamingHttpResponse(generate())
+
+
+@conditional_page(products_func=listed_products)
+def product_list(request):
+    category_slug = request.GET.get('category')
+    search_query = request.GET.get('q')
+    page = get_page_number(request)
     context = {
-        'products': products,
-        'categories': categories,
         'selected_category': category_slug,
         'search_query': search_query,
     }
+    
+    if settings.CATALOG_STREAM_PRODUCT_LIST and not request.htmx:
+        return stream_product_list(
+            request, context, filter_products(category_slug, search_query), page
+        )
+    
+    rows = apply_stock(list_rows(category_slug, search_query, page))
+    context.update({
+        'products': rows[:PRODUCT_PAGE_SIZE],
+        'next_page_url': get_page_url(request, page + 1) if len(rows) > PRODUCT_PAGE_SIZE else None,
+    })
+    
+    if request.htmx:
+        return render(request, 'catalog/partials/product_cards.html', context)
     return render(request, 'catalog/product_list.html', context)
 
 
+@conditional_page(products_func=listed_products)
+async def aproduct_list(request):
+    """Async ``product_list``, for the ``'asgi'`` server profile."""
+    category_slug = request.GET.get('category')
+    search_query = request.GET.get('q')
+    page = get_page_number(request)
+    context = {
+        'selected_category': category_slug,
+        'search_query': search_query,
+    }
+    
+    if settings.CATALOG_STREAM_PRODUCT_LIST and not request.htmx:
+        return await astream_product_list(
+            request, context, filter_products(category_slug, search_query), page
+        )
+    
+    offset = (page - 1) * PRODUCT_PAGE_SIZE
+
+    async def load_rows():
+        products = filter_products(category_slug, search_query)[offset:offset + PRODUCT_PAGE_SIZE + 1]
+        return [product async for product in products]
+
+    rows = await acached('product', f'list:{category_slug}:{search_query}:{page}', load_rows, PRODUCT_TIMEOUT)
+    rows = await sync_to_async(apply_stock)(rows)
+    context.update({
+        'products': rows[:PRODUCT_PAGE_SIZE],
+        'next_page_url': get_page_url(request, page + 1) if len(rows) > PRODUCT_PAGE_SIZE else None,
+    })
+    
+    if request.htmx:
+        return await arender(request, 'catalog/partials/product_cards.html', context)
+    return await arender(request, 'catalog/product_list.html', context)
+
+
+def get_product(slug):
+    """Return the active product with ``slug`` (or ``None``), cached.
+
+    Its stock is as of when it was cached; see ``apply_stock``.
+    """
+    return cached(
+        'product',
+        f'detail:{slug}',
+        lambda: Product.objects.select_related('category').filter(slug=slug, is_active=True).first(),
+        PRODUCT_TIMEOUT,
+    )
+
+
+async def aget_product(slug):
+    """Async ``get_product``; shares its cache entries."""
+    return await acached(
+        'product',
+        f'detail:{slug}',
+        lambda: Product.objects.select_related('category').filter(slug=slug, is_active=True).afirst(),
+        PRODUCT_TIMEOUT,
+    )
+
+
+def shown_product(request, slug):
+    product = get_product(slug)
+    return [product.pk] if product else []
+
+
+def product_last_modified(request, slug):
+    product = get_product(slug)
+    if product is None:
+        return None
+    # Checkouts touch updated_at along with the stock.
+    return stock_levels([product.pk]).get(product.pk, (None, product.updated_at))[1]
+
+
+@conditional_page(last_modified_func=product_last_modified, products_func=shown_product)
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, is_active=True)
+    product = get_product(slug)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    apply_stock([product])
     context = {'product': product}
     return render(request, 'catalog/product_detail.html', context)
 
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+@conditional_page(last_modified_func=product_last_modified, products_func=shown_product)
+async def aproduct_detail(request, slug):
+    """Async ``product_detail``, for the ``'asgi'`` server profile."""
+    product = await aget_product(slug)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    await sync_to_async(apply_stock)([product])
+    context = {'product': product}
+    return await arender(request, 'catalog/product_detail.html', context)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """``?search=`` through the configured catalog search backend.
+
+    Results are ranked best match first unless the client asks for an
+    explicit ``?ordering=``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        results = get_search_backend().search(queryset, query)
+        if request.query_params.get('ordering'):
+            results = results.order_by(*queryset.query.order_by)
+        return results
+
+
+class ProductViewSet(
+    ConditionalAPIMixin, EagerLoadingMixin, RowSerializerMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    row_serializer = product_rows
+    pagination_class = KeysetPagination
+    filter_backends = [filters.OrderingFilter, ProductSearchFilter]
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'created_at']
     ordering = ['-created_at']
 
+    def response_stock(self, data):
+        rows = data.get('results', [data]) if isinstance(data, dict) else []
+        return {
+            row['id']: (row['stock_quantity'], parse_datetime(row['updated_at']))
+            for row in rows if 'stock_quantity' in row
+        }
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Name completions for the search box, cached per prefix.
+
+        Returns a JSON list, or ``<option>`` tags when requested by HTMX.
+        """
+        prefix = request.query_params.get('q', '').strip()[:SUGGEST_MAX_PREFIX]
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', SUGGEST_LIMIT)), SUGGEST_MAX_LIMIT))
+        except ValueError:
+            limit = SUGGEST_LIMIT
+        
+        suggestions = []
+        if len(prefix) >= SUGGEST_MIN_PREFIX:
+            suggestions = cached(
+                'product',
+                f'suggest:{prefix.lower()}:{limit}',
+                lambda: get_search_backend().suggest(self.get_queryset(), prefix, limit),
+                PRODUCT_TIMEOUT,
+            )
+        
+        if request.htmx:
+            return render(request, 'catalog/partials/suggestions.html', {'suggestions': suggestions})
+        return Response(suggestions)
+
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        category_slug = request.query_params.get('category')
-        products = self.queryset.filter(category__slug=category_slug)
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        """Products in one category, paginated and cached per URL and catalog version.
+
+        Ordering, search and cursor parameters work as on the list endpoint.
+        Like every catalog API response it carries a version-derived ``ETag``
+        and a public ``Cache-Control`` (see ``ConditionalAPIMixin``), so a CDN
+        can absorb browse traffic.
+        """
+        category_id = get_category_id(request.query_params.get('category', ''))
+        if category_id is None:
+            raise NotFound('Category not found.')
+        
+        def produce():
+            rows = self.get_row_queryset().filter(category_id=category_id)
+            page = self.paginate_queryset(rows)
+            return self.get_paginated_response(self.serialize_rows(page)).data
+        
+        url = request.build_absolute_uri()
+        data = cached('product', f'by_category:{url}', produce, PRODUCT_TIMEOUT)
+        levels = stock_levels(row['id'] for row in data['results'])
+        for row in data['results']:
+            if row['id'] in levels:
+                stock_quantity, updated_at = levels[row['id']]
+                row['stock_quantity'] = stock_quantity
+                row['updated_at'] = fields.DateTimeField().to_representation(updated_at)
+        return Response(data)
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalAPIMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -0,0 +1,185 @@
+import statistics
+import time
+import uuid
+from itertools import groupby
+from datetime import datetime, time as day_start, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, DecimalField, F, Sum
+from django.utils import timezone
+from apps.catalog.models import Category, Product
+from apps.core.services import SALES_STATUSES, category_sales, product_sales, record_sales
+from apps.orders.models import Order, OrderItem, OrderStatusChange
+from apps.orders.transitions import bulk_transition
+
+BATCH_SIZE = 5000
+# Mostly paid orders, with some unpaid and cancelled ones the rollups must leave out
+STATUSES = ('delivered',) * 5 + ('shipped', 'processing', 'pending', 'cancelled', 'cancelled')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic order items, then compare date-range sales reports read from '
+        'orders with the same reports read from the daily rollups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000_000, help='Synthetic order items.')
+        parser.add_argument('--items-per-order', type=int, default=4)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread orders over.')
+        parser.add_argument('--range-days', type=int, default=30, help='Days covered by the timed reports.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help='Leave the synthetic data in place.')
+
+    def time_query(self, run):
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            result = run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), result
+
+    def generate(self, run, options):
+        categories = Category.objects.bulk_create([
+            Category(name=f'Sales Bench {run} {i}', slug=f'sales-bench-{run}-{i}')
+            for i in range(options['categories'])
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Sales Bench {run} {i}',
+                slug=f'sales-bench-{run}-{i}',
+                description='Sales benchmark product',
+                price=Decimal(5 + i % 50),
+                category=categories[i % len(categories)],
+                stock_quantity=10 ** 6,
+            )
+            for i in range(options['products'])
+        ])
+        user = get_user_model().objects.create_user(username=f'sales-bench-{run}')
+
+        per_order = options['items_per_order']
+        order_count = options['items'] // per_order
+        days = options['days']
+        today = timezone.localdate()
+        self.stdout.write(f'generating {order_count} orders / {order_count * per_order} items ...')
+        started = time.perf_counter()
+        for start in range(0, order_count, BATCH_SIZE):
+            size = min(BATCH_SIZE, order_count - start)
+            orders = Order.objects.bulk_create([
+                Order(
+                    user=user, status=STATUSES[(start + i) % len(STATUSES)], total_amount=Decimal('0.00'),
+                    shipping_address='1 Bench St', shipping_city='Bench', shipping_postal_code='00000',
+                    shipping_country='Bench',
+                )
+                for i in range(size)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=1 + (order.pk + line) % 3,
+                    price=product.price,
+                    category_id=product.category_id,
+                )
+                for order in orders
+                for line, product in enumerate(
+                    products[(order.pk * 7 + line * 13) % len(products)] for line in range(per_order)
+                )
+            ], batch_size=BATCH_SIZE)
+            # auto_now_add stamps every order with now; spread them evenly over the history.
+            by_day = groupby(enumerate(orders, start), key=lambda pair: pair[0] * days // order_count)
+            for day_offset, group in by_day:
+                group = [order.pk for _, order in group]
+                Order.objects.filter(pk__gte=group[0], pk__lte=group[-1]).update(
+                    created_at=timezone.make_aware(
+                        datetime.combine(today - timedelta(days=days - 1 - day_offset), day_start(12))
+                    )
+                )
+        self.stdout.write(f'  generated in {time.perf_counter() - started:.1f}s')
+        return user, categories, products
+
+    def raw_product_report(self, start, end, limit):
+        """The report as staff ran it before the rollups: aggregate the order items."""
+        since = timezone.make_aware(datetime.combine(start, day_start()))
+        until = timezone.make_aware(datetime.combine(end + timedelta(days=1), day_start()))
+        return list(
+            OrderItem.objects.filter(
+                order__created_at__gte=since, order__created_at__lt=until, order__status__in=SALES_STATUSES
+            )
+            .values('product_id')
+            .annotate(
+                units=Sum('quantity'),
+                revenue=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                orders=Count('order_id', distinct=True),
+            )
+            .order_by('-revenue', 'product_id')[:limit]
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        run = uuid.uuid4().hex[:8]
+        user, categories, products = self.generate(run, options)
+        try:
+            started = time.perf_counter()
+            recorded = 0
+            while count := record_sales():
+                recorded += count
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'backfill: {recorded} orders in {elapsed:.1f}s ({recorded / elapsed:.0f} orders/s)'
+            )
+
+            end = timezone.localdate()
+            start = end - timedelta(days=options['range_days'] - 1)
+            limit = Product.objects.count()
+            raw_ms, raw = self.time_query(lambda: self.raw_product_report(start, end, limit))
+            rollup_ms, rollup = self.time_query(lambda: product_sales(start, end, limit=limit))
+            category_ms, _ = self.time_query(lambda: category_sales(start, end))
+            daily_ms, _ = self.time_query(lambda: category_sales(start, end, by_day=True, limit=1000))
+            self.stdout.write(f'{options["range_days"]}-day product report')
+            self.stdout.write(f'  from order items {raw_ms:9.1f} ms')
+            self.stdout.write(f'  from rollups     {rollup_ms:9.1f} ms   ({raw_ms / rollup_ms:.0f}x faster)')
+            self.stdout.write(f'{options["range_days"]}-day category report from rollups {category_ms:.1f} ms, by day {daily_ms:.1f} ms')
+            # Other orders in the database may fall in the range too; compare the synthetic products.
+            bench_ids = {product.pk for product in products}
+            matches = [
+                (row['product_id'], row['units'], row['revenue'], row['orders'])
+                for row in raw if row['product_id'] in bench_ids
+            ] == [
+                (row['product_id'], row['units'], row['revenue'], row['orders'])
+                for row in rollup if row['product_id'] in bench_ids
+            ]
+            self.stdout.write(f'rollup report matches order items: {matches}')
+
+            # Incremental upkeep: freshly placed orders are paid, then cancelled, in one batch each.
+            new_orders = Order.objects.bulk_create([
+                Order(
+                    user=user, total_amount=Decimal('0.00'), shipping_address='1 Bench St',
+                    shipping_city='Bench', shipping_postal_code='00000', shipping_country='Bench',
+                )
+                for _ in range(1000)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=products[order.pk % len(products)], quantity=1, price=Decimal('5.00'))
+                for order in new_orders
+            ])
+            batch = Order.objects.filter(pk__in=[order.pk for order in new_orders])
+            for target in ('processing', 'cancelled'):
+                started = time.perf_counter()
+                count = len(bulk_transition(batch, target))
+                self.stdout.write(
+                    f'{target}: {count} orders moved, rollups included, '
+                    f'in {(time.perf_counter() - started) * 1000:.1f} ms'
+                )
+        finally:
+            if not options['keep']:
+                self.stdout.write('cleaning up ...')
+                OrderStatusChange.objects.filter(order__user=user).delete()
+                OrderItem.objects.filter(order__user=user).delete()
+                Order.objects.filter(user=user).delete()
+                user.delete()
+                Product.objects.filter(pk__in=[product.pk for product in products]).delete()
+                Category.objects.filter(pk__in=[category.pk for category in categories]).delete()
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from apps.catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn once per server profile (see SERVER_PROFILE in settings) and '
+        'compare throughput and latency of the hot pages under concurrent clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='wsgi,asgi')
+        parser.add_argument('--clients', type=int, default=500, help='Concurrent clients.')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load per profile.')
+        parser.add_argument('--warmup', type=float, default=3.0, help='Seconds of unmeasured load first.')
+        parser.add_argument('--workers', type=int, default=3, help='Gunicorn worker processes.')
+        parser.add_argument('--port', type=int, default=0, help='Port to bind; 0 picks a free one.')
+
+    def paths(self):
+        product = Product.objects.filter(is_active=True).only('slug').order_by('-created_at', '-id').first()
+        if product is None:
+            raise CommandError('No active products; generate some with `manage.py generate_products`.')
+        return [
+            reverse('product_list'),
+            reverse('product_detail', args=[product.slug]),
+            reverse('cart_view'),
+            reverse('cart_summary'),
+        ]
+
+    def start_server(self, profile, port, workers):
+        env = {
+            **os.environ,
+            'SERVER_PROFILE': profile,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(workers),
+        }
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn ({profile}) exited with status {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'gunicorn ({profile}) did not start listening on port {port}')
+
+    async def fetch(self, port, path):
+        """One GET on a fresh connection; returns the status code."""
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        return int(response.split(b' ', 2)[1])
+
+    async def load(self, port, paths, clients, warmup, duration):
+        started = time.monotonic()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+        timings, errors = [], 0
+
+        async def client(offset):
+            nonlocal errors
+            i = offset
+            while time.monotonic() < stop_at:
+                request_started = time.monotonic()
+                try:
+                    status = await self.fetch(port, paths[i % len(paths)])
+                except (OSError, IndexError, ValueError):
+                    status = None
+                i += 1
+                if request_started < measure_from:
+                    continue
+                if status == 200:
+                    timings.append(time.monotonic() - request_started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(client(offset) for offset in range(clients)))
+        return sorted(timings), errors, time.monotonic() - measure_from
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'].split(',')
+        unknown = set(profiles) - {'wsgi', 'asgi'}
+        if unknown:
+            raise CommandError(f'Unknown server profiles: {", ".join(sorted(unknown))}')
+        paths = self.paths()
+        self.stdout.write(f'{options["clients"]} clients, {options["workers"]} workers, paths: {" ".join(paths)}')
+
+        for profile in profiles:
+            port = options['port']
+            if not port:
+                with socket.socket() as probe:
+                    probe.bind(('127.0.0.1', 0))
+                    port = probe.getsockname()[1]
+            server = self.start_server(profile, port, options['workers'])
+            try:
+                timings, errors, wall = asyncio.run(self.load(
+                    port, paths, options['clients'], options['warmup'], options['duration'],
+                ))
+            finally:
+                server.terminate()
+                server.wait()
+            if not timings:
+                self.stdout.write(f'{profile:<5} no successful requests ({errors} errors)')
+                continue
+            self.stdout.write(
+                f'{profile:<5} {len(timings) / wall:8.1f} req/s   '
+                f'p50 {statistics.median(timings) * 1000:7.1f} ms   '
+                f'p95 {timings[int(len(timings) * 0.95) - 1] * 1000:7.1f} ms   '
+                f'p99 {timings[int(len(timings) * 0.99) - 1] * 1000:7.1f} ms   '
+                f'errors {errors}'
+            )
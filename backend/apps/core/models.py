@@ -1,3 +1,47 @@
 """Cross-cutting models such as audit logs or site configuration."""
 
+from decimal import Decimal
+from django.db import models
+from apps.catalog.models import Category, Product
 
+
+class SalesRollup(models.Model):
+    """Units, revenue and orders for one day, maintained by ``services.record_sales``.
+
+    ``orders`` counts the orders that included the product (or a product
+    in the category), so summing it over days stays exact: each order
+    falls on a single day.
+    """
+    date = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ProductDailySales(SalesRollup):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ['product', 'date']
+        indexes = [
+            models.Index(fields=['date', 'product']),
+        ]
+
+    def __str__(self):
+        return f"Product {self.product_id} on {self.date}: {self.units} units"
+
+
+class CategoryDailySales(SalesRollup):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ['category', 'date']
+        indexes = [
+            models.Index(fields=['date', 'category']),
+        ]
+
+    def __str__(self):
+        return f"Category {self.category_id} on {self.date}: {self.units} units"
@@ -1,3 +1,35 @@
 """Serializer placeholders for shared endpoints (health, config, notifications)."""
 
+from rest_framework import serializers
 
+REPORT_MAX_LIMIT = 1000
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    """Query parameters of the sales reports."""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    by = serializers.ChoiceField(choices=['total', 'day'], default='total')
+    limit = serializers.IntegerField(min_value=1, max_value=REPORT_MAX_LIMIT, default=100)
+    category = serializers.SlugField(required=False)
+
+    def validate(self, data):
+        if data['end'] < data['start']:
+            raise serializers.ValidationError('end must not be before start.')
+        return data
+
+
+class SalesRowSerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    name = serializers.CharField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    orders = serializers.IntegerField()
+
+
+class ProductSalesSerializer(SalesRowSerializer):
+    product = serializers.IntegerField(source='product_id')
+
+
+class CategorySalesSerializer(SalesRowSerializer):
+    category = serializers.IntegerField(source='category_id')
@@ -1,3 +1,165 @@
-"""Shared service helpers (messaging, notifications, cross-app utilities)."""
+"""Shared service helpers (messaging, notifications, cross-app utilities).
 
+Sales analytics: paid orders are added to the daily product and category
+rollups by ``orders.transitions`` as they enter ``SALES_STATUSES``, and
+taken out again if cancelled; ``record_sales`` backfills existing orders
+one chunk at a time. The report helpers answer date-range queries from the
+rollups alone, never touching orders.
+"""
 
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem
+from .models import CategoryDailySales, ProductDailySales
+
+# Statuses of a paid order; an order counts in the sales rollups while in one.
+SALES_STATUSES = ('processing', 'shipped', 'delivered')
+# Orders backfilled per transaction
+ROLLUP_CHUNK_SIZE = 2000
+
+
+def _compile(model, rows):
+    qn = connection.ops.quote_name
+    select, params = rows.query.get_compiler(connection=connection).as_sql()
+    totals = [qn(name) for name in ('units', 'revenue', 'orders')]
+    return qn, qn(model._meta.db_table), totals, select, params
+
+
+def _increment(model, key, rows):
+    """Add each of ``rows`` (day, ``key`` and totals) to its ``(date, key)`` rollup.
+
+    One ``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` (PostgreSQL and
+    SQLite) creates the missing rollups and increments the rest inside the
+    database: the totals never round-trip through Python, and concurrent
+    workers cannot lose each other's increments.
+    """
+    qn, table, totals, select, params = _compile(model, rows)
+    columns = ', '.join([qn('date'), qn(key), *totals])
+    increments = ', '.join(f'{name} = {table}.{name} + EXCLUDED.{name}' for name in totals)
+    with connection.cursor() as cursor:
+        # "WHERE true" keeps SQLite from reading ON CONFLICT as a join constraint.
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT {qn("day")}, {qn(key)}, {", ".join(totals)} FROM ({select}) AS totals WHERE true '
+            f'ON CONFLICT ({qn(key)}, {qn("date")}) DO UPDATE SET {increments}',
+            params,
+        )
+
+
+def _decrement(model, key, rows):
+    """Subtract each of ``rows`` from its ``(date, key)`` rollup, added earlier by ``_increment``.
+
+    One ``UPDATE ... FROM`` (PostgreSQL, SQLite 3.33+) rather than an
+    upsert, whose proposed negative row would fail the columns' ``>= 0``
+    checks before the conflict is found.
+    """
+    qn, table, totals, select, params = _compile(model, rows)
+    decrements = ', '.join(f'{name} = {table}.{name} - totals.{name}' for name in totals)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {decrements} FROM ({select}) AS totals '
+            f'WHERE {table}.{qn("date")} = totals.{qn("day")} AND {table}.{qn(key)} = totals.{qn(key)}',
+            params,
+        )
+
+
+def _sales(order_ids):
+    """Per day and product, and per day and category, totals of ``order_ids``' items.
+
+    Orders count on the day they were placed, and items under the category
+    stored on them, so removals hit the rollups that additions did.
+    """
+    items = OrderItem.objects.filter(order_id__in=order_ids).annotate(day=TruncDate('order__created_at'))
+    totals = {
+        'units': Sum('quantity'),
+        'revenue': Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        'orders': Count('order_id', distinct=True),
+    }
+    return (
+        items.values('day', 'product_id').annotate(**totals),
+        items.filter(category__isnull=False).values('day', 'category_id').annotate(**totals),
+    )
+
+
+def add_sales(order_ids):
+    """Add ``order_ids`` to the rollups; the caller flags them ``sales_recorded`` in the same transaction."""
+    # Items not written by place_order (imports, fixtures) take the product's category now.
+    uncategorized = OrderItem.objects.filter(order_id__in=order_ids, category__isnull=True)
+    if uncategorized.exists():
+        uncategorized.update(
+            category_id=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('category_id')[:1])
+        )
+    products, categories = _sales(order_ids)
+    _increment(ProductDailySales, 'product_id', products)
+    _increment(CategoryDailySales, 'category_id', categories)
+
+
+def remove_sales(order_ids):
+    """Take recorded ``order_ids`` out of the rollups; the caller clears ``sales_recorded``."""
+    products, categories = _sales(order_ids)
+    _decrement(ProductDailySales, 'product_id', products)
+    _decrement(CategoryDailySales, 'category_id', categories)
+
+
+def record_sales(chunk_size=ROLLUP_CHUNK_SIZE):
+    """Backfill the next ``chunk_size`` paid orders not yet in the rollups.
+
+    For orders that reached ``SALES_STATUSES`` before transitions kept the
+    rollups. They are claimed with ``SKIP LOCKED`` so workers can run side
+    by side, and flagged ``sales_recorded`` in the same transaction, so each
+    order is counted exactly once; a transition waits for the claim, then
+    sees the flag. Returns the number recorded; 0 once caught up.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(status__in=SALES_STATUSES, sales_recorded=False)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not order_ids:
+            return 0
+        add_sales(order_ids)
+        Order.objects.filter(id__in=order_ids).update(sales_recorded=True)
+    return len(order_ids)
+
+
+def _report(rows, key, names, by_day, limit):
+    """Group ``rows`` by ``key`` (and day), then name just the rows returned.
+
+    Grouping on the id alone keeps the join out of the aggregate, which
+    covers every product-day in the range. Rollups emptied by cancellations
+    are left out.
+    """
+    fields = ['date', key] if by_day else [key]
+    ordering = ['date', '-revenue', key] if by_day else ['-revenue', key]
+    results = list(
+        rows.filter(orders__gt=0)
+        .values(*fields)
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders'))
+        .order_by(*ordering)[:limit]
+    )
+    names = dict(names.filter(pk__in={row[key] for row in results}).values_list('pk', 'name'))
+    for row in results:
+        row['name'] = names.get(row[key], '')
+    return results
+
+
+def product_sales(start, end, category=None, by_day=False, limit=100):
+    """Per-product totals for ``start``..``end`` (inclusive), best sellers first.
+
+    ``category`` is a category slug. With ``by_day`` there is a row per
+    product and day instead.
+    """
+    rows = ProductDailySales.objects.filter(date__range=(start, end))
+    if category:
+        rows = rows.filter(product__category__slug=category)
+    return _report(rows, 'product_id', Product.objects.all(), by_day, limit)
+
+
+def category_sales(start, end, by_day=False, limit=100):
+    """Per-category totals for ``start``..``end`` (inclusive), best sellers first."""
+    rows = CategoryDailySales.objects.filter(date__range=(start, end))
+    return _report(rows, 'category_id', Category.objects.all(), by_day, limit)
@@ -1,3 +1,70 @@
 """Background jobs placeholder for email dispatch, cleanup, and analytics."""
 
+from datetime import timedelta
+from celery import shared_task
+from django.utils import timezone
+from apps.catalog.services import release_expired_reservations
+from apps.catalog.thumbnails import update_product_thumbnails
+from apps.orders import services as order_services
+from apps.payments import services as payment_services
+from apps.payments.models import WebhookEvent
 
+
+@shared_task
+def release_expired_stock_reservations():
+    """Periodic sweeper that bulk-deletes stock holds past their TTL."""
+    return release_expired_reservations()
+
+
+@shared_task
+def generate_product_thumbnails(product_id):
+    """Build the responsive derivatives of a product's uploaded image."""
+    update_product_thumbnails(product_id)
+
+
+@shared_task
+def persist_cart(cart_key):
+    """Write-behind of a session cart to its ``Cart`` row (see ``orders.services.write_behind``)."""
+    cart = order_services.flush_cart_snapshot(cart_key)
+    return cart and cart.pk
+
+
+@shared_task(bind=True, max_retries=8)
+def verify_payment(self, payment_id):
+    """Confirm a pending payment with Stripe off the request path.
+
+    Intents still in flight, and Stripe errors, are retried with backoff.
+    """
+    try:
+        status = payment_services.verify_payment(payment_id)
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
+    if status == 'pending':
+        raise self.retry(countdown=2 ** self.request.retries)
+    return status
+
+
+@shared_task(bind=True, max_retries=3)
+def process_webhook_event(self, event_id):
+    """Apply a stored Stripe webhook event to its payment and order."""
+    try:
+        return payment_services.process_webhook_event(event_id)
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            payment_services.fail_webhook_event(event_id, exc)
+            raise
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
+
+
+@shared_task
+def process_pending_webhook_events(older_than=60, limit=500):
+    """Periodic sweeper for stored events whose queued task never ran."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    event_ids = list(
+        WebhookEvent.objects.filter(status='pending', received_at__lt=cutoff)
+        .order_by('received_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+    for event_id in event_ids:
+        process_webhook_event.delay(event_id)
+    return len(event_ids)
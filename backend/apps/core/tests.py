@@ -1,3 +1,391 @@
 """Core app tests placeholder for smoke tests and shared utilities."""
 
+import asyncio
+import importlib
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from apps.catalog.models import Category, Product, StockReservation
+from apps.orders.models import Order, OrderItem
+from apps.orders.services import flush_cart_snapshot, save_cart
+from apps.orders.transitions import bulk_transition, transition_order
+from apps.payments.models import Payment
+from rest_framework.test import APIClient
+from common.middleware import ConcurrencyLimitMiddleware
+from .models import CategoryDailySales, ProductDailySales
+from .services import category_sales, product_sales, record_sales
+from .tasks import release_expired_stock_reservations
 
+User = get_user_model()
+
+URLCONFS = ('apps.catalog.urls', 'apps.orders.urls', 'apps.payments.urls', 'ecommerce_platform.urls')
+
+
+def reload_urlconfs():
+    """Re-import the URLconfs so ``for_server`` picks views for the current ``SERVER_PROFILE``."""
+    for name in URLCONFS:
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+class TestStockReservationSweeper(TestCase):
+    """Unit tests for the periodic reservation sweeper."""
+    
+    def test_sweeper_releases_only_expired_holds(self):
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        product = Product.objects.create(
+            name='Swept Product',
+            slug='swept-product',
+            description='Swept',
+            price=Decimal('9.99'),
+            category=category,
+            stock_quantity=10
+        )
+        now = timezone.now()
+        StockReservation.objects.bulk_create([
+            StockReservation(product=product, cart_key='old', quantity=1, expires_at=now - timedelta(minutes=1)),
+            StockReservation(product=product, cart_key='live', quantity=1, expires_at=now + timedelta(minutes=1)),
+        ])
+        self.assertEqual(release_expired_stock_reservations(), 1)
+        self.assertEqual(
+            list(StockReservation.objects.values_list('cart_key', flat=True)), ['live']
+        )
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class TestAsyncViews(TestCase):
+    """Tests for the async hot views served under the 'asgi' server profile."""
+    
+    def setUp(self):
+        cache.clear()
+        with override_settings(SERVER_PROFILE='asgi'):
+            reload_urlconfs()
+        self.addCleanup(reload_urlconfs)
+        category = Category.objects.create(name='Async', slug='async')
+        self.product = Product.objects.create(
+            name='Async Product',
+            slug='async-product',
+            description='Async',
+            price=Decimal('12.50'),
+            category=category,
+            stock_quantity=10
+        )
+        self.user = User.objects.create_user(username='async', password='asyncpass123')
+        order = Order.objects.create(
+            user=self.user,
+            total_amount=Decimal('25.00'),
+            shipping_address='1 Async St',
+            shipping_city='Async City',
+            shipping_postal_code='12345',
+            shipping_country='Async Country'
+        )
+        self.payment = Payment.objects.create(
+            order=order, stripe_payment_intent_id='pi_async', amount=order.total_amount
+        )
+    
+    def set_cart(self, quantity):
+        session = SessionStore()
+        save_cart(session, {self.product.id: quantity})
+        flush_cart_snapshot(session['cart_key'])
+        session.pop('cart_dirty', None)
+        session.save()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    
+    def test_urls_use_async_views(self):
+        """Test the 'asgi' profile routes the hot pages to coroutine views."""
+        for url in (
+            reverse('product_list'),
+            reverse('product_detail', args=[self.product.slug]),
+            reverse('cart_view'),
+            reverse('cart_summary'),
+            reverse('payment_status', args=[self.payment.id]),
+        ):
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+    
+    async def test_catalog_pages_and_revalidation(self):
+        """Test the async catalog pages render and answer If-None-Match with 304."""
+        for url in (reverse('product_list'), reverse('product_detail', args=['async-product'])):
+            response = await self.async_client.get(url)
+            self.assertContains(response, 'Async Product')
+            response = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+            self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(reverse('product_detail', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+    
+    async def test_cart_view_and_summary(self):
+        """Test the async cart page reads the persisted cart and the summary honours its ETag."""
+        await sync_to_async(self.set_cart)(2)
+        response = await self.async_client.get(reverse('cart_view'))
+        self.assertContains(response, 'Async Product')
+        self.assertEqual(response.context['total'], Decimal('25.00'))
+        
+        response = await self.async_client.get(reverse('cart_summary'))
+        self.assertEqual(response.json()['quantity'], 2)
+        self.assertIn('private', response['Cache-Control'])
+        response = await self.async_client.get(
+            reverse('cart_summary'), headers={'if-none-match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+    
+    async def test_payment_status(self):
+        """Test async status polling is limited to the payment's owner."""
+        url = reverse('payment_status', args=[self.payment.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json(), {'status': 'pending'})
+        response = await self.async_client.get(url, headers={'hx-request': 'true'})
+        self.assertEqual(response.status_code, 200)
+        
+        other = await User.objects.acreate_user(username='other', password='otherpass123')
+        await self.async_client.aforce_login(other)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
+class TestConcurrencyLimit(TestCase):
+    """Tests for the ASGI concurrency limit."""
+    
+    async def test_requests_over_the_limit_wait(self):
+        """Test no more than ``limit`` requests run at once."""
+        running = peak = 0
+        
+        async def app(scope, receive, send):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+        
+        limited = ConcurrencyLimitMiddleware(app, 2)
+        await asyncio.gather(*(limited({'type': 'http'}, None, None) for _ in range(6)))
+        self.assertEqual(peak, 2)
+
+
+class TestSalesRollups(TestCase):
+    """Tests for the daily sales rollups and the staff analytics API."""
+    
+    def setUp(self):
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.games = Category.objects.create(name='Games', slug='games')
+        self.novel = self.create_product('Novel', self.books, '10.00')
+        self.atlas = self.create_product('Atlas', self.books, '25.00')
+        self.chess = self.create_product('Chess', self.games, '40.00')
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        self.staff = User.objects.create_user(username='staff', password='staffpass123', is_staff=True)
+        self.day = date(2026, 3, 2)
+        self.next_day = date(2026, 3, 3)
+    
+    def create_product(self, name, category, price):
+        return Product.objects.create(
+            name=name,
+            slug=name.lower(),
+            description=name,
+            price=Decimal(price),
+            category=category,
+            stock_quantity=100
+        )
+    
+    def create_order(self, day, *lines, status='delivered'):
+        order = Order.objects.create(
+            user=self.user,
+            status=status,
+            total_amount=sum((product.price * quantity for product, quantity in lines), Decimal('0.00')),
+            shipping_address='1 Ledger St',
+            shipping_city='Ledger City',
+            shipping_postal_code='12345',
+            shipping_country='Ledger Country'
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product, quantity in lines
+        ])
+        created_at = timezone.make_aware(datetime.combine(day, time(12)))
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+    
+    def totals(self, rows, key):
+        return {row[key]: (row['units'], row['revenue'], row['orders']) for row in rows}
+    
+    def test_record_sales_rolls_up_per_product_and_category(self):
+        """Test units, revenue and distinct orders are summed per day."""
+        self.create_order(self.day, (self.novel, 2), (self.atlas, 1))
+        self.create_order(self.day, (self.novel, 1), (self.chess, 1))
+        self.create_order(self.next_day, (self.novel, 3))
+        
+        self.assertEqual(record_sales(), 3)
+        
+        novel = ProductDailySales.objects.get(product=self.novel, date=self.day)
+        self.assertEqual((novel.units, novel.revenue, novel.orders), (3, Decimal('30.00'), 2))
+        books = CategoryDailySales.objects.get(category=self.books, date=self.day)
+        # Two books in the first order still count it once
+        self.assertEqual((books.units, books.revenue, books.orders), (4, Decimal('55.00'), 2))
+        self.assertEqual(
+            self.totals(category_sales(self.day, self.next_day), 'category_id'),
+            {
+                self.books.pk: (7, Decimal('85.00'), 3),
+                self.games.pk: (1, Decimal('40.00'), 1),
+            }
+        )
+    
+    def test_record_sales_counts_paid_orders_once(self):
+        """Test the backfill works in chunks, counts each order once and skips unpaid and cancelled ones."""
+        for status in ('processing', 'shipped', 'delivered', 'pending', 'cancelled'):
+            self.create_order(self.day, (self.novel, 1), status=status)
+        
+        self.assertEqual(record_sales(chunk_size=2), 2)
+        self.assertEqual(record_sales(chunk_size=2), 1)
+        self.assertEqual(record_sales(), 0)
+        
+        novel = ProductDailySales.objects.get(product=self.novel, date=self.day)
+        self.assertEqual((novel.units, novel.revenue, novel.orders), (3, Decimal('30.00'), 3))
+    
+    def test_transitions_record_paid_orders(self):
+        """Test orders are counted once paid, once only, as they move on."""
+        order = self.create_order(self.day, (self.novel, 2), status='pending')
+        record_sales()
+        self.assertFalse(ProductDailySales.objects.exists())
+        
+        transition_order(order, 'processing')
+        bulk_transition(Order.objects.filter(pk=order.pk), 'shipped')
+        transition_order(order, 'delivered')
+        
+        novel = ProductDailySales.objects.get(product=self.novel, date=self.day)
+        self.assertEqual((novel.units, novel.revenue, novel.orders), (2, Decimal('20.00'), 1))
+        self.assertEqual(record_sales(), 0)
+    
+    def test_cancelled_orders_leave_rollups_unchanged(self):
+        """Test cancelling a paid order takes its sales out again, and an unpaid one never adds them."""
+        kept = self.create_order(self.day, (self.novel, 1), (self.chess, 1), status='pending')
+        paid = self.create_order(self.day, (self.novel, 2), (self.atlas, 1), status='pending')
+        unpaid = self.create_order(self.day, (self.novel, 5), status='pending')
+        transition_order(kept, 'processing')
+        before = {
+            model: sorted(model.objects.values_list('date', 'units', 'revenue', 'orders'))
+            for model in (ProductDailySales, CategoryDailySales)
+        }
+        
+        bulk_transition(Order.objects.filter(pk=paid.pk), 'processing')
+        bulk_transition(Order.objects.filter(pk__in=[paid.pk, unpaid.pk]), 'cancelled')
+        
+        for model, rows in before.items():
+            self.assertEqual(sorted(model.objects.filter(units__gt=0).values_list(
+                'date', 'units', 'revenue', 'orders'
+            )), rows)
+        self.assertEqual(self.totals(product_sales(self.day, self.day), 'product_id'), {
+            self.novel.pk: (1, Decimal('10.00'), 1),
+            self.chess.pk: (1, Decimal('40.00'), 1),
+        })
+        self.assertEqual(record_sales(), 0)
+    
+    def test_cancel_after_recategorizing_hits_the_counted_category(self):
+        """Test a cancellation subtracts from the category the sale was counted under."""
+        kept = self.create_order(self.day, (self.chess, 1), status='pending')
+        paid = self.create_order(self.day, (self.atlas, 2), status='pending')
+        bulk_transition(Order.objects.filter(pk__in=[kept.pk, paid.pk]), 'processing')
+        
+        self.atlas.category = self.games
+        self.atlas.save()
+        transition_order(paid, 'cancelled')
+        
+        self.assertEqual(self.totals(category_sales(self.day, self.day), 'category_id'), {
+            self.games.pk: (1, Decimal('40.00'), 1),
+        })
+        self.assertEqual(CategoryDailySales.objects.get(category=self.books).units, 0)
+    
+    def test_product_sales_filters_and_orders_by_revenue(self):
+        """Test the date range is inclusive, best sellers come first and ``category`` filters."""
+        self.create_order(self.day - timedelta(days=1), (self.chess, 5))
+        self.create_order(self.day, (self.novel, 1), (self.chess, 1))
+        self.create_order(self.next_day, (self.atlas, 1))
+        record_sales()
+        
+        rows = product_sales(self.day, self.next_day)
+        self.assertEqual(
+            [(row['product_id'], row['name']) for row in rows],
+            [(self.chess.pk, 'Chess'), (self.atlas.pk, 'Atlas'), (self.novel.pk, 'Novel')]
+        )
+        rows = product_sales(self.day, self.next_day, category='books', limit=1)
+        self.assertEqual([row['product_id'] for row in rows], [self.atlas.pk])
+        rows = product_sales(self.day, self.next_day, category='books', by_day=True)
+        self.assertEqual(
+            [(row['date'], row['product_id']) for row in rows],
+            [(self.day, self.novel.pk), (self.next_day, self.atlas.pk)]
+        )
+    
+    def test_backfill_command(self):
+        """Test the backfill records pending orders and ``--rebuild`` recounts everything."""
+        self.create_order(self.day, (self.novel, 1))
+        self.create_order(self.next_day, (self.novel, 2))
+        record_sales(chunk_size=1)
+        
+        call_command('backfill_sales_rollups', chunk_size=1, verbosity=0)
+        self.assertEqual(self.totals(product_sales(self.day, self.next_day), 'product_id'), {
+            self.novel.pk: (3, Decimal('30.00'), 2),
+        })
+        
+        call_command('backfill_sales_rollups', rebuild=True, verbosity=0)
+        self.assertEqual(self.totals(product_sales(self.day, self.next_day), 'product_id'), {
+            self.novel.pk: (3, Decimal('30.00'), 2),
+        })
+        self.assertEqual(ProductDailySales.objects.count(), 2)
+    
+    def test_api_requires_staff(self):
+        """Test the reports are staff only."""
+        client = APIClient()
+        url = reverse('analytics-products')
+        params = {'start': '2026-03-01', 'end': '2026-03-31'}
+        self.assertEqual(client.get(url, params).status_code, 403)
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get(url, params).status_code, 403)
+    
+    def test_api_validates_range(self):
+        """Test missing dates and reversed ranges are rejected."""
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        url = reverse('analytics-categories')
+        self.assertEqual(client.get(url).status_code, 400)
+        response = client.get(url, {'start': '2026-03-31', 'end': '2026-03-01'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_api_reads_only_rollups(self):
+        """Test reports are answered without querying orders."""
+        self.create_order(self.day, (self.novel, 2), (self.chess, 1))
+        record_sales()
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('analytics-products'), {
+                'start': '2026-03-01', 'end': '2026-03-31', 'by': 'day',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'orders_order' in query['sql']])
+        self.assertEqual(response.json()['results'], [
+            {
+                'date': '2026-03-02', 'name': 'Chess', 'units': 1,
+                'revenue': '40.00', 'orders': 1, 'product': self.chess.pk,
+            },
+            {
+                'date': '2026-03-02', 'name': 'Novel', 'units': 2,
+                'revenue': '20.00', 'orders': 1, 'product': self.novel.pk,
+            },
+        ])
+        
+        response = client.get(reverse('analytics-categories'), {'start': '2026-03-01', 'end': '2026-03-31'})
+        self.assertEqual(
+            [(row['category'], row['revenue']) for row in response.json()['results']],
+            [(self.games.pk, '40.00'), (self.books.pk, '20.00')]
+        )
@@ -1,3 +1,12 @@
 """URL patterns for top-level pages and status endpoints."""
 
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
 
+router = DefaultRouter()
+router.register(r'analytics', views.SalesAnalyticsViewSet, basename='analytics')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
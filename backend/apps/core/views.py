@@ -1,3 +1,43 @@
 """Global views (home, status, feature toggles) to support presentation layer."""
 
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from . import services
+from .serializers import CategorySalesSerializer, ProductSalesSerializer, SalesQuerySerializer
 
+
+class SalesAnalyticsViewSet(viewsets.ViewSet):
+    """Staff sales reports over a date range, read from the daily rollups only."""
+    permission_classes = [IsAdminUser]
+
+    def get_query(self, request):
+        serializer = SalesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def report(self, query, rows, serializer_class):
+        return Response({
+            'start': query['start'],
+            'end': query['end'],
+            'by': query['by'],
+            'results': serializer_class(rows, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'])
+    def products(self, request):
+        query = self.get_query(request)
+        rows = services.product_sales(
+            query['start'], query['end'], category=query.get('category'),
+            by_day=query['by'] == 'day', limit=query['limit'],
+        )
+        return self.report(query, rows, ProductSalesSerializer)
+
+    @action(detail=False, methods=['get'])
+    def categories(self, request):
+        query = self.get_query(request)
+        rows = services.category_sales(
+            query['start'], query['end'], by_day=query['by'] == 'day', limit=query['limit'],
+        )
+        return self.report(query, rows, CategorySalesSerializer)
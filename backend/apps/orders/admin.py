@@ -1,16 +1,65 @@
-from django.contrib import admin
-from .models import Order, OrderItem
+from django.contrib import admin, messages
+from .models import Cart, CartItem, Order, OrderItem, OrderStatusChange
+from .transitions import TRANSITIONS, bulk_transition
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    raw_id_fields = ['product']
+
+
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    extra = 0
+    fields = ['from_status', 'to_status', 'changed_by', 'note', 'created_at']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def transition_action(target):
+    def action(modeladmin, request, queryset):
+        moved = bulk_transition(queryset, target, changed_by=request.user, note='Admin bulk action')
+        skipped = queryset.count() - len(moved)
+        modeladmin.message_user(request, f'{len(moved)} orders marked {target}.')
+        if skipped:
+            modeladmin.message_user(
+                request, f'{skipped} orders skipped: they cannot move to {target}.', messages.WARNING
+            )
+    action.__name__ = f'mark_{target}'
+    action.short_description = f'Mark selected orders as {target}'
+    return action
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'status', 'total_amount', 'created_at']
+    list_display = ['id', 'user', 'status', 'item_count', 'total_amount', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'user__email']
-    inlines = [OrderItemInline]
+    raw_id_fields = ['user']
+    # Status changes go through the transition actions, never the form.
+    readonly_fields = ['status', 'item_count', 'preview_name', 'preview_image_url']
+    inlines = [OrderItemInline, OrderStatusChangeInline]
+    actions = [transition_action(target) for target in TRANSITIONS if target != 'pending']
+
+    def get_queryset(self, request):
+        # Both the change list and the change page show Order.__str__, which reads the user.
+        return super().get_queryset(request).select_related('user')
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    raw_id_fields = ['product']
+
 
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'item_count', 'quantity', 'subtotal', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['key', 'user__username', 'user__email']
+    readonly_fields = ['subtotal', 'item_count', 'quantity']
+    inlines = [CartItemInline]
@@ -5,3 +5,5 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.orders'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,7 @@
+from .services import get_cart_summary
+
+
+def cart_summary(request):
+    return {
+        'cart_summary': get_cart_summary(request.session),
+    }
@@ -0,0 +1,93 @@
+import statistics
+import time
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.catalog.models import Category, Product, StockReservation
+from apps.orders.services import load_cart
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure add-to-cart requests/sec and session-table queries per request '
+        'for each session store (see SESSION_STORE in settings).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Add-to-cart requests per store.')
+        parser.add_argument('--products', type=int, default=10, help='Distinct products the cart cycles through.')
+        parser.add_argument('--stores', default='db,cached_db,redis')
+
+    def run(self, products):
+        client = Client()
+        urls = [reverse('add_to_cart', args=[product.id]) for product in products]
+        client.post(urls[0], {'quantity': 1}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for i in range(self.requests):
+                # Drop flash messages as if each page had been viewed; left to
+                # pile up they would overflow the cookie into the session.
+                client.cookies.pop('messages', None)
+                request_started = time.perf_counter()
+                client.post(urls[i % len(urls)], {'quantity': 1}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                timings.append(time.perf_counter() - request_started)
+            wall = time.perf_counter() - started
+
+            # Re-submitting the quantity the cart already holds changes nothing.
+            quantity = load_cart(client.session)[products[0].id]
+            before = len(queries)
+            client.post(reverse('update_cart', args=[products[0].id]), {'quantity': quantity})
+            noop = [
+                query for query in queries[before:]
+                if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')
+            ]
+        session_queries = sum('django_session' in query['sql'] for query in queries[:before])
+        return wall, sorted(timings), session_queries, len(noop)
+
+    def handle(self, *args, **options):
+        stores = options['stores'].split(',')
+        unknown = set(stores) - set(settings.SESSION_ENGINES)
+        if unknown:
+            raise CommandError(f'Unknown session stores: {", ".join(sorted(unknown))}')
+        self.requests = options['requests']
+
+        run = uuid.uuid4().hex[:8]
+        category = Category.objects.create(name=f'Session Bench {run}', slug=f'session-bench-{run}')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Session Bench {run} {i}',
+                slug=f'session-bench-{run}-{i}',
+                description='Session benchmark product',
+                price=Decimal('1.00'),
+                category=category,
+                stock_quantity=10 ** 6,
+            )
+            for i in range(options['products'])
+        ])
+        products = list(Product.objects.filter(category=category).order_by('id'))
+        self.stdout.write(f'sessions cache: {settings.CACHES["sessions"]["BACKEND"].rsplit(".", 1)[-1]}')
+        try:
+            for store in stores:
+                with override_settings(
+                    SESSION_ENGINE=settings.SESSION_ENGINES[store],
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ):
+                    wall, timings, session_queries, noop = self.run(products)
+                self.stdout.write(
+                    f'{store:<10} {len(timings) / wall:8.1f} req/s   '
+                    f'mean {statistics.mean(timings) * 1000:6.2f} ms   '
+                    f'p95 {timings[int(len(timings) * 0.95) - 1] * 1000:6.2f} ms   '
+                    f'session queries/req {session_queries / len(timings):.2f}   '
+                    f'session writes on a no-op update {noop}'
+                )
+        finally:
+            StockReservation.objects.filter(product__category=category).delete()
+            Product.objects.filter(category=category).delete()
+            category.delete()
@@ -0,0 +1,88 @@
+import threading
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem
+from apps.orders.services import place_order
+from common.exceptions import CheckoutError
+
+User = get_user_model()
+
+SHIPPING = {
+    'shipping_address': '1 Stress St',
+    'shipping_city': 'Load City',
+    'shipping_postal_code': '00000',
+    'shipping_country': 'Benchmark',
+}
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent checkouts at one SKU and report oversell and checkouts/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--checkouts', type=int, default=200, help='Checkout attempts in total.')
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument('--quantity', type=int, default=1, help='Units bought per checkout.')
+
+    def handle(self, *args, **options):
+        category = Category.objects.create(name='Stress Test', slug='stress-test')
+        product = Product.objects.create(
+            name='Stress SKU',
+            slug='stress-sku',
+            description='Checkout stress test product',
+            price=Decimal('1.00'),
+            category=category,
+            stock_quantity=options['stock'],
+        )
+        user = User.objects.create_user(username='stress-checkout')
+        cart = {str(product.id): options['quantity']}
+        results = {'placed': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+        remaining = iter(range(options['checkouts']))
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    try:
+                        place_order(user, cart, **SHIPPING)
+                        outcome = 'placed'
+                    except CheckoutError:
+                        outcome = 'rejected'
+                    except DatabaseError:
+                        outcome = 'errors'
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            product.refresh_from_db()
+            sold = sum(OrderItem.objects.filter(product=product).values_list('quantity', flat=True))
+            oversold = max(sold - options['stock'], 0)
+            self.stdout.write(
+                f"placed: {results['placed']} rejected: {results['rejected']} "
+                f"errors: {results['errors']} stock left: {product.stock_quantity} "
+                f"oversold: {oversold}"
+            )
+            self.stdout.write(f"checkouts/sec: {results['placed'] / elapsed:.1f}")
+            if oversold or product.stock_quantity != options['stock'] - sold:
+                raise CommandError('Stock was oversold.')
+        finally:
+            Order.objects.filter(user=user).delete()
+            user.delete()
+            category.delete()
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_order_summary(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    items = OrderItem.objects.filter(order=OuterRef('pk'))
+    first_item = items.order_by('id')
+    Order.objects.update(
+        item_count=Coalesce(Subquery(items.values('order').annotate(n=Count('id')).values('n')), 0),
+        preview_name=Coalesce(Subquery(first_item.values('product__name')[:1]), Value('')),
+        preview_image_url=Coalesce(Subquery(first_item.values('product__image_url')[:1]), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_cart'),
+        ('catalog', '0006_product_image_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preview_image_url',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preview_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='orders_user_history_idx'),
+        ),
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_sales_recorded'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_sales_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('sales_recorded', False), ('status__in', ['processing', 'shipped', 'delivered'])), fields=['id'], name='orders_sales_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_item_categories(apps, schema_editor):
+    # Recorded sales were counted under the product's category; snapshot it so cancelling them matches.
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product = apps.get_model('catalog', 'Product')
+    category = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('category_id')[:1])
+    last = OrderItem.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for start in range(0, last, BATCH_SIZE):
+        OrderItem.objects.filter(pk__gt=start, pk__lte=start + BATCH_SIZE).update(category_id=category)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_product_name_upper_trigram'),
+        ('orders', '0007_sales_pending_paid_only'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.category'),
+        ),
+        migrations.RunPython(backfill_item_categories, migrations.RunPython.noop),
+    ]
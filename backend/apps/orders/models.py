@@ -1,7 +1,8 @@
+from decimal import Decimal
 from django.db import models
 from django.core.validators import MinValueValidator
 from apps.accounts.models import User
-from apps.catalog.models import Product
+from apps.catalog.models import Category, Product
 
 
 class Order(models.Model):
@@ -20,11 +21,30 @@ class Order(models.Model):
     shipping_city = models.CharField(max_length=100)
     shipping_postal_code = models.CharField(max_length=20)
     shipping_country = models.CharField(max_length=100)
+    # Summary of the items, written once by services.place_order so order
+    # lists never read them: the number of lines and the first line's product.
+    item_count = models.PositiveIntegerField(default=0)
+    preview_name = models.CharField(max_length=200, blank=True)
+    preview_image_url = models.CharField(max_length=500, blank=True)
+    # Whether the order is counted in the sales rollups (see orders.transitions)
+    sales_recorded = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            # A customer's order history, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='orders_user_history_idx'),
+            # Paid orders from before the sales rollups, for the backfill
+            # (core.services.SALES_STATUSES); empty once it has run.
+            models.Index(
+                fields=['id'],
+                condition=models.Q(sales_recorded=False, status__in=['processing', 'shipped', 'delivered']),
+                name='orders_sales_pending_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
@@ -35,6 +55,12 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The product's category when ordered. Sales rollups count the item under
+    # it, so recategorizing the product later cannot move counted sales.
+    # Never looked up by, hence no index.
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False
+    )
 
     class Meta:
         unique_together = ['order', 'product']
@@ -44,3 +70,63 @@ class OrderItem(models.Model):
 
     def get_subtotal(self):
         return self.quantity * self.price
+
+
+class OrderStatusChange(models.Model):
+    """One status transition of an order, written by ``transitions``."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['order', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
+
+class Cart(models.Model):
+    """Persisted copy of a shopping cart.
+
+    The live cart is in the session (see ``services.save_cart``); this row is
+    written behind it and read by the cart page, by the user's other devices
+    and for analysis. ``key`` is the session's ``cart_key``, so a cart and
+    its stock reservations share one identity. ``subtotal``, ``item_count``
+    and ``quantity`` are adjusted by each change in ``services.store_cart``
+    rather than re-summed from the items.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='cart')
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    item_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart {self.key} ({self.item_count} items)"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    # Unit price counted in the cart subtotal
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['cart', 'product']
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product.name}"
+
+    @property
+    def total(self):
+        return self.quantity * self.price
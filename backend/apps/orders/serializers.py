@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
+from .transitions import UPDATE_BATCH_SIZE
 from apps.catalog.models import Product
 from apps.catalog.serializers import ProductSerializer
 
@@ -23,6 +24,19 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'status', 'total_amount', 'shipping_address',
             'shipping_city', 'shipping_postal_code', 'shipping_country',
+            'item_count', 'preview_name', 'preview_image_url',
             'created_at', 'updated_at', 'items'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        # Status changes go through the transition actions.
+        read_only_fields = ['status', 'item_count', 'preview_name', 'preview_image_url', 'created_at', 'updated_at']
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+
+class BulkOrderTransitionSerializer(OrderTransitionSerializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=UPDATE_BATCH_SIZE
+    )
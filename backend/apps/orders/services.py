@@ -1,3 +1,483 @@
 """Service layer for cart orchestration, stock locks, and order state transitions."""
 
+import hashlib
+import logging
+import uuid
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Now
+from apps.catalog.cache import forget_stock
+from apps.catalog.models import Product
+from apps.catalog.services import held_quantities, lock_holds, release_cart, reserve_stock
+from apps.core import tasks as core_tasks
+from common.exceptions import CheckoutError, InsufficientStockError
+from .models import Cart, CartItem, Order, OrderItem
 
+logger = logging.getLogger(__name__)
+
+# Cart changes within this many seconds reach the database in one write.
+CART_SYNC_DELAY = 30
+
+# How long the latest unwritten cart is kept in the cache for the flush task.
+CART_SNAPSHOT_TIMEOUT = 3600
+
+
+def encode_cart(cart):
+    """Encode ``{product_id: quantity}`` as ``'12:3,45:1'`` for the session.
+
+    A flat string is a fraction of the size of the equivalent JSON object
+    once signed and base64'd, and two carts are equal exactly when their
+    encodings are, which is how ``save_cart`` spots no-op writes.
+    """
+    return ','.join(f'{int(product_id)}:{int(quantity)}' for product_id, quantity in cart.items())
+
+
+def decode_cart(value):
+    """Decode a session cart into a new ``{product_id: quantity}`` dict.
+
+    Also accepts the ``{'12': 3}`` dicts stored by earlier releases.
+    """
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return {int(product_id): quantity for product_id, quantity in value.items()}
+    cart = {}
+    for line in value.split(','):
+        product_id, quantity = line.split(':')
+        cart[int(product_id)] = int(quantity)
+    return cart
+
+
+def load_cart(session):
+    """Return the session's cart as a dict the caller may change freely."""
+    return decode_cart(session.get('cart'))
+
+
+def resolve_cart(cart):
+    """Resolve a session cart into priced line items with a single query.
+
+    Returns ``(cart_items, total)``. Lines whose product is missing or
+    inactive are dropped, and the remaining lines keep the session order.
+    """
+    quantities = {int(product_id): quantity for product_id, quantity in cart.items()}
+    if not quantities:
+        return [], Decimal('0.00')
+
+    products = Product.objects.filter(id__in=quantities.keys(), is_active=True).in_bulk()
+
+    cart_items = []
+    total = Decimal('0.00')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        item_total = product.price * quantity
+        total += item_total
+        cart_items.append({
+            'product': product,
+            'quantity': quantity,
+            'price': product.price,
+            'total': item_total,
+        })
+    return cart_items, total
+
+
+def get_cart_key(session):
+    """Return the token that identifies this session's cart in the reservation ledger.
+
+    It lives in the session data rather than being the session key itself so
+    it survives the key rotation done on login.
+    """
+    if 'cart_key' not in session:
+        session['cart_key'] = uuid.uuid4().hex
+    return session['cart_key']
+
+
+def summarize_cart(cart):
+    """Return the line count, unit count and total of a cart as plain data."""
+    cart_items, total = resolve_cart(cart)
+    return {
+        'count': len(cart_items),
+        'quantity': sum(item['quantity'] for item in cart_items),
+        'total': str(total),
+    }
+
+
+# Stored in the session as a list in this order rather than as a dict.
+SUMMARY_FIELDS = ('count', 'quantity', 'total', 'version')
+
+
+def get_cart_summary(session):
+    """Return the cached cart summary stored alongside the session cart.
+
+    Sessions created before summaries existed get one computed on first use.
+    """
+    summary = session.get('cart_summary')
+    if isinstance(summary, list):
+        return dict(zip(SUMMARY_FIELDS, summary))
+    if summary is None:
+        summary = {'count': 0, 'quantity': 0, 'total': '0.00', 'version': 0}
+        if session.get('cart'):
+            summary = dict(summarize_cart(decode_cart(session['cart'])), version=1)
+            session['cart_summary'] = [summary[field] for field in SUMMARY_FIELDS]
+    return summary
+
+
+async def aget_cart_summary(session):
+    """Async ``get_cart_summary``; only sessions without a stored summary leave the event loop."""
+    summary = await session.aget('cart_summary')
+    if isinstance(summary, list):
+        return dict(zip(SUMMARY_FIELDS, summary))
+    if summary is None and not await session.aget('cart'):
+        return {'count': 0, 'quantity': 0, 'total': '0.00', 'version': 0}
+    return await sync_to_async(get_cart_summary)(session)
+
+
+def cart_summary_tag(summary):
+    """Return a tag that differs whenever two summaries do, for validators.
+
+    The version alone is not enough: it restarts in every session, so the
+    carts of two sessions in one browser can share a version.
+    """
+    return hashlib.md5(repr([summary[field] for field in SUMMARY_FIELDS]).encode()).hexdigest()[:16]
+
+
+def save_cart(session, cart, persist=True):
+    """Store the cart in the session and refresh its summary and version.
+
+    Does nothing if the cart is unchanged, so the session is not marked
+    modified and the session store is not written. Otherwise, unless
+    ``persist`` is false, the session is flagged as ahead of the database
+    and a write-behind of the persisted cart is scheduled. Returns whether
+    the cart changed.
+    """
+    encoded = encode_cart(cart)
+    if encoded == encode_cart(load_cart(session)):
+        return False
+    version = get_cart_summary(session)['version'] + 1
+    summary = dict(summarize_cart(cart), version=version)
+    session['cart'] = encoded
+    session['cart_summary'] = [summary[field] for field in SUMMARY_FIELDS]
+    if persist:
+        session['cart_dirty'] = True
+        write_behind(get_cart_key(session), encoded)
+    return True
+
+
+def cart_snapshot_key(cart_key):
+    return f'orders:cart:{cart_key}'
+
+
+def cart_queued_key(cart_key):
+    return f'orders:cart-queued:{cart_key}'
+
+
+def write_behind(cart_key, encoded):
+    """Stash the latest cart in the cache and queue one flush per ``CART_SYNC_DELAY``.
+
+    Changes made while a flush is queued only replace the stash, so a burst
+    of edits costs one database write. If the cache or broker is down the
+    database catches up the next time the cart page is viewed.
+    """
+    try:
+        cache.set(cart_snapshot_key(cart_key), encoded, CART_SNAPSHOT_TIMEOUT)
+        if not cache.add(cart_queued_key(cart_key), 1, CART_SYNC_DELAY):
+            return
+    except Exception:
+        logger.warning('Cache unavailable, cart %s not queued for persisting', cart_key, exc_info=True)
+        return
+
+    def enqueue():
+        try:
+            core_tasks.persist_cart.apply_async((cart_key,), countdown=CART_SYNC_DELAY)
+        except Exception:
+            logger.warning('Could not queue persisting cart %s', cart_key, exc_info=True)
+            cache.delete(cart_queued_key(cart_key))
+    transaction.on_commit(enqueue)
+
+
+def discard_snapshot(cart_key):
+    """Drop a stashed cart and its queued marker, so a queued flush finds nothing to write."""
+    try:
+        cache.delete_many([cart_snapshot_key(cart_key), cart_queued_key(cart_key)])
+    except Exception:
+        logger.warning('Could not discard stashed cart %s', cart_key, exc_info=True)
+
+
+def flush_cart_snapshot(cart_key):
+    """Write a stashed cart to the database; returns the cart, or ``None`` if nothing was stashed."""
+    # Clear the marker first so a change made during this flush queues another.
+    cache.delete(cart_queued_key(cart_key))
+    encoded = cache.get(cart_snapshot_key(cart_key))
+    if encoded is None:
+        return None
+    return store_cart(cart_key, decode_cart(encoded))
+
+
+def store_cart(cart_key, quantities, user=None):
+    """Make the persisted cart ``cart_key`` hold exactly ``quantities``.
+
+    Only the lines that differ are written: new lines with ``bulk_create``,
+    changed ones with ``bulk_update`` and removed ones with one ``DELETE``.
+    Changed and new lines take the product's current price. The cart's
+    totals move by the difference with one ``UPDATE`` of ``F()`` expressions,
+    so they are never re-summed. Lines for missing or inactive products are
+    dropped. Returns the cart.
+    """
+    quantities = {int(product_id): quantity for product_id, quantity in quantities.items() if quantity > 0}
+    with transaction.atomic():
+        cart, _ = Cart.objects.select_for_update().get_or_create(key=cart_key)
+        if user is not None and cart.user_id != user.pk:
+            Cart.objects.filter(pk=cart.pk).update(user=user)
+            cart.user = user
+        items = {item.product_id: item for item in cart.items.all()}
+        changed_ids = [
+            product_id for product_id, quantity in quantities.items()
+            if product_id not in items or items[product_id].quantity != quantity
+        ]
+        prices = dict(
+            Product.objects.filter(id__in=changed_ids, is_active=True).values_list('id', 'price')
+        ) if changed_ids else {}
+
+        subtotal = Decimal('0.00')
+        item_count = quantity_delta = 0
+        created, updated = [], []
+        removed = [item for product_id, item in items.items() if product_id not in quantities]
+        for product_id in changed_ids:
+            quantity = quantities[product_id]
+            item = items.get(product_id)
+            if product_id not in prices:
+                if item is not None:
+                    removed.append(item)
+                continue
+            if item is None:
+                created.append(CartItem(cart=cart, product_id=product_id, quantity=quantity, price=prices[product_id]))
+                item_count += 1
+            else:
+                subtotal -= item.total
+                quantity_delta -= item.quantity
+                item.quantity, item.price = quantity, prices[product_id]
+                updated.append(item)
+            subtotal += quantity * prices[product_id]
+            quantity_delta += quantity
+
+        for item in removed:
+            subtotal -= item.total
+            quantity_delta -= item.quantity
+            item_count -= 1
+
+        if not (created or updated or removed):
+            return cart
+        if created:
+            CartItem.objects.bulk_create(created)
+        if updated:
+            CartItem.objects.bulk_update(updated, ['quantity', 'price'])
+        if removed:
+            CartItem.objects.filter(pk__in=[item.pk for item in removed]).delete()
+        Cart.objects.filter(pk=cart.pk).update(
+            subtotal=F('subtotal') + subtotal,
+            item_count=F('item_count') + item_count,
+            quantity=F('quantity') + quantity_delta,
+            updated_at=Now(),
+        )
+    cart.refresh_from_db(fields=['subtotal', 'item_count', 'quantity', 'updated_at'])
+    return cart
+
+
+def load_persisted_cart(cart_key):
+    """Return ``(cart, items)`` for ``cart_key``: one query for the row, one for the items and their products."""
+    cart = (
+        Cart.objects.filter(key=cart_key)
+        .prefetch_related(Prefetch('items', queryset=CartItem.objects.select_related('product').order_by('id')))
+        .first()
+    )
+    return cart, list(cart.items.all()) if cart else []
+
+
+async def aload_persisted_cart(cart_key):
+    """Async ``load_persisted_cart``."""
+    cart = await (
+        Cart.objects.filter(key=cart_key)
+        .prefetch_related(Prefetch('items', queryset=CartItem.objects.select_related('product').order_by('id')))
+        .afirst()
+    )
+    return cart, list(cart.items.all()) if cart else []
+
+
+def sync_cart(session):
+    """Reconcile the session cart with its persisted copy and return ``(cart, items)``.
+
+    A session flagged as ahead of the database writes its cart first (its
+    queued write-behind may not have run yet). Otherwise the persisted cart
+    wins, which picks up changes made on the user's other devices. ``cart``
+    is ``None`` while nothing has been persisted.
+    """
+    cart_key = get_cart_key(session)
+    cart, items = load_persisted_cart(cart_key)
+    persisted = {item.product_id: item.quantity for item in items}
+    session_cart = load_cart(session)
+    if session.get('cart_dirty') or cart is None:
+        if persisted != session_cart and (cart is not None or session_cart):
+            store_cart(cart_key, session_cart)
+            cart, items = load_persisted_cart(cart_key)
+        session.pop('cart_dirty', None)
+    elif persisted != session_cart:
+        save_cart(session, persisted, persist=False)
+    return cart, items
+
+
+def merge_cart_on_login(session, user):
+    """Fold the visitor's session cart into ``user``'s saved cart.
+
+    Call straight after ``login()``, which keeps session data across the key
+    rotation. Quantities of a product in both carts are added, then clamped
+    to what can be reserved under the saved cart's key; the session's own
+    holds, stashed and persisted anonymous cart are released first. The session then
+    carries the merged cart and the saved cart's key, so every device the
+    user signs in on shares one cart.
+    """
+    session_cart = load_cart(session)
+    session_key = session.get('cart_key')
+    saved = Cart.objects.filter(user=user).prefetch_related('items').first()
+    if saved is not None and session_key == saved.key:
+        # Signing in again: the session already carries the saved cart.
+        return
+    if saved is None:
+        # Claim the session's cart, even an empty one, so later writes land on the user's row.
+        store_cart(get_cart_key(session), session_cart, user=user)
+        session.pop('cart_dirty', None)
+        return
+
+    merged = {item.product_id: item.quantity for item in saved.items.all()}
+    for product_id, quantity in session_cart.items():
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    if session_key and session_key != saved.key:
+        release_cart(session_key)
+        # Or its queued write-behind would recreate the row deleted here.
+        discard_snapshot(session_key)
+        Cart.objects.filter(key=session_key, user=None).delete()
+    session['cart_key'] = saved.key
+
+    held = {}
+    for product in Product.objects.filter(id__in=merged.keys(), is_active=True).order_by('id'):
+        held[product.id] = reserve_stock(product, saved.key, merged[product.id])
+    merged = {product_id: held[product_id] for product_id in merged if held.get(product_id)}
+    save_cart(session, merged, persist=False)
+    store_cart(saved.key, merged)
+    session.pop('cart_dirty', None)
+
+
+def recount_carts(cart_ids):
+    """Recompute the totals of ``cart_ids`` from their items in one ``UPDATE``.
+
+    Only for rare, product-wide changes (see ``refresh_cart_prices``);
+    cart edits adjust the totals incrementally in ``store_cart``.
+    """
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    Cart.objects.filter(pk__in=cart_ids).update(
+        subtotal=Coalesce(
+            Subquery(items.annotate(total=Sum(F('quantity') * F('price'))).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        item_count=Coalesce(Subquery(items.annotate(lines=Count('pk')).values('lines')), 0),
+        quantity=Coalesce(Subquery(items.annotate(units=Sum('quantity')).values('units')), 0),
+        updated_at=Now(),
+    )
+
+
+def refresh_cart_prices(product):
+    """Bring persisted cart lines in line with a product's price and availability."""
+    items = CartItem.objects.filter(product=product)
+    if product.is_active:
+        items = items.exclude(price=product.price)
+    cart_ids = list(items.values_list('cart_id', flat=True))
+    if not cart_ids:
+        return
+    if product.is_active:
+        items.update(price=product.price)
+    else:
+        items.delete()
+    recount_carts(cart_ids)
+
+
+def place_order(user, cart, cart_key=None, **shipping):
+    """Turn a session cart into an order in a single transaction.
+
+    Cart products are locked in id order so concurrent checkouts cannot
+    deadlock, order items are written with one ``bulk_create`` and stock is
+    decremented with one guarded ``UPDATE``. Units held by other carts'
+    reservations are not sellable; the cart's own holds are consumed. Raises
+    ``CheckoutError`` (or ``InsufficientStockError``) and rolls back if the
+    cart cannot be filled.
+    """
+    quantities = {int(product_id): quantity for product_id, quantity in cart.items()}
+    if not quantities:
+        raise CheckoutError('Your cart is empty.')
+
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update()
+            .filter(id__in=quantities.keys(), is_active=True)
+            .order_by('id')
+        )
+        if len(products) != len(quantities):
+            raise CheckoutError('Some items in your cart are no longer available.')
+
+        # Also wait out holds being placed on these products.
+        lock_holds(quantities.keys())
+        held = held_quantities(quantities.keys(), exclude_cart=cart_key)
+        for product in products:
+            if quantities[product.id] > product.stock_quantity - held.get(product.id, 0):
+                raise InsufficientStockError(product)
+
+        order = Order.objects.create(
+            user=user,
+            total_amount=sum(
+                (product.price * quantities[product.id] for product in products),
+                Decimal('0.00'),
+            ),
+            item_count=len(products),
+            preview_name=products[0].name,
+            preview_image_url=products[0].image_url,
+            **shipping,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=product,
+                quantity=quantities[product.id],
+                price=product.price,
+                category_id=product.category_id,
+            )
+            for product in products
+        ])
+
+        in_stock = Q()
+        for product in products:
+            in_stock |= Q(id=product.id, stock_quantity__gte=quantities[product.id])
+        updated = Product.objects.filter(in_stock).update(
+            stock_quantity=F('stock_quantity') - Case(
+                *[When(id=product.id, then=Value(quantities[product.id])) for product in products],
+                output_field=IntegerField(),
+            ),
+            # update() skips auto_now; product pages use it for Last-Modified.
+            updated_at=Now(),
+        )
+        if updated != len(products):
+            # Only reachable on backends without row locks, where stock moved
+            # between the read above and this update.
+            raise CheckoutError('Stock changed during checkout. Please try again.')
+
+        if cart_key:
+            release_cart(cart_key)
+
+        # Only these products' stock changed; cached catalog entries stay valid.
+        transaction.on_commit(lambda: forget_stock(quantities.keys()))
+
+    return order
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from apps.catalog.models import Product
+from .services import refresh_cart_prices
+
+
+@receiver(post_save, sender=Product)
+def reprice_cart_items(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not {'price', 'is_active'} & set(update_fields)):
+        return
+    refresh_cart_prices(instance)
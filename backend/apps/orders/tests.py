@@ -1,13 +1,27 @@
 """Orders test suite (unit, integration, and webhook flow tests)."""
 
-from django.test import TestCase, Client
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from decimal import Decimal
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
 from rest_framework import status
 from rest_framework.test import APIClient
-from apps.catalog.models import Category, Product
-from .models import Order, OrderItem
+from apps.catalog.models import Category, Product, StockReservation
+from apps.catalog.services import reserve_stock
+from apps.core.tasks import persist_cart
+from .models import Cart, Order, OrderItem, OrderStatusChange
+from common.exceptions import InsufficientStockError, InvalidTransitionError
+from .services import (
+    CART_SYNC_DELAY, decode_cart, encode_cart, flush_cart_snapshot, load_cart,
+    merge_cart_on_login, place_order, resolve_cart, save_cart, store_cart,
+)
+from .transitions import transition_order
 
 User = get_user_model()
 
@@ -100,3 +114,602 @@ class TestOrderAPI(TestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/orders/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestCartResolution(TestCase):
+    """Unit and perf tests for the batched cart service."""
+    
+    def setUp(self):
+        self.client = Client()
+        self.category = Category.objects.create(
+            name='Bulk',
+            slug='bulk'
+        )
+        self.products = Product.objects.bulk_create([
+            Product(
+                name=f'Bulk Product {i}',
+                slug=f'bulk-product-{i}',
+                description='Bulk',
+                price=Decimal('2.50'),
+                category=self.category,
+                stock_quantity=100,
+            )
+            for i in range(500)
+        ])
+    
+    def set_cart(self, products):
+        session = self.client.session
+        save_cart(session, {str(product.id): 2 for product in products})
+        # Persist it as the persist_cart task would, and mark the session in sync.
+        flush_cart_snapshot(session['cart_key'])
+        session.pop('cart_dirty', None)
+        session.save()
+    
+    def count_cart_queries(self, line_count):
+        self.set_cart(self.products[:line_count])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart_view'))
+        self.assertEqual(len(response.context['cart_items']), line_count)
+        return len(queries)
+    
+    def test_resolve_cart_totals(self):
+        """Test line totals and grand total are computed in one query."""
+        cart = {str(self.products[0].id): 2, str(self.products[1].id): 3}
+        with self.assertNumQueries(1):
+            cart_items, total = resolve_cart(cart)
+        self.assertEqual([item['quantity'] for item in cart_items], [2, 3])
+        self.assertEqual(cart_items[1]['total'], Decimal('7.50'))
+        self.assertEqual(total, Decimal('12.50'))
+    
+    def test_resolve_cart_skips_inactive_products(self):
+        """Test inactive products are dropped from the cart."""
+        Product.objects.filter(id=self.products[0].id).update(is_active=False)
+        cart = {str(self.products[0].id): 1, str(self.products[1].id): 1}
+        cart_items, total = resolve_cart(cart)
+        self.assertEqual(len(cart_items), 1)
+        self.assertEqual(total, Decimal('2.50'))
+    
+    def test_cart_view_query_count_is_constant(self):
+        """Test cart rendering costs the same queries for 1 and 500 lines."""
+        self.count_cart_queries(1)  # warm the navigation category memo
+        baseline = self.count_cart_queries(1)
+        for line_count in (40, 500):
+            self.assertEqual(self.count_cart_queries(line_count), baseline)
+
+
+class TestCartSummary(TestCase):
+    """Integration tests for the cart summary endpoint."""
+    
+    def setUp(self):
+        self.client = Client()
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        self.product = Product.objects.create(
+            name='Summary Product',
+            slug='summary-product',
+            description='For summary',
+            price=Decimal('10.00'),
+            category=self.category,
+            stock_quantity=10,
+            is_active=True
+        )
+    
+    def test_empty_cart_summary(self):
+        """Test summary of an empty cart."""
+        response = self.client.get(reverse('cart_summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+    
+    def test_summary_tracks_cart_changes(self):
+        """Test add and remove refresh the summary and bump its version."""
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 3})
+        summary = self.client.get(reverse('cart_summary')).json()
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual(summary['quantity'], 3)
+        self.assertEqual(summary['total'], '30.00')
+        
+        self.client.get(reverse('remove_from_cart', args=[self.product.id]))
+        removed = self.client.get(reverse('cart_summary')).json()
+        self.assertEqual(removed['count'], 0)
+        self.assertGreater(removed['version'], summary['version'])
+    
+    def test_summary_not_modified(self):
+        """Test a matching ETag returns 304 without product queries."""
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        etag = self.client.get(reverse('cart_summary'))['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart_summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('catalog_product' in query['sql'] for query in queries))
+
+    
+    def test_other_sessions_etag_does_not_match(self):
+        """Test a summary from another session with the same version is not reused."""
+        other = Client()
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        other.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 2})
+        other.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        first = self.client.get(reverse('cart_summary'))
+        second = other.get(reverse('cart_summary'))
+        self.assertEqual(first.json()['version'], second.json()['version'])
+        
+        response = other.get(reverse('cart_summary'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['quantity'], second.json()['quantity'])
+
+class TestCartSession(TestCase):
+    """Tests for the compact session cart and skipped no-op writes."""
+    
+    def setUp(self):
+        self.client = Client()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Session Product',
+            slug='session-product',
+            description='For sessions',
+            price=Decimal('5.00'),
+            category=self.category,
+            stock_quantity=3,
+            is_active=True
+        )
+    
+    def session_writes(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            getattr(self.client, method)(url, data or {})
+        return [
+            query for query in queries
+            if 'django_session' in query['sql'] and not query['sql'].startswith('SELECT')
+        ]
+    
+    def test_encoding_round_trip(self):
+        """Test carts encode to a flat string and legacy dicts still decode."""
+        self.assertEqual(encode_cart({12: 3, '45': 1}), '12:3,45:1')
+        self.assertEqual(decode_cart('12:3,45:1'), {12: 3, 45: 1})
+        self.assertEqual(decode_cart({'12': 3}), {12: 3})
+        self.assertEqual(decode_cart(None), {})
+    
+    def test_cart_is_stored_compactly(self):
+        """Test add_to_cart stores the cart string and a list summary."""
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 2})
+        session = self.client.session
+        self.assertEqual(session['cart'], f'{self.product.id}:2')
+        self.assertEqual(session['cart_summary'], [1, 2, '10.00', 1])
+    
+    def test_unchanged_cart_does_not_write_session(self):
+        """Test requests that leave the cart as it was do not save the session."""
+        add_url = reverse('add_to_cart', args=[self.product.id])
+        self.client.post(add_url, {'quantity': 3})
+        self.client.get(reverse('cart_view'))  # consume the flash message
+        self.assertFalse(self.session_writes('post', reverse('update_cart', args=[self.product.id]), {'quantity': 3}))
+        self.assertFalse(self.session_writes('get', reverse('remove_from_cart', args=[self.product.id + 1])))
+        self.assertTrue(self.session_writes('post', reverse('update_cart', args=[self.product.id]), {'quantity': 1}))
+    
+    def test_legacy_session_cart(self):
+        """Test carts stored as dicts by earlier releases keep working."""
+        session = self.client.session
+        session['cart'] = {str(self.product.id): 2}
+        session.save()
+        response = self.client.get(reverse('cart_view'))
+        self.assertContains(response, 'Session Product')
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['quantity'], 2)
+        self.client.post(reverse('update_cart', args=[self.product.id]), {'quantity': 1})
+        self.assertEqual(self.client.session['cart'], f'{self.product.id}:1')
+    
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_cache_session_store(self):
+        """Test the Redis-style cache store keeps carts out of the session table."""
+        self.assertFalse(self.session_writes('post', reverse('add_to_cart', args=[self.product.id]), {'quantity': 1}))
+        self.assertEqual(load_cart(self.client.session), {self.product.id: 1})
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['count'], 1)
+
+
+class TestPersistentCart(TestCase):
+    """Tests for the persisted cart, its write-behind and merge on login."""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='carts', password='cartspass123')
+        self.category = Category.objects.create(name='Carts', slug='carts')
+        self.products = [
+            Product.objects.create(
+                name=f'Cart Product {i}',
+                slug=f'cart-product-{i}',
+                description='For carts',
+                price=Decimal('2.50') * (i + 1),
+                category=self.category,
+                stock_quantity=10,
+            )
+            for i in range(3)
+        ]
+        self.first, self.second, self.third = (product.id for product in self.products)
+    
+    def assertTotals(self, cart, subtotal, item_count, quantity):
+        cart.refresh_from_db()
+        self.assertEqual((cart.subtotal, cart.item_count, cart.quantity), (Decimal(subtotal), item_count, quantity))
+        recomputed = sum((item.total for item in cart.items.all()), Decimal('0.00'))
+        self.assertEqual(cart.subtotal, recomputed)
+    
+    def test_store_cart_maintains_totals_incrementally(self):
+        """Test adds, updates and removes adjust the totals without re-summing items."""
+        cart = store_cart('k1', {self.first: 2, self.second: 1})
+        self.assertTotals(cart, '10.00', 2, 3)
+        with CaptureQueriesContext(connection) as queries:
+            store_cart('k1', {self.first: 1, self.third: 2})
+        self.assertFalse(any('SUM(' in query['sql'] for query in queries))
+        self.assertTotals(cart, '17.50', 2, 3)
+        with self.assertNumQueries(4):  # savepoint, locked cart row, items, release
+            store_cart('k1', {self.first: 1, self.third: 2})
+        store_cart('k1', {})
+        self.assertTotals(cart, '0.00', 0, 0)
+    
+    def test_price_changes_reprice_persisted_lines(self):
+        """Test saving a product reprices its cart lines and deactivating it drops them."""
+        cart = store_cart('k1', {self.first: 2, self.second: 1})
+        self.products[0].price = Decimal('4.00')
+        self.products[0].save()
+        self.assertTotals(cart, '13.00', 2, 3)
+        self.products[1].is_active = False
+        self.products[1].save()
+        self.assertTotals(cart, '8.00', 1, 2)
+    
+    def test_cart_changes_are_written_behind(self):
+        """Test cart edits stash the cart for one queued flush instead of writing rows."""
+        add_url = reverse('add_to_cart', args=[self.first])
+        with patch('apps.core.tasks.persist_cart') as task, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(add_url, {'quantity': 1})
+            self.client.post(add_url, {'quantity': 1})
+        self.assertFalse(Cart.objects.exists())
+        cart_key = self.client.session['cart_key']
+        task.apply_async.assert_called_once_with((cart_key,), countdown=CART_SYNC_DELAY)
+        
+        cart = persist_cart(cart_key)
+        self.assertEqual(list(Cart.objects.get(pk=cart).items.values_list('product_id', 'quantity')), [(self.first, 2)])
+    
+    def test_cart_view_writes_through_and_reads_one_cart(self):
+        """Test the cart page persists pending changes, then renders from the cart row and its items."""
+        self.client.post(reverse('add_to_cart', args=[self.first]), {'quantity': 2})
+        self.client.post(reverse('add_to_cart', args=[self.second]), {'quantity': 1})
+        response = self.client.get(reverse('cart_view'))
+        self.assertEqual(response.context['total'], Decimal('10.00'))
+        self.assertEqual([item.quantity for item in response.context['cart_items']], [2, 1])
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('cart_view'))
+        tables = [query['sql'].split('FROM "')[1].split('"')[0] for query in queries]
+        self.assertEqual(tables, ['django_session', 'orders_cart', 'orders_cartitem'])
+    
+    def test_merge_on_login(self):
+        """Test logging in adds the session cart to the saved cart and adopts its key."""
+        saved = store_cart('saved', {self.first: 2, self.second: 1}, user=self.user)
+        self.client.post(reverse('add_to_cart', args=[self.first]), {'quantity': 1})
+        self.client.post(reverse('add_to_cart', args=[self.third]), {'quantity': 20})
+        anonymous_key = self.client.session['cart_key']
+        store_cart(anonymous_key, load_cart(self.client.session))
+        
+        self.client.post(reverse('login'), {'username': 'carts', 'password': 'cartspass123'})
+        session = self.client.session
+        self.assertEqual(session['cart_key'], 'saved')
+        self.assertEqual(load_cart(session), {self.first: 3, self.second: 1, self.third: 10})
+        self.assertFalse(Cart.objects.filter(key=anonymous_key).exists())
+        self.assertFalse(StockReservation.objects.filter(cart_key=anonymous_key).exists())
+        self.assertEqual(StockReservation.objects.get(cart_key='saved', product_id=self.first).quantity, 3)
+        self.assertTotals(saved, '87.50', 3, 14)
+    
+    def test_merge_discards_queued_anonymous_cart(self):
+        """Test the anonymous cart's queued write-behind cannot recreate it after login."""
+        store_cart('saved', {self.first: 1}, user=self.user)
+        with patch('apps.core.tasks.persist_cart'), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_to_cart', args=[self.second]), {'quantity': 1})
+        anonymous_key = self.client.session['cart_key']
+        
+        self.client.post(reverse('login'), {'username': 'carts', 'password': 'cartspass123'})
+        self.assertIsNone(persist_cart(anonymous_key))
+        self.assertFalse(Cart.objects.filter(key=anonymous_key).exists())
+    
+    def test_logging_in_again_keeps_the_cart(self):
+        """Test a signed-in user posting the login form again does not add the cart to itself."""
+        self.client.post(reverse('login'), {'username': 'carts', 'password': 'cartspass123'})
+        self.client.post(reverse('add_to_cart', args=[self.first]), {'quantity': 2})
+        self.client.get(reverse('cart_view'))
+        cart = Cart.objects.get(user=self.user)
+        
+        self.client.post(reverse('login'), {'username': 'carts', 'password': 'cartspass123'})
+        self.assertEqual(load_cart(self.client.session), {self.first: 2})
+        self.assertEqual(StockReservation.objects.get(cart_key=cart.key).quantity, 2)
+        self.assertTotals(cart, '5.00', 1, 2)
+    
+    def test_saved_cart_follows_user_to_another_device(self):
+        """Test a new session picks up the user's saved cart on login."""
+        self.client.force_login(self.user)
+        session = self.client.session
+        merge_cart_on_login(session, self.user)
+        save_cart(session, {self.first: 1})
+        session.save()
+        self.client.get(reverse('cart_view'))
+        
+        other = Client()
+        other.post(reverse('login'), {'username': 'carts', 'password': 'cartspass123'})
+        self.assertEqual(load_cart(other.session), {self.first: 1})
+        self.assertEqual(Cart.objects.get(user=self.user).key, other.session['cart_key'])
+
+
+class TestCheckoutService(TestCase):
+    """Unit tests for the transactional checkout pipeline."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='checkoutuser',
+            email='checkout@example.com',
+            password='checkoutpass123'
+        )
+        self.category = Category.objects.create(
+            name='Electronics',
+            slug='electronics'
+        )
+        self.products = [
+            Product.objects.create(
+                name=f'Checkout Product {i}',
+                slug=f'checkout-product-{i}',
+                description='For checkout',
+                price=Decimal('5.00'),
+                category=self.category,
+                stock_quantity=3,
+            )
+            for i in range(3)
+        ]
+        self.shipping = {
+            'shipping_address': '123 Checkout St',
+            'shipping_city': 'Checkout City',
+            'shipping_postal_code': '12345',
+            'shipping_country': 'Checkout Country',
+        }
+    
+    def test_place_order_decrements_stock(self):
+        """Test order items and stock are written in bulk."""
+        cart = {str(product.id): 2 for product in self.products}
+        with self.assertNumQueries(7):
+            order = place_order(self.user, cart, **self.shipping)
+        self.assertEqual(order.total_amount, Decimal('30.00'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(
+            list(Product.objects.values_list('stock_quantity', flat=True)), [1, 1, 1]
+        )
+    
+    def test_place_order_writes_summary(self):
+        """Test the order carries its line count and first line's product for order lists."""
+        cart = {str(self.products[2].id): 1, str(self.products[1].id): 2}
+        order = place_order(self.user, cart, **self.shipping)
+        order.refresh_from_db()
+        self.assertEqual(order.item_count, 2)
+        self.assertEqual(order.preview_name, 'Checkout Product 1')
+        self.assertEqual(order.preview_image_url, self.products[1].image_url)
+    
+    def test_insufficient_stock_rolls_back(self):
+        """Test a short line aborts the whole order."""
+        cart = {str(self.products[0].id): 1, str(self.products[1].id): 4}
+        with self.assertRaises(InsufficientStockError):
+            place_order(self.user, cart, **self.shipping)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(id=self.products[0].id).stock_quantity, 3)
+    
+    def test_other_carts_holds_are_not_sellable(self):
+        """Test stock held by another cart's reservation blocks checkout."""
+        reserve_stock(self.products[0], 'other-cart', 2)
+        reserve_stock(self.products[0], 'my-cart', 1)
+        with self.assertRaises(InsufficientStockError):
+            place_order(self.user, {str(self.products[0].id): 2}, **self.shipping)
+        place_order(self.user, {str(self.products[0].id): 1}, cart_key='my-cart', **self.shipping)
+        self.assertFalse(StockReservation.objects.filter(cart_key='my-cart').exists())
+    
+    def test_checkout_view_places_order(self):
+        """Test checkout POST places the order and clears the cart."""
+        self.client.force_login(self.user)
+        session = self.client.session
+        save_cart(session, {str(self.products[0].id): 1})
+        session.save()
+        response = self.client.post(reverse('checkout'), self.shipping)
+        order = Order.objects.get(user=self.user)
+        self.assertRedirects(
+            response, reverse('payment_create', args=[order.id]), fetch_redirect_response=False
+        )
+        self.assertEqual(load_cart(self.client.session), {})
+
+
+@skipUnless(connection.features.has_select_for_update, 'Requires row-level locking.')
+class TestCheckoutConcurrency(TransactionTestCase):
+    """Stress test for concurrent checkouts against one SKU."""
+    
+    def test_concurrent_checkouts_never_oversell(self):
+        """Test threaded checkouts sell exactly the available stock."""
+        out = StringIO()
+        call_command('stress_checkout', threads=8, checkouts=60, stock=25, stdout=out)
+        self.assertIn('oversold: 0', out.getvalue())
+        self.assertIn('checkouts/sec', out.getvalue())
+
+
+class TestOrderAPIQueries(TestCase):
+    """Query-count regression tests for the nested order API."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='nested', password='nestedpass123')
+        self.client.force_authenticate(user=self.user)
+        categories = [
+            Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(3)
+        ]
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', slug=f'product-{i}', description='Test',
+                price=Decimal('5.00'), category=categories[i % 3], stock_quantity=10,
+            )
+            for i in range(6)
+        ]
+        for _ in range(5):
+            self.create_order()
+    
+    def create_order(self):
+        order = Order.objects.create(
+            user=self.user, total_amount=Decimal('30.00'), shipping_address='1 Main St',
+            shipping_city='City', shipping_postal_code='12345', shipping_country='Country',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for product in self.products
+        ])
+        return order
+    
+    def test_order_list_query_count_is_constant(self):
+        """Test listing orders costs the same number of queries for any page size."""
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        item = response.data['results'][0]['items'][0]
+        self.assertIn('name', item['product']['category'])
+        
+        for _ in range(5):
+            self.create_order()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(len(response.data['results']), 10)
+    
+    def test_order_items_query_count(self):
+        """Test the items action loads products and categories with the order."""
+        order = Order.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('order-items', args=[order.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]['product']['category']['slug'], 'category-0')
+
+
+class TestOrderHistory(TestCase):
+    """Tests for the paginated order history page."""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='history', password='historypass123')
+        self.client.force_login(self.user)
+        Order.objects.bulk_create([
+            Order(
+                user=self.user, total_amount=Decimal('10.00'), item_count=3,
+                preview_name=f'Preview {i}', shipping_address='1 Main St',
+                shipping_city='City', shipping_postal_code='12345', shipping_country='Country',
+            )
+            for i in range(2000)
+        ])
+    
+    def test_first_page_reads_orders_once(self):
+        """Test the first page of a long history is one orders query and no item queries."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order_list'))
+        order_queries = [query['sql'] for query in queries if 'orders_order' in query['sql']]
+        self.assertEqual(len(order_queries), 1)
+        self.assertNotIn('orders_orderitem', order_queries[0])
+        self.assertEqual(len(response.context['orders']), 20)
+        self.assertContains(response, 'and 2 more')
+        self.assertEqual(response.context['next_page_url'], '?page=2')
+    
+    def test_htmx_pages_render_rows(self):
+        """Test later pages come back as table rows for infinite scroll."""
+        response = self.client.get(reverse('order_list'), {'page': 100}, HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(response, 'orders/partials/order_rows.html')
+        self.assertEqual(len(response.context['orders']), 20)
+        self.assertIsNone(response.context['next_page_url'])
+    
+    def test_admin_loads_users_with_orders(self):
+        """Test the order admin joins the user that Order.__str__ reads."""
+        staff = User.objects.create_superuser(username='staff', password='staffpass123')
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:orders_order_changelist'))
+        self.assertEqual(response.status_code, 200)
+        user_lookups = [query for query in queries if 'FROM "accounts_user"' in query['sql']]
+        # Only the signed-in staff user; order owners come joined to the orders
+        self.assertEqual(len(user_lookups), 1)
+
+
+class TestOrderTransitions(TestCase):
+    """Tests for validated order status transitions and the bulk API."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        self.staff = User.objects.create_user(username='warehouse', password='warehousepass123', is_staff=True)
+        self.order = self.create_orders(1, 'pending')[0]
+    
+    def create_orders(self, count, status):
+        return Order.objects.bulk_create([
+            Order(
+                user=self.user, status=status, total_amount=Decimal('10.00'),
+                shipping_address='1 Main St', shipping_city='City',
+                shipping_postal_code='12345', shipping_country='Country',
+            )
+            for _ in range(count)
+        ])
+    
+    def test_transition_writes_status_only(self):
+        """Test a valid transition updates only status and updated_at and is recorded."""
+        with CaptureQueriesContext(connection) as queries:
+            transition_order(self.order, 'processing', changed_by=self.staff, note='Paid')
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('total_amount', updates[0])
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'processing')
+        change = OrderStatusChange.objects.get(order=self.order)
+        self.assertEqual((change.from_status, change.to_status, change.changed_by), ('pending', 'processing', self.staff))
+    
+    def test_invalid_transition_is_rejected(self):
+        """Test skipping a step raises and leaves the order untouched."""
+        with self.assertRaises(InvalidTransitionError):
+            transition_order(self.order, 'delivered')
+        # Validated against the stored status, not the instance's.
+        self.order.status = 'shipped'
+        with self.assertRaises(InvalidTransitionError):
+            transition_order(self.order, 'delivered')
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'pending')
+        self.assertFalse(OrderStatusChange.objects.exists())
+    
+    def test_bulk_transition_is_one_update(self):
+        """Test the bulk endpoint moves eligible orders with one UPDATE and skips the rest."""
+        processing = [order.pk for order in self.create_orders(2000, 'processing')]
+        self.client.force_authenticate(user=self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('order-bulk-transition'),
+                {'ids': processing + [self.order.pk], 'status': 'shipped', 'note': 'Batch 42'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 2000, 'skipped': [self.order.pk]})
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 2000)
+        self.assertEqual(OrderStatusChange.objects.filter(to_status='shipped', note='Batch 42').count(), 2000)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'pending')
+    
+    def test_transition_endpoints_are_staff_only(self):
+        """Test customers can neither transition orders nor write status directly."""
+        Order.objects.filter(pk=self.order.pk).update(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('order-bulk-transition'), {'ids': [self.order.pk], 'status': 'cancelled'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('order-transition', args=[self.order.pk]), {'status': 'cancelled'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.patch(reverse('order-detail', args=[self.order.pk]), {'status': 'delivered'})
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'pending')
+    
+    def test_single_transition_endpoint(self):
+        """Test the detail action applies valid transitions and answers 409 otherwise."""
+        self.client.force_authenticate(user=self.staff)
+        url = reverse('order-transition', args=[self.order.pk])
+        response = self.client.post(url, {'status': 'shipped'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(url, {'status': 'cancelled'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'cancelled')
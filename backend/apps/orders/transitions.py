@@ -0,0 +1,108 @@
+"""Order status transitions.
+
+``TRANSITIONS`` lists where each status may go. Every change goes through
+this module: it is validated, writes only ``status`` and ``updated_at``,
+and is recorded in ``OrderStatusChange``. ``bulk_transition`` moves any
+number of orders with one ``UPDATE`` and one batched insert of history,
+so warehouse batches do not save orders one at a time. Orders entering a
+paid status are added to the sales rollups in the same transaction, and
+taken out again when cancelled (see ``apps.core.services``).
+"""
+
+from django.db import transaction
+from django.db.models.functions import Now
+from apps.core import services as analytics
+from common.exceptions import InvalidTransitionError
+from .models import Order, OrderStatusChange
+
+TRANSITIONS = {
+    'pending': ('processing', 'cancelled'),
+    'processing': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+}
+
+HISTORY_BATCH_SIZE = 1000
+# Ids per UPDATE, well inside every backend's limit on query parameters. The
+# bulk API accepts at most this many, so each of its calls is one UPDATE.
+UPDATE_BATCH_SIZE = 10000
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def sources(target):
+    """Statuses an order may move to ``target`` from."""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def _update_sales(recorded, target):
+    """Add or remove orders' sales for a move to ``target``; returns the new ``sales_recorded``.
+
+    ``recorded`` lists the moving orders' ids with their stored flag.
+    """
+    counted = target in analytics.SALES_STATUSES
+    changed = [pk for pk, was_recorded in recorded if was_recorded != counted]
+    if changed:
+        (analytics.add_sales if counted else analytics.remove_sales)(changed)
+    return counted
+
+
+def transition_order(order, target, changed_by=None, note=''):
+    """Move one order to ``target``, raising ``InvalidTransitionError`` if it may not go there.
+
+    The row is locked and its status re-read first, so a concurrent change
+    cannot be overwritten with a transition validated against stale data.
+    """
+    with transaction.atomic():
+        current, recorded = (
+            Order.objects.select_for_update().values_list('status', 'sales_recorded').get(pk=order.pk)
+        )
+        if not can_transition(current, target):
+            raise InvalidTransitionError(current, target)
+        order.status = target
+        order.sales_recorded = _update_sales([(order.pk, recorded)], target)
+        order.save(update_fields=['status', 'sales_recorded', 'updated_at'])
+        OrderStatusChange.objects.create(
+            order=order, from_status=current, to_status=target, changed_by=changed_by, note=note
+        )
+    return order
+
+
+def bulk_transition(orders, target, changed_by=None, note=''):
+    """Move every order in ``orders`` (a queryset) that may go to ``target``.
+
+    Orders in any other status are left alone. The eligible rows are locked
+    and read once for the history and the sales rollups, then moved with
+    one ``UPDATE`` per ``UPDATE_BATCH_SIZE`` ids. Returns the ids moved.
+    """
+    if target not in TRANSITIONS:
+        raise ValueError(f'Unknown order status {target!r}')
+    with transaction.atomic():
+        moved = list(
+            orders.filter(status__in=sources(target))
+            .select_for_update(of=('self',))
+            .order_by('pk')
+            .values_list('pk', 'status', 'sales_recorded')
+        )
+        if not moved:
+            return []
+        ids = [pk for pk, _, _ in moved]
+        for start in range(0, len(moved), UPDATE_BATCH_SIZE):
+            batch = moved[start:start + UPDATE_BATCH_SIZE]
+            recorded = _update_sales([(pk, was_recorded) for pk, _, was_recorded in batch], target)
+            Order.objects.filter(pk__in=[pk for pk, _, _ in batch]).update(
+                status=target, sales_recorded=recorded, updated_at=Now()
+            )
+        OrderStatusChange.objects.bulk_create(
+            [
+                OrderStatusChange(
+                    order_id=pk, from_status=current, to_status=target, changed_by=changed_by, note=note
+                )
+                for pk, current, _ in moved
+            ],
+            batch_size=HISTORY_BATCH_SIZE,
+        )
+    return ids
@@ -1,12 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common.utils import for_server
 from . import views
 
 router = DefaultRouter()
 router.register(r'orders', views.OrderViewSet, basename='order')
 
 urlpatterns = [
-    path('cart/', views.cart_view, name='cart_view'),
+    path('cart/', for_server(views.cart_view, views.acart_view), name='cart_view'),
+    path('cart/summary/', for_server(views.cart_summary, views.acart_summary), name='cart_summary'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/update/<int:product_id>/', views.update_cart, name='update_cart'),
@@ -1,37 +1,59 @@
+from decimal import Decimal
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from decimal import Decimal
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import etag
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from apps.catalog.conditional import arespond_conditionally
 from apps.catalog.models import Product
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderItemSerializer
+from apps.catalog.services import release_stock, reserve_stock
+from common.exceptions import CheckoutError, InvalidTransitionError
+from common.mixins import EagerLoadingMixin
+from common.pagination import KeysetPagination
+from common.utils import arender, get_page_number, get_page_url
+from .models import Order
+from .serializers import (
+    BulkOrderTransitionSerializer, OrderItemSerializer, OrderSerializer, OrderTransitionSerializer,
+)
+from .services import (
+    aget_cart_summary, aload_persisted_cart, cart_summary_tag, decode_cart, get_cart_key,
+    get_cart_summary, load_cart, place_order, resolve_cart, save_cart, sync_cart,
+)
+from . import transitions
+
+ORDER_PAGE_SIZE = 20
+ORDER_LIST_FIELDS = (
+    'id', 'status', 'total_amount', 'item_count', 'preview_name', 'preview_image_url', 'created_at',
+)
 
 
 def get_cart(request):
-    cart = request.session.get('cart', {})
-    return cart
+    return load_cart(request.session)
 
 
 def add_to_cart(request, product_id):
     if request.method == 'POST':
         product = get_object_or_404(Product, id=product_id, is_active=True)
         cart = get_cart(request)
-        quantity = int(request.POST.get('quantity', 1))
+        quantity = cart.get(product_id, 0) + int(request.POST.get('quantity', 1))
         
-        if str(product_id) in cart:
-            cart[str(product_id)] += quantity
-        else:
-            cart[str(product_id)] = quantity
+        held = reserve_stock(product, get_cart_key(request.session), quantity)
+        if held < quantity:
+            messages.warning(request, f'Only {held} items available in stock.')
         
-        if cart[str(product_id)] > product.stock_quantity:
-            cart[str(product_id)] = product.stock_quantity
-            messages.warning(request, f'Only {product.stock_quantity} items available in stock.')
+        if held:
+            cart[product_id] = held
+        else:
+            cart.pop(product_id, None)
         
-        request.session['cart'] = cart
+        save_cart(request.session, cart)
         messages.success(request, f'{product.name} added to cart.')
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -44,9 +66,10 @@ def add_to_cart(request, product_id):
 
 def remove_from_cart(request, product_id):
     cart = get_cart(request)
-    if str(product_id) in cart:
-        del cart[str(product_id)]
-        request.session['cart'] = cart
+    if product_id in cart:
+        del cart[product_id]
+        release_stock(product_id, get_cart_key(request.session))
+        save_cart(request.session, cart)
         messages.success(request, 'Item removed from cart.')
     return redirect('cart_view')
 
@@ -56,47 +79,84 @@ def update_cart(request, product_id):
         cart = get_cart(request)
         quantity = int(request.POST.get('quantity', 0))
         product = get_object_or_404(Product, id=product_id)
+        cart_key = get_cart_key(request.session)
         
         if quantity <= 0:
-            if str(product_id) in cart:
-                del cart[str(product_id)]
+            cart.pop(product_id, None)
+            release_stock(product_id, cart_key)
         else:
-            if quantity > product.stock_quantity:
-                quantity = product.stock_quantity
-                messages.warning(request, f'Only {product.stock_quantity} items available.')
-            cart[str(product_id)] = quantity
+            held = reserve_stock(product, cart_key, quantity)
+            if held < quantity:
+                messages.warning(request, f'Only {held} items available.')
+            if held:
+                cart[product_id] = held
+            else:
+                cart.pop(product_id, None)
         
-        request.session['cart'] = cart
+        save_cart(request.session, cart)
         return redirect('cart_view')
     
     return redirect('cart_view')
 
 
 def cart_view(request):
-    cart = get_cart(request)
-    cart_items = []
-    total = Decimal('0.00')
-    
-    for product_id, quantity in cart.items():
-        try:
-            product = Product.objects.get(id=product_id, is_active=True)
-            item_total = product.price * quantity
-            total += item_total
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total,
-            })
-        except Product.DoesNotExist:
-            continue
+    # Reads the persisted cart row and its items, writing the session's
+    # changes through first if they have not been persisted yet.
+    cart, cart_items = sync_cart(request.session)
     
     context = {
         'cart_items': cart_items,
-        'total': total,
+        'total': cart.subtotal if cart else Decimal('0.00'),
     }
     return render(request, 'orders/cart.html', context)
 
 
+async def acart_view(request):
+    """Async ``cart_view``, for the ``'asgi'`` server profile.
+
+    A session in step with its persisted cart is read with the async ORM;
+    otherwise ``sync_cart`` reconciles them in a worker thread, since
+    writing the cart needs a transaction.
+    """
+    cart_key = await request.session.aget('cart_key')
+    cart = None
+    if cart_key and not await request.session.aget('cart_dirty'):
+        cart, cart_items = await aload_persisted_cart(cart_key)
+        persisted = {item.product_id: item.quantity for item in cart_items}
+        if cart is None or persisted != decode_cart(await request.session.aget('cart')):
+            cart = None
+    if cart is None:
+        cart, cart_items = await sync_to_async(sync_cart)(request.session)
+    
+    context = {
+        'cart_items': cart_items,
+        'total': cart.subtotal if cart else Decimal('0.00'),
+    }
+    return await arender(request, 'orders/cart.html', context)
+
+
+def cart_summary_etag(request):
+    return f'cart-{cart_summary_tag(get_cart_summary(request.session))}'
+
+
+@etag(cart_summary_etag)
+def cart_summary(request):
+    response = JsonResponse(get_cart_summary(request.session))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+async def acart_summary(request):
+    """Async ``cart_summary``; reads only the session."""
+    summary = await aget_cart_summary(request.session)
+
+    async def render():
+        return JsonResponse(summary)
+    return await arespond_conditionally(
+        request, render, etag=quote_etag(f'cart-{cart_summary_tag(summary)}'), public=False
+    )
+
+
 @login_required
 def checkout(request):
     cart = get_cart(request)
@@ -105,67 +165,31 @@ def checkout(request):
         return redirect('cart_view')
     
     if request.method == 'POST':
-        user = request.user
-        cart_items = []
-        total = Decimal('0.00')
-        
-        for product_id, quantity in cart.items():
-            product = Product.objects.get(id=product_id, is_active=True)
-            if quantity > product.stock_quantity:
-                messages.error(request, f'Insufficient stock for {product.name}.')
-                return redirect('cart_view')
-            
-            item_total = product.price * quantity
-            total += item_total
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'price': product.price,
-            })
+        shipping = {
+            'shipping_address': request.POST.get('shipping_address'),
+            'shipping_city': request.POST.get('shipping_city'),
+            'shipping_postal_code': request.POST.get('shipping_postal_code'),
+            'shipping_country': request.POST.get('shipping_country'),
+        }
         
-        shipping_address = request.POST.get('shipping_address')
-        shipping_city = request.POST.get('shipping_city')
-        shipping_postal_code = request.POST.get('shipping_postal_code')
-        shipping_country = request.POST.get('shipping_country')
-        
-        if not all([shipping_address, shipping_city, shipping_postal_code, shipping_country]):
+        if not all(shipping.values()):
             messages.error(request, 'Please fill in all shipping details.')
+            cart_items, total = resolve_cart(cart)
             return render(request, 'orders/checkout.html', {'cart_items': cart_items, 'total': total})
         
-        order = Order.objects.create(
-            user=user,
-            total_amount=total,
-            shipping_address=shipping_address,
-            shipping_city=shipping_city,
-            shipping_postal_code=shipping_postal_code,
-            shipping_country=shipping_country,
-        )
-        
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item['product'],
-                quantity=item['quantity'],
-                price=item['price'],
+        try:
+            order = place_order(
+                request.user, cart, cart_key=get_cart_key(request.session), **shipping
             )
-            item['product'].stock_quantity -= item['quantity']
-            item['product'].save()
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return redirect('cart_view')
         
-        request.session['cart'] = {}
+        save_cart(request.session, {})
         request.session['order_id'] = order.id
         return redirect('payment_create', order_id=order.id)
     
-    cart_items = []
-    total = Decimal('0.00')
-    for product_id, quantity in cart.items():
-        product = Product.objects.get(id=product_id, is_active=True)
-        item_total = product.price * quantity
-        total += item_total
-        cart_items.append({
-            'product': product,
-            'quantity': quantity,
-            'total': item_total,
-        })
+    cart_items, total = resolve_cart(cart)
     
     context = {
         'cart_items': cart_items,
@@ -176,8 +200,22 @@ def checkout(request):
 
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(user=request.user)
-    context = {'orders': orders}
+    # One query per page: the summary columns on Order stand in for its
+    # items, and the (user, -created_at, -id) index serves the ordering.
+    page = get_page_number(request)
+    offset = (page - 1) * ORDER_PAGE_SIZE
+    rows = list(
+        Order.objects.filter(user=request.user)
+        .only(*ORDER_LIST_FIELDS)
+        .order_by('-created_at', '-id')[offset:offset + ORDER_PAGE_SIZE + 1]
+    )
+    context = {
+        'orders': rows[:ORDER_PAGE_SIZE],
+        'next_page_url': get_page_url(request, page + 1) if len(rows) > ORDER_PAGE_SIZE else None,
+    }
+    
+    if request.htmx:
+        return render(request, 'orders/partials/order_rows.html', context)
     return render(request, 'orders/order_list.html', context)
 
 
@@ -188,17 +226,48 @@ def order_detail(request, order_id):
     return render(request, 'orders/order_detail.html', context)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
+        orders = Order.objects.select_related('user')
         if self.request.user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=self.request.user)
+            return orders
+        return orders.filter(user=self.request.user)
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+    def transition(self, request, pk=None):
+        """Move one order to another status (staff only); 409 if it may not go there."""
+        order = self.get_object()
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            transitions.transition_order(
+                order, serializer.validated_data['status'], request.user, serializer.validated_data['note']
+            )
+        except InvalidTransitionError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(order).data)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-transition', permission_classes=[IsAdminUser])
+    def bulk_transition(self, request):
+        """Move many orders at once (staff only); orders that may not make the move are skipped."""
+        serializer = BulkOrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data['ids'])
+        moved = transitions.bulk_transition(
+            Order.objects.filter(pk__in=ids),
+            serializer.validated_data['status'],
+            request.user,
+            serializer.validated_data['note'],
+        )
+        return Response({'updated': len(moved), 'skipped': sorted(ids.difference(moved))})
+    
     @action(detail=True, methods=['get'])
     def items(self, request, pk=None):
         order = self.get_object()
+        # get_object() already prefetched items with their products and categories
         items = order.items.all()
         serializer = OrderItemSerializer(items, many=True)
         return Response(serializer.data)
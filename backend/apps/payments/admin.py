@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, WebhookEvent
 
 
 @admin.register(Payment)
@@ -8,3 +8,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     search_fields = ['stripe_payment_intent_id', 'order__id']
 
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['stripe_event_id', 'event_type', 'status', 'received_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['stripe_event_id']
+    readonly_fields = ['stripe_event_id', 'event_type', 'payload', 'received_at', 'processed_at']
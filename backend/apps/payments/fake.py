@@ -0,0 +1,63 @@
+"""In-process stand-in for the parts of the Stripe SDK the payments app uses.
+
+Point ``STRIPE_CLIENT`` at ``apps.payments.fake.stripe`` to run the payment
+flow offline. Intents live in memory, so an intent created in one process
+is unknown to another (a Celery worker, say); the fake reports those as
+``succeeded``.
+"""
+
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakePaymentIntents:
+    """Mimics ``stripe.PaymentIntent`` ``create``/``retrieve``, including idempotency keys."""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.intents = {}
+        self.idempotent = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def create(self, amount, currency, metadata=None, idempotency_key=None, **kwargs):
+        time.sleep(self.owner.latency)
+        with self.lock:
+            if idempotency_key in self.idempotent:
+                return self.idempotent[idempotency_key]
+            intent_id = f'pi_fake_{next(self.ids)}'
+            intent = SimpleNamespace(
+                id=intent_id,
+                client_secret=f'{intent_id}_secret',
+                amount=amount,
+                currency=currency,
+                metadata=metadata or {},
+                status='requires_payment_method',
+            )
+            self.intents[intent_id] = intent
+            if idempotency_key is not None:
+                self.idempotent[idempotency_key] = intent
+        return intent
+
+    def retrieve(self, intent_id, **kwargs):
+        time.sleep(self.owner.latency)
+        with self.lock:
+            return self.intents.get(intent_id) or SimpleNamespace(id=intent_id, status='succeeded')
+
+    def set_status(self, intent_id, status):
+        """Move an intent to ``status``, as the customer or Stripe would."""
+        with self.lock:
+            self.intents.setdefault(intent_id, SimpleNamespace(id=intent_id)).status = status
+
+
+class FakeStripe:
+    """``latency`` (seconds) is added to every call to imitate the network."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.PaymentIntent = FakePaymentIntents(self)
+
+
+stripe = FakeStripe()
@@ -0,0 +1,91 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from apps.orders.models import Order
+from apps.payments.fake import stripe as fake_stripe
+from apps.payments.models import Payment
+from ecommerce_platform.celery import app as celery_app
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long payment_success holds a web worker when Stripe is checked '
+        'inline (eager task) versus queued for a Celery worker, using the fake Stripe client.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent web workers to simulate.')
+        parser.add_argument('--latency', type=float, default=0.3, help='Fake Stripe latency in seconds.')
+
+    def run(self, user, payment_ids, workers):
+        local = threading.local()
+        timings = []
+        lock = threading.Lock()
+
+        def request(payment_id):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            local.client.get(reverse('payment_success', args=[payment_id]))
+            elapsed = time.perf_counter() - started
+            with lock:
+                timings.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(request, payment_ids))
+        return time.perf_counter() - started, timings
+
+    def report(self, label, wall, timings):
+        timings = sorted(timings)
+        busy = sum(timings)
+        self.stdout.write(
+            f'{label:<10} {len(timings) / wall:8.1f} req/s   '
+            f'mean {statistics.mean(timings) * 1000:8.1f} ms   '
+            f'p95 {timings[int(len(timings) * 0.95) - 1] * 1000:8.1f} ms   '
+            f'worker time {busy:7.2f} s'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username='bench-payment-verification')
+        fake_stripe.latency = options['latency']
+        conf = celery_app.conf
+        saved = conf.CELERY_TASK_ALWAYS_EAGER, conf.CELERY_BROKER_URL
+        try:
+            with override_settings(
+                STRIPE_CLIENT='apps.payments.fake.stripe',
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                for label, eager in (('inline', True), ('background', False)):
+                    payment_ids = []
+                    for _ in range(options['requests']):
+                        order = Order.objects.create(
+                            user=user, total_amount=Decimal('10.00'), shipping_address='1 Bench St',
+                            shipping_city='Bench', shipping_postal_code='00000', shipping_country='Bench',
+                        )
+                        payment_ids.append(Payment.objects.create(
+                            order=order, stripe_payment_intent_id=f'pi_bench_{label}_{order.id}',
+                            amount=order.total_amount,
+                        ).id)
+                    # Inline runs the task inside the request, like the old synchronous
+                    # Stripe call; background only enqueues (to an in-memory broker).
+                    conf.CELERY_TASK_ALWAYS_EAGER = eager
+                    conf.CELERY_BROKER_URL = 'memory://'
+                    wall, timings = self.run(user, payment_ids, options['workers'])
+                    self.report(label, wall, timings)
+        finally:
+            conf.CELERY_TASK_ALWAYS_EAGER, conf.CELERY_BROKER_URL = saved
+            fake_stripe.latency = 0.0
+            Order.objects.filter(user=user).delete()
+            user.delete()
@@ -0,0 +1,142 @@
+import hashlib
+import hmac
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+from apps.orders.models import Order
+from apps.payments import services
+from apps.payments.models import Payment, WebhookEvent
+from ecommerce_platform.celery import app as celery_app
+
+User = get_user_model()
+
+
+def sign(payload, secret):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def p95(timings):
+    # quantiles needs two points; 'inclusive' keeps it within the timings seen
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=20, method='inclusive')[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire synthetic signed Stripe events (including replays) at the webhook endpoint, '
+        'report acknowledgement latency and deduplication, then drain them through the worker path.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10_000)
+        parser.add_argument('--replay-rate', type=float, default=0.2, help='Share of deliveries that repeat an event id.')
+        parser.add_argument('--payments', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def deliver(self, deliveries, threads):
+        local = threading.local()
+        timings = []
+        failures = []
+        lock = threading.Lock()
+        url = reverse('stripe_webhook')
+
+        def post(delivery):
+            payload, signature = delivery
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.post(
+                url, data=payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+            )
+            elapsed = time.perf_counter() - started
+            with lock:
+                timings.append(elapsed)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+        started = time.perf_counter()
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(post, deliveries))
+        else:
+            for delivery in deliveries:
+                post(delivery)
+        return time.perf_counter() - started, sorted(timings), failures
+
+    def handle(self, *args, **options):
+        if options['events'] < 1 or not 0 <= options['replay_rate'] < 1:
+            raise CommandError('Need at least one event and a replay rate in [0, 1).')
+        run = uuid.uuid4().hex[:8]
+        secret = settings.STRIPE_WEBHOOK_SECRET or 'whsec_replay'
+        user = User.objects.create_user(username=f'replay-webhooks-{run}')
+        orders = Order.objects.bulk_create([
+            Order(
+                user=user, total_amount=Decimal('10.00'), shipping_address='1 Replay St',
+                shipping_city='Replay', shipping_postal_code='00000', shipping_country='Replay',
+            )
+            for _ in range(options['payments'])
+        ])
+        orders = list(Order.objects.filter(user=user).order_by('pk'))
+        Payment.objects.bulk_create([
+            Payment(order=order, stripe_payment_intent_id=f'pi_replay_{run}_{i}', amount=order.total_amount)
+            for i, order in enumerate(orders)
+        ])
+
+        unique = max(int(options['events'] * (1 - options['replay_rate'])), 1)
+        deliveries = []
+        for i in range(options['events']):
+            n = i % unique
+            payload = json.dumps({
+                'id': f'evt_replay_{run}_{n}',
+                'type': 'payment_intent.succeeded',
+                'data': {'object': {'id': f'pi_replay_{run}_{n % options["payments"]}', 'object': 'payment_intent'}},
+            })
+            deliveries.append((payload, sign(payload, secret)))
+
+        conf = celery_app.conf
+        saved = conf.CELERY_TASK_ALWAYS_EAGER, conf.CELERY_BROKER_URL
+        try:
+            # Acknowledge-only: tasks go to an in-memory broker and are drained below.
+            conf.CELERY_TASK_ALWAYS_EAGER, conf.CELERY_BROKER_URL = False, 'memory://'
+            with override_settings(
+                STRIPE_WEBHOOK_SECRET=secret, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+            ):
+                wall, timings, failures = self.deliver(deliveries, options['threads'])
+        finally:
+            conf.CELERY_TASK_ALWAYS_EAGER, conf.CELERY_BROKER_URL = saved
+
+        events = WebhookEvent.objects.filter(stripe_event_id__startswith=f'evt_replay_{run}_')
+        stored = events.count()
+        self.stdout.write(
+            f'delivered {len(timings)} ({len(timings) - unique} replays) in {wall:.2f} s: '
+            f'{len(timings) / wall:,.0f} acks/sec, p50 {statistics.median(timings) * 1000:.1f} ms, '
+            f'p95 {p95(timings) * 1000:.1f} ms, non-200: {len(failures)}'
+        )
+        self.stdout.write(f'stored events: {stored} (expected {unique})')
+
+        started = time.perf_counter()
+        for event_id in events.filter(status='pending').values_list('pk', flat=True).iterator():
+            services.process_webhook_event(event_id)
+        drained = time.perf_counter() - started
+        succeeded = Payment.objects.filter(order__user=user, status='succeeded').count()
+        processing = Order.objects.filter(user=user, status='processing').count()
+        self.stdout.write(
+            f'processed {stored} events in {drained:.2f} s ({stored / max(drained, 1e-9):,.0f} events/sec); '
+            f'payments succeeded: {succeeded}/{options["payments"]}, orders processing: {processing}'
+        )
+
+        events.delete()
+        Order.objects.filter(user=user).delete()
+        user.delete()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from apps.payments.services.gateway import LATENCY_BUCKETS, reset_shared_latency, shared_latency
+
+
+def bound(ms):
+    return f'<={ms} ms' if ms is not None else f'>{LATENCY_BUCKETS[-1]} ms'
+
+
+class Command(BaseCommand):
+    help = 'Show Stripe call latency per operation, summed over every web and worker process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing.')
+
+    def handle(self, *args, **options):
+        latency = {operation: snapshot for operation, snapshot in shared_latency().items() if snapshot['count']}
+        if not latency:
+            self.stdout.write('no Stripe calls recorded')
+        for operation, snapshot in latency.items():
+            self.stdout.write(
+                f"{operation}: calls: {snapshot['count']} mean: {snapshot['sum_ms'] / snapshot['count']:.1f} ms "
+                f"p50: {bound(snapshot['p50_ms'])} p95: {bound(snapshot['p95_ms'])}"
+            )
+            self.stdout.write('  ' + ' '.join(f'{name}: {count}' for name, count in snapshot['buckets'].items()))
+        if options['reset']:
+            reset_shared_latency()
@@ -1,3 +0,0 @@
-"""Service helpers for interacting with Stripe SDK and managing idempotency keys."""
-
-
@@ -0,0 +1,136 @@
+"""Service helpers for interacting with Stripe SDK and managing idempotency keys.
+
+Every call to Stripe goes through the gateway in ``gateway.py``; this
+module holds the payment and webhook logic built on it.
+"""
+
+import json
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Now
+from apps.orders.models import Order
+from apps.orders.transitions import bulk_transition
+from ..models import Payment, WebhookEvent
+from .gateway import get_gateway, get_stripe_client
+
+# Intent states that settle a pending payment; anything else is still in flight.
+SUCCEEDED_STATES = {'succeeded'}
+FAILED_STATES = {'requires_payment_method', 'canceled'}
+
+# Payment statuses each settlement may move from. A declined intent can still
+# succeed later with another card, but a success is never undone here.
+SETTLE_FROM = {
+    'succeeded': ('pending', 'failed'),
+    'failed': ('pending',),
+}
+
+
+def settle_payments(payments, status):
+    """Move ``payments`` (a queryset) to ``'succeeded'`` or ``'failed'``.
+
+    One conditional ``UPDATE`` for the payments and, on success, a bulk
+    transition of their still-pending orders to ``'processing'``. The
+    conditions make replays and a webhook racing a verification task
+    harmless. Returns the number of payments moved.
+    """
+    with transaction.atomic():
+        updated = payments.filter(status__in=SETTLE_FROM[status]).update(status=status, updated_at=Now())
+        if updated and status == 'succeeded':
+            bulk_transition(Order.objects.filter(payment__in=payments), 'processing', note='Payment succeeded')
+    return updated
+
+
+def apply_intent_status(payment, intent_status):
+    """Settle a payment from its intent's status; returns the payment status."""
+    if intent_status in SUCCEEDED_STATES:
+        settle_payments(Payment.objects.filter(pk=payment.pk), 'succeeded')
+    elif intent_status in FAILED_STATES:
+        settle_payments(Payment.objects.filter(pk=payment.pk), 'failed')
+    return Payment.objects.values_list('status', flat=True).get(pk=payment.pk)
+
+
+def verify_payment(payment_id):
+    """Ask Stripe for a pending payment's intent and apply the result.
+
+    Returns the payment's status afterwards, or ``None`` if it no longer exists.
+    """
+    payment = Payment.objects.filter(pk=payment_id).only('id', 'order_id', 'status', 'stripe_payment_intent_id').first()
+    if payment is None or payment.status != 'pending':
+        return payment and payment.status
+    intent = get_gateway().retrieve_payment_intent(payment.stripe_payment_intent_id)
+    return apply_intent_status(payment, intent.status)
+
+
+def parse_webhook(payload, signature):
+    """Verify a webhook's ``Stripe-Signature`` and return the event as a dict.
+
+    Raises ``stripe.error.SignatureVerificationError`` for a bad or missing
+    signature and ``ValueError`` for a body that is not a Stripe event.
+    """
+    if isinstance(payload, bytes):
+        # verify_header only decodes bytes itself in newer SDKs; older ones
+        # would sign the repr and reject every event.
+        payload = payload.decode('utf-8')
+    stripe.WebhookSignature.verify_header(
+        payload, signature, settings.STRIPE_WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
+    )
+    event = json.loads(payload)
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise ValueError('Not a Stripe event.')
+    return event
+
+
+def record_webhook_event(event):
+    """Store a verified event; returns it, or ``None`` if this event id was already stored."""
+    try:
+        with transaction.atomic():
+            return WebhookEvent.objects.create(
+                stripe_event_id=event['id'], event_type=event['type'], payload=event
+            )
+    except IntegrityError:
+        return None
+
+
+def handle_intent_succeeded(intent):
+    settle_payments(Payment.objects.filter(stripe_payment_intent_id=intent['id']), 'succeeded')
+
+
+def handle_intent_failed(intent):
+    settle_payments(Payment.objects.filter(stripe_payment_intent_id=intent['id']), 'failed')
+
+
+WEBHOOK_HANDLERS = {
+    'payment_intent.succeeded': handle_intent_succeeded,
+    'payment_intent.payment_failed': handle_intent_failed,
+}
+
+
+def process_webhook_event(event_id):
+    """Apply a stored event once; returns its new status, or ``None`` if it was not pending.
+
+    The row is locked with ``SKIP LOCKED`` so concurrent workers (the queued
+    task and the sweeper, say) never apply the same event twice.
+    """
+    with transaction.atomic():
+        event = (
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(pk=event_id, status='pending')
+            .only('id', 'event_type', 'payload')
+            .first()
+        )
+        if event is None:
+            return None
+        handler = WEBHOOK_HANDLERS.get(event.event_type)
+        if handler is not None:
+            handler(event.payload['data']['object'])
+        status = 'processed' if handler else 'ignored'
+        WebhookEvent.objects.filter(pk=event.pk).update(status=status, processed_at=Now())
+    return status
+
+
+def fail_webhook_event(event_id, error):
+    """Park an event that could not be processed so the sweeper stops retrying it."""
+    WebhookEvent.objects.filter(pk=event_id, status='pending').update(
+        status='failed', error=str(error)[:2000], processed_at=Now()
+    )
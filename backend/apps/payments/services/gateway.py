@@ -0,0 +1,272 @@
+"""Stripe gateway: the one place the payments app talks to Stripe.
+
+The SDK is configured once per process with a pooled ``requests`` session
+and bounded connect/read timeouts, replacing its default 80 second read
+timeout. Calls go through ``StripeGateway.call``, which retries transient
+failures with jittered exponential backoff and records a latency histogram
+per operation, both in the process and summed across processes in the
+cache (``manage.py stripe_latency``). Writes carry idempotency keys derived from the order, so a
+retried or repeated create returns the original object instead of making a
+second one.
+
+``STRIPE_CLIENT`` selects what the gateway wraps: the SDK, or a stand-in
+such as ``apps.payments.fake.stripe`` for tests and offline runs.
+"""
+
+import itertools
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Failures where the request may not have reached Stripe, or Stripe asked
+# us to slow down or had an internal error. Anything else (card declined,
+# invalid request) would fail the same way again.
+RETRYABLE_ERRORS = (
+    stripe.error.APIConnectionError,
+    stripe.error.RateLimitError,
+    stripe.error.APIError,
+)
+
+# Upper bounds of the latency histogram buckets, in milliseconds. Slower
+# calls land in a final overflow bucket.
+LATENCY_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Operations with shared latency counters, so they can be listed.
+LATENCY_OPERATIONS_KEY = 'payments:latency:operations'
+
+
+def get_stripe_client():
+    """Return the Stripe SDK, or the object named by ``STRIPE_CLIENT`` (e.g. the fake)."""
+    if settings.STRIPE_CLIENT == 'stripe':
+        return stripe
+    return import_string(settings.STRIPE_CLIENT)
+
+
+def configure_stripe():
+    """Give the SDK a pooled HTTP session and bounded timeouts.
+
+    The SDK's own retries are switched off; ``StripeGateway`` retries
+    instead, so every attempt is timed and backed off with jitter.
+    """
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_POOL_SIZE))
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=session,
+    )
+    stripe.max_network_retries = 0
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+
+
+def idempotency_key(order_id, operation, *parts):
+    """Build the idempotency key for ``operation`` on an order.
+
+    ``STRIPE_IDEMPOTENCY_NAMESPACE`` keeps environments that share a Stripe
+    account (and so the same low order ids) from colliding.
+    """
+    return ':'.join(str(part) for part in (settings.STRIPE_IDEMPOTENCY_NAMESPACE, 'order', order_id, operation, *parts))
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of call durations with fixed millisecond buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ms = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        with self.lock:
+            self.counts[bisect_left(self.buckets, ms)] += 1
+            self.total_ms += ms
+
+    def snapshot(self):
+        """Return the count, sum, per-bucket counts and bucket-bound p50/p95 (ms)."""
+        with self.lock:
+            counts = list(self.counts)
+            total_ms = self.total_ms
+        count = sum(counts)
+        bounds = [*self.buckets, None]
+
+        def quantile(q):
+            if not count:
+                return None
+            seen = 0
+            for bound, bucket_count in zip(bounds, counts):
+                seen += bucket_count
+                if seen >= q * count:
+                    return bound
+        return {
+            'count': count,
+            'sum_ms': round(total_ms, 3),
+            'buckets': {f'le_{bound}' if bound else 'overflow': n for bound, n in zip(bounds, counts)},
+            'p50_ms': quantile(0.5),
+            'p95_ms': quantile(0.95),
+        }
+
+
+def _latency_key(operation, field):
+    return f'payments:latency:{operation}:{field}'
+
+
+def _latency_fields():
+    return [*range(len(LATENCY_BUCKETS) + 1), 'sum_us']
+
+
+def _add(key, delta):
+    """Add ``delta`` to the counter at ``key``; returns whether the counter was missing."""
+    try:
+        cache.incr(key, delta)
+        return False
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return True
+        cache.incr(key, delta)
+        return False
+
+
+def record_latency(operation, seconds):
+    """Add one call of ``operation`` to the latency counters shared through the cache.
+
+    Each web and Celery process keeps its own ``LatencyHistogram``; these
+    counters sum every process's calls. Cache errors are ignored.
+    """
+    ms = seconds * 1000
+    try:
+        _add(_latency_key(operation, bisect_left(LATENCY_BUCKETS, ms)), 1)
+        if _add(_latency_key(operation, 'sum_us'), round(ms * 1000)):
+            # First call since the counters were created, reset or evicted.
+            operations = cache.get(LATENCY_OPERATIONS_KEY) or []
+            if operation not in operations:
+                cache.set(LATENCY_OPERATIONS_KEY, [*operations, operation], timeout=None)
+    except Exception:
+        pass
+
+
+def shared_latency():
+    """Latency snapshot per operation, summed over every process sharing the cache."""
+    result = {}
+    for operation in sorted(cache.get(LATENCY_OPERATIONS_KEY) or []):
+        keys = [_latency_key(operation, field) for field in _latency_fields()]
+        values = cache.get_many(keys)
+        histogram = LatencyHistogram()
+        histogram.counts = [values.get(key, 0) for key in keys[:-1]]
+        histogram.total_ms = values.get(keys[-1], 0) / 1000
+        result[operation] = histogram.snapshot()
+    return result
+
+
+def reset_shared_latency():
+    """Zero the shared counters; the operations stay listed."""
+    cache.delete_many([
+        _latency_key(operation, field)
+        for operation in cache.get(LATENCY_OPERATIONS_KEY) or []
+        for field in _latency_fields()
+    ])
+
+
+class StripeGateway:
+    """Wraps a Stripe client (the SDK or a fake) with retries and latency metrics."""
+
+    def __init__(self, client, max_retries=2, backoff=0.25, max_backoff=2.0, sleep=time.sleep):
+        self.client = client
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, operation):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(operation, LatencyHistogram())
+        return histogram
+
+    def latency(self):
+        """Latency snapshot for every operation called so far in this process; see ``shared_latency``."""
+        return {operation: histogram.snapshot() for operation, histogram in sorted(self.histograms.items())}
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff: uniform in [0, min(max_backoff, backoff * 2**attempt)]."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def call(self, operation, func, *args, **kwargs):
+        """Call ``func`` and record its latency under ``operation``, retrying transient errors."""
+        histogram = self.histogram(operation)
+        for attempt in itertools.count():
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except RETRYABLE_ERRORS as error:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning(
+                    'Stripe %s failed (%s), retry %d of %d in %.2fs',
+                    operation, error.__class__.__name__, attempt + 1, self.max_retries, delay,
+                )
+            finally:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed)
+                record_latency(operation, elapsed)
+            self.sleep(delay)
+
+    def create_payment_intent(self, order, currency='usd'):
+        """Create the order's PaymentIntent; repeating the call returns the same intent."""
+        amount = int(order.total_amount * 100)
+        return self.call(
+            'payment_intent.create',
+            self.client.PaymentIntent.create,
+            amount=amount,
+            currency=currency,
+            metadata={'order_id': order.id},
+            idempotency_key=idempotency_key(order.id, 'payment_intent', amount, currency),
+        )
+
+    def retrieve_payment_intent(self, intent_id):
+        return self.call('payment_intent.retrieve', self.client.PaymentIntent.retrieve, intent_id)
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return this process's gateway for the configured ``STRIPE_CLIENT``.
+
+    Built lazily, so forked web and Celery workers each open their own
+    connection pool.
+    """
+    gateway = _gateways.get(settings.STRIPE_CLIENT)
+    if gateway is None:
+        with _gateways_lock:
+            gateway = _gateways.get(settings.STRIPE_CLIENT)
+            if gateway is None:
+                client = get_stripe_client()
+                if client is stripe:
+                    configure_stripe()
+                gateway = StripeGateway(client, max_retries=settings.STRIPE_MAX_RETRIES)
+                _gateways[settings.STRIPE_CLIENT] = gateway
+    return gateway
+
+
+@receiver(setting_changed)
+def reset_gateways(setting, **kwargs):
+    if setting.startswith('STRIPE_'):
+        _gateways.clear()
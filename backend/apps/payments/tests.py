@@ -1,18 +1,32 @@
 """Payments test harness (unit tests + Stripe webhook integration)."""
 
 import json
-from django.test import TestCase
+import stripe
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from unittest.mock import Mock, patch
 from rest_framework.test import APIClient
 from apps.catalog.models import Category, Product
+from apps.core.tasks import process_pending_webhook_events, verify_payment as verify_payment_task
 from apps.orders.models import Order
-from .models import Payment
+from .fake import stripe as fake_stripe
+from .management.commands.replay_webhooks import sign
+from .models import Payment, WebhookEvent
+from .views import POLL_DELAYS
+from .services import parse_webhook, process_webhook_event, verify_payment
+from .services.gateway import StripeGateway, get_gateway, shared_latency
 
 User = get_user_model()
 
+WEBHOOK_SECRET = 'whsec_test'
+
 
 class TestPaymentModel(TestCase):
     """Unit tests for Payment model."""
@@ -68,6 +82,7 @@ class TestPaymentViews(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect to login
 
 
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
 class TestStripeWebhook(TestCase):
     """Tests for Stripe webhook integration."""
     
@@ -77,5 +92,297 @@ class TestStripeWebhook(TestCase):
         response = client.post(reverse('stripe_webhook'))
         # Should return some response (400 for missing signature, etc.)
         self.assertIn(response.status_code, [200, 400, 403])
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='hook', password='hookpass123')
+        self.order = Order.objects.create(
+            user=self.user,
+            total_amount=Decimal('40.00'),
+            shipping_address='1 Hook St',
+            shipping_city='Hook City',
+            shipping_postal_code='12345',
+            shipping_country='Hook Country'
+        )
+        self.payment = Payment.objects.create(
+            order=self.order, stripe_payment_intent_id='pi_hook', amount=self.order.total_amount
+        )
+    
+    def post_event(self, event_id, event_type='payment_intent.succeeded', secret=WEBHOOK_SECRET):
+        payload = json.dumps({'id': event_id, 'type': event_type, 'data': {'object': {'id': 'pi_hook'}}})
+        return Client().post(
+            reverse('stripe_webhook'), data=payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign(payload, secret),
+        )
+    
+    def test_event_is_stored_once_and_queued_once(self):
+        """Test a signed event is acknowledged, stored and queued, and a replay is not."""
+        with patch('apps.payments.views.process_webhook_event') as task:
+            self.assertEqual(self.post_event('evt_1').status_code, 200)
+            self.assertEqual(self.post_event('evt_1').status_code, 200)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.stripe_event_id, event.status), ('evt_1', 'pending'))
+        task.delay.assert_called_once_with(event.pk)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+    
+    def test_bad_signature_is_rejected(self):
+        """Test events signed with the wrong secret are refused and not stored."""
+        with patch('apps.payments.views.process_webhook_event') as task:
+            self.assertEqual(self.post_event('evt_1', secret='whsec_wrong').status_code, 400)
+        task.delay.assert_not_called()
+        self.assertFalse(WebhookEvent.objects.exists())
+    
+    def test_raw_body_is_verified_as_text(self):
+        """Test a signed bytes body, as read from ``request.body``, is verified over its text."""
+        payload = json.dumps({'id': 'evt_1', 'type': 'payment_intent.succeeded'})
+        verify_header = stripe.WebhookSignature.verify_header
+        with patch.object(stripe.WebhookSignature, 'verify_header', wraps=verify_header) as verify:
+            event = parse_webhook(payload.encode(), sign(payload, WEBHOOK_SECRET))
+        self.assertEqual(event['id'], 'evt_1')
+        self.assertEqual(verify.call_args.args[0], payload)
+    
+    def test_processing_updates_payment_and_order(self):
+        """Test an event settles the payment and order with one update each, exactly once."""
+        with patch('apps.payments.views.process_webhook_event'):
+            self.post_event('evt_1')
+        event = WebhookEvent.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(process_webhook_event(event.pk), 'processed')
+        updates = [query['sql'].split('"')[1] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(updates, ['payments_payment', 'orders_order', 'payments_webhookevent'])
+        self.assertIsNone(process_webhook_event(event.pk))
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual((self.payment.status, self.order.status), ('succeeded', 'processing'))
+    
+    def test_unknown_events_are_ignored(self):
+        """Test event types without a handler are recorded and marked ignored."""
+        with patch('apps.payments.views.process_webhook_event'):
+            self.post_event('evt_1', event_type='charge.refunded')
+        event = WebhookEvent.objects.get()
+        self.assertEqual(process_webhook_event(event.pk), 'ignored')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+    
+    def test_sweeper_queues_stale_events(self):
+        """Test the periodic task re-queues events left pending by a lost enqueue."""
+        with patch('apps.payments.views.process_webhook_event'):
+            self.post_event('evt_1')
+        event = WebhookEvent.objects.get()
+        with patch('apps.core.tasks.process_webhook_event') as task:
+            process_pending_webhook_events(older_than=0)
+        task.delay.assert_called_once_with(event.pk)
+    
+    def test_replay_command(self):
+        """Test the replay command stores each event id once and settles every payment."""
+        out = StringIO()
+        call_command('replay_webhooks', events=40, replay_rate=0.5, payments=5, threads=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('stored events: 20 (expected 20)', output)
+        self.assertIn('payments succeeded: 5/5', output)
+        self.assertIn('non-200: 0', output)
+
+
+@override_settings(STRIPE_CLIENT='apps.payments.fake.stripe')
+class TestPaymentVerification(TestCase):
+    """Tests for background payment verification and status polling."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='verify', password='verifypass123')
+        self.client.force_login(self.user)
+        self.order = Order.objects.create(
+            user=self.user,
+            total_amount=Decimal('25.00'),
+            shipping_address='1 Verify St',
+            shipping_city='Verify City',
+            shipping_postal_code='12345',
+            shipping_country='Verify Country'
+        )
+        intent = fake_stripe.PaymentIntent.create(amount=2500, currency='usd')
+        self.payment = Payment.objects.create(
+            order=self.order,
+            stripe_payment_intent_id=intent.id,
+            amount=self.order.total_amount
+        )
+        # Pending status polls queue verification; there is no broker here.
+        queue = patch('apps.payments.views.verify_payment')
+        queue.start()
+        self.addCleanup(queue.stop)
+    
+    def test_success_page_renders_without_calling_stripe(self):
+        """Test payment_success queues verification once and never blocks on Stripe."""
+        url = reverse('payment_success', args=[self.payment.id])
+        with patch('apps.payments.views.verify_payment') as task, \
+                patch.object(fake_stripe.PaymentIntent, 'retrieve') as retrieve:
+            response = self.client.get(url)
+            self.client.get(url)
+        retrieve.assert_not_called()
+        task.delay.assert_called_once_with(self.payment.id)
+        self.assertContains(response, 'Confirming Payment')
+        self.assertContains(response, reverse('payment_status', args=[self.payment.id]))
+    
+    def test_verify_payment_applies_intent_status(self):
+        """Test the service settles payments and orders from the intent status."""
+        intent_id = self.payment.stripe_payment_intent_id
+        fake_stripe.PaymentIntent.set_status(intent_id, 'processing')
+        self.assertEqual(verify_payment(self.payment.id), 'pending')
+        
+        fake_stripe.PaymentIntent.set_status(intent_id, 'succeeded')
+        self.assertEqual(verify_payment_task.apply(args=[self.payment.id]).get(), 'succeeded')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'processing')
+        
+        fake_stripe.PaymentIntent.set_status(intent_id, 'requires_payment_method')
+        self.assertEqual(verify_payment(self.payment.id), 'succeeded')
+    
+    def test_failed_intent_marks_payment_failed(self):
+        """Test a declined intent fails the payment and leaves the order pending."""
+        fake_stripe.PaymentIntent.set_status(self.payment.stripe_payment_intent_id, 'requires_payment_method')
+        self.assertEqual(verify_payment(self.payment.id), 'failed')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'pending')
+    
+    def test_status_endpoint(self):
+        """Test the status endpoint polls while pending and stops once settled."""
+        url = reverse('payment_status', args=[self.payment.id])
+        self.assertEqual(self.client.get(url).json(), {'status': 'pending'})
+        self.assertContains(self.client.get(url, HTTP_HX_REQUEST='true'), 'hx-trigger="load delay:2s"')
+        
+        Payment.objects.filter(pk=self.payment.pk).update(status='succeeded')
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertContains(response, 'Payment Successful!')
+        self.assertNotContains(response, 'hx-trigger')
+        
+        other = User.objects.create_user(username='intruder', password='intruderpass123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
 
+    
+    def test_polling_backs_off_and_stops(self):
+        """Test each poll asks for the next one later, and polling ends with a refresh prompt."""
+        url = reverse('payment_status', args=[self.payment.id])
+        response = self.client.get(url, {'poll': 1}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, f'{url}?poll=2')
+        response = self.client.get(url, {'poll': len(POLL_DELAYS) - 1}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, f'hx-trigger="load delay:{POLL_DELAYS[-1]}s"')
+        self.assertGreater(POLL_DELAYS[-1], POLL_DELAYS[0])
+        
+        response = self.client.get(url, {'poll': len(POLL_DELAYS)}, HTTP_HX_REQUEST='true')
+        self.assertNotContains(response, 'hx-get')
+        self.assertContains(response, 'Refresh this page')
+    
+    def test_polling_requeues_verification_once_it_gave_up(self):
+        """Test status polls share a running verification and queue another after it."""
+        url = reverse('payment_status', args=[self.payment.id])
+        with patch('apps.payments.views.verify_payment') as task:
+            self.client.get(reverse('payment_success', args=[self.payment.id]))
+            self.client.get(url, HTTP_HX_REQUEST='true')
+            self.assertEqual(task.delay.call_count, 1)
+            
+            cache.clear()
+            self.client.get(url, HTTP_HX_REQUEST='true')
+            self.assertEqual(task.delay.call_count, 2)
+            
+            Payment.objects.filter(pk=self.payment.pk).update(status='succeeded')
+            cache.clear()
+            self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertEqual(task.delay.call_count, 2)
 
+class TestStripeGateway(TestCase):
+    """Tests for the Stripe gateway's retries, idempotency and metrics."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='gateway', password='gatewaypass123')
+        self.order = Order.objects.create(
+            user=self.user,
+            total_amount=Decimal('12.50'),
+            shipping_address='1 Gateway St',
+            shipping_city='Gateway City',
+            shipping_postal_code='12345',
+            shipping_country='Gateway Country'
+        )
+        self.sleeps = []
+        self.gateway = StripeGateway(fake_stripe, max_retries=2, sleep=self.sleeps.append)
+    
+    def test_create_is_idempotent_per_order(self):
+        """Test repeated creates for one order return the same intent with an order-derived key."""
+        with patch.object(fake_stripe.PaymentIntent, 'create', wraps=fake_stripe.PaymentIntent.create) as create:
+            first = self.gateway.create_payment_intent(self.order)
+            second = self.gateway.create_payment_intent(self.order)
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(first.amount, 1250)
+        self.assertEqual(create.call_args.kwargs['idempotency_key'], f'ecommerce:order:{self.order.id}:payment_intent:1250:usd')
+    
+    def test_transient_errors_are_retried_with_jitter(self):
+        """Test connection errors are retried within the backoff cap and every attempt is timed."""
+        intent = fake_stripe.PaymentIntent.create(amount=100, currency='usd')
+        errors = [stripe.error.APIConnectionError('reset'), stripe.error.RateLimitError('slow down')]
+        with patch.object(fake_stripe.PaymentIntent, 'retrieve', side_effect=[*errors, intent]):
+            self.assertIs(self.gateway.retrieve_payment_intent(intent.id), intent)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= 0.25 and 0 <= self.sleeps[1] <= 0.5)
+        self.assertEqual(self.gateway.latency()['payment_intent.retrieve']['count'], 3)
+    
+    def test_retries_are_bounded_and_permanent_errors_are_not_retried(self):
+        """Test the last transient error is raised after max_retries and card errors fail at once."""
+        with patch.object(fake_stripe.PaymentIntent, 'retrieve', side_effect=stripe.error.APIConnectionError('down')):
+            with self.assertRaises(stripe.error.APIConnectionError):
+                self.gateway.retrieve_payment_intent('pi_down')
+        self.assertEqual(len(self.sleeps), 2)
+        
+        card_error = stripe.error.CardError('declined', None, 'card_declined')
+        with patch.object(fake_stripe.PaymentIntent, 'create', side_effect=card_error):
+            with self.assertRaises(stripe.error.CardError):
+                self.gateway.create_payment_intent(self.order)
+        self.assertEqual(len(self.sleeps), 2)
+    
+    def test_latency_histogram(self):
+        """Test latencies land in millisecond buckets with bucket-bound percentiles."""
+        histogram = self.gateway.histogram('payment_intent.create')
+        for seconds in (0.01, 0.02, 0.2, 30):
+            histogram.observe(seconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual((snapshot['buckets']['le_25'], snapshot['buckets']['le_250'], snapshot['buckets']['overflow']), (2, 1, 1))
+        self.assertEqual((snapshot['p50_ms'], snapshot['p95_ms']), (25, None))
+    
+    def test_latency_is_shared_across_processes(self):
+        """Test every gateway adds its calls to the cache-backed counters the command prints."""
+        cache.clear()
+        intent = fake_stripe.PaymentIntent.create(amount=100, currency='usd')
+        self.gateway.retrieve_payment_intent(intent.id)
+        StripeGateway(fake_stripe).retrieve_payment_intent(intent.id)
+        self.assertEqual(shared_latency()['payment_intent.retrieve']['count'], 2)
+        
+        out = StringIO()
+        call_command('stripe_latency', '--reset', stdout=out)
+        self.assertIn('payment_intent.retrieve: calls: 2', out.getvalue())
+        self.assertEqual(shared_latency()['payment_intent.retrieve']['count'], 0)
+    
+    @override_settings(STRIPE_CLIENT='stripe', STRIPE_CONNECT_TIMEOUT=2.0, STRIPE_READ_TIMEOUT=5.0)
+    def test_sdk_gets_pooled_client_with_timeouts(self):
+        """Test the real SDK is configured once with a shared session, bounded timeouts and no SDK retries."""
+        saved = stripe.default_http_client, stripe.max_network_retries, stripe.api_key
+        try:
+            gateway = get_gateway()
+            self.assertIs(gateway.client, stripe)
+            self.assertIs(get_gateway(), gateway)
+            self.assertEqual(stripe.default_http_client._timeout, (2.0, 5.0))
+            self.assertIsNotNone(stripe.default_http_client._session)
+            self.assertEqual(stripe.max_network_retries, 0)
+        finally:
+            stripe.default_http_client, stripe.max_network_retries, stripe.api_key = saved
+    
+    @override_settings(STRIPE_CLIENT='apps.payments.fake.stripe')
+    def test_create_payment_view_uses_gateway(self):
+        """Test checkout creates one intent per order through the configured client."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('payment_create', args=[self.order.id]))
+        self.assertEqual(response.status_code, 200)
+        payment = Payment.objects.get(order=self.order)
+        self.assertEqual(get_gateway().latency()['payment_intent.create']['count'], 1)
+        self.assertIs(get_gateway().client, fake_stripe)
+        self.assertTrue(payment.stripe_payment_intent_id.startswith('pi_fake_'))
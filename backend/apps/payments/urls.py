@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common.utils import for_server
 from . import views
 
 router = DefaultRouter()
@@ -8,6 +9,7 @@ router.register(r'payments', views.PaymentViewSet, basename='payment')
 urlpatterns = [
     path('create/<int:order_id>/', views.create_payment, name='payment_create'),
     path('success/<int:payment_id>/', views.payment_success, name='payment_success'),
+    path('status/<int:payment_id>/', for_server(views.payment_status, views.apayment_status), name='payment_status'),
     path('webhook/', views.stripe_webhook, name='stripe_webhook'),
     path('api/', include(router.urls)),
 ]
@@ -1,18 +1,34 @@
+import logging
 import stripe
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponse
+from django.utils.cache import patch_cache_control
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from apps.core.tasks import process_webhook_event, verify_payment
 from apps.orders.models import Order
+from common.mixins import EagerLoadingMixin
+from common.utils import arender
 from .models import Payment
 from .serializers import PaymentSerializer
+from .services import get_gateway, parse_webhook, record_webhook_event
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+logger = logging.getLogger(__name__)
+
+# A queued verification retries for about four minutes (see
+# ``verify_payment``); page views and status polls in that window share it.
+VERIFY_DEBOUNCE = 300
+
+# Seconds before each status poll: every 2 s for the first minute, then less
+# often. After the last one the page stops polling and asks for a refresh.
+POLL_DELAYS = (2,) * 30 + (5,) * 12 + (15,) * 8 + (30,) * 10
 
 
 @login_required
@@ -23,16 +39,15 @@ def create_payment(request, order_id):
         messages.info(request, 'Payment already exists for this order.')
         return redirect('order_detail', order_id=order.id)
     
-    if not settings.STRIPE_SECRET_KEY or settings.STRIPE_SECRET_KEY.startswith('sk_test_51QEXAMPLE'):
+    gateway = get_gateway()
+    if gateway.client is stripe and (
+        not settings.STRIPE_SECRET_KEY or settings.STRIPE_SECRET_KEY.startswith('sk_test_51QEXAMPLE')
+    ):
         messages.error(request, 'Stripe API keys are not configured. Please add your Stripe keys to the .env file and restart Docker with: docker-compose -f infrastructure/docker-compose.yml restart web')
         return redirect('order_detail', order_id=order.id)
     
     try:
-        intent = stripe.PaymentIntent.create(
-            amount=int(order.total_amount * 100),
-            currency='usd',
-            metadata={'order_id': order.id},
-        )
+        intent = gateway.create_payment_intent(order)
         
         payment = Payment.objects.create(
             order=order,
@@ -54,74 +69,109 @@ def create_payment(request, order_id):
         return redirect('order_detail', order_id=order.id)
 
 
+def queue_verification(payment_id):
+    """Queue a background Stripe check unless one is still running."""
+    try:
+        if not cache.add(f'payments:verify:{payment_id}', 1, VERIFY_DEBOUNCE):
+            return
+    except Exception:
+        logger.warning('Cache unavailable, queueing verification anyway', exc_info=True)
+    try:
+        verify_payment.delay(payment_id)
+    except Exception:
+        # The Stripe webhook still settles the payment.
+        logger.warning('Could not queue verification for payment %s', payment_id, exc_info=True)
+
+
+def status_context(request, payment):
+    """Context for the status partial, with the delay before the next poll (``None``: stop)."""
+    try:
+        poll = max(int(request.GET.get('poll', 0)), 0)
+    except ValueError:
+        poll = 0
+    return {
+        'payment': payment,
+        'next_poll': poll + 1,
+        'poll_delay': POLL_DELAYS[poll] if poll < len(POLL_DELAYS) else None,
+    }
+
+
 @login_required
 def payment_success(request, payment_id):
-    payment = get_object_or_404(Payment, id=payment_id, order__user=request.user)
-    
-    # Update payment and order status when payment succeeds
+    """Render from local state; a pending payment is verified in the background.
+
+    The page polls ``payment_status``, backing off, until the payment
+    settles or ``POLL_DELAYS`` runs out.
+    """
+    payment = get_object_or_404(
+        Payment.objects.select_related('order'), id=payment_id, order__user=request.user
+    )
     if payment.status == 'pending':
-        try:
-            # Verify payment with Stripe
-            intent = stripe.PaymentIntent.retrieve(payment.stripe_payment_intent_id)
-            if intent.status == 'succeeded':
-                payment.status = 'succeeded'
-                payment.save()
-                payment.order.status = 'processing'
-                payment.order.save()
-                messages.success(request, 'Payment successful! Your order is being processed.')
-            elif intent.status == 'requires_payment_method':
-                payment.status = 'failed'
-                payment.save()
-                messages.error(request, 'Payment failed. Please try again.')
-        except Exception as e:
-            messages.warning(request, f'Payment verification issue: {str(e)}')
+        queue_verification(payment.id)
     
-    context = {'payment': payment}
+    context = status_context(request, payment)
     return render(request, 'payments/success.html', context)
 
 
+@login_required
+def payment_status(request, payment_id):
+    """Current payment status: a partial for HTMX polling, JSON otherwise.
+
+    While the payment is pending, a verification is queued again once the
+    previous one has given up.
+    """
+    payment = get_object_or_404(
+        Payment.objects.only('id', 'order_id', 'status'), id=payment_id, order__user=request.user
+    )
+    if payment.status == 'pending':
+        queue_verification(payment.id)
+    if request.htmx:
+        return render(request, 'payments/partials/status.html', status_context(request, payment))
+    response = JsonResponse({'status': payment.status})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+async def apayment_status(request, payment_id):
+    """Async ``payment_status``, for the ``'asgi'`` server profile."""
+    user = await request.auser()
+    payment = await aget_object_or_404(
+        Payment.objects.only('id', 'order_id', 'status'), id=payment_id, order__user=user
+    )
+    if payment.status == 'pending':
+        await sync_to_async(queue_verification)(payment.id)
+    if request.htmx:
+        return await arender(request, 'payments/partials/status.html', status_context(request, payment))
+    response = JsonResponse({'status': payment.status})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @csrf_exempt
 def stripe_webhook(request):
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-    
+    """Verify, store and acknowledge a Stripe event; a worker applies it.
+
+    The request does a signature check and one INSERT whatever the event
+    type. A replayed event id hits the unique constraint and is acknowledged
+    without being stored or queued again.
+    """
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except ValueError:
-        return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError:
+        event = parse_webhook(request.body, request.META.get('HTTP_STRIPE_SIGNATURE'))
+    except (ValueError, stripe.error.SignatureVerificationError):
         return HttpResponse(status=400)
     
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
+    stored = record_webhook_event(event)
+    if stored is not None:
         try:
-            payment = Payment.objects.get(
-                stripe_payment_intent_id=payment_intent['id']
-            )
-            payment.status = 'succeeded'
-            payment.save()
-            payment.order.status = 'processing'
-            payment.order.save()
-        except Payment.DoesNotExist:
-            pass
-    
-    elif event['type'] == 'payment_intent.payment_failed':
-        payment_intent = event['data']['object']
-        try:
-            payment = Payment.objects.get(
-                stripe_payment_intent_id=payment_intent['id']
-            )
-            payment.status = 'failed'
-            payment.save()
-        except Payment.DoesNotExist:
-            pass
-    
+            process_webhook_event.delay(stored.pk)
+        except Exception:
+            # process_pending_webhook_events sweeps it up.
+            logger.warning('Could not queue webhook event %s', stored.stripe_event_id, exc_info=True)
     return HttpResponse(status=200)
 
 
-class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PaymentSerializer
 
     def get_queryset(self):
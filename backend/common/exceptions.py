@@ -1,3 +1,22 @@
 """Custom exception definitions for consistent error handling in APIs."""
 
 
+class CheckoutError(Exception):
+    """Raised when a cart cannot be turned into an order."""
+
+
+class InsufficientStockError(CheckoutError):
+    """Raised when a product cannot cover the quantity requested for it."""
+
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f'Insufficient stock for {product.name}.')
+
+
+class InvalidTransitionError(Exception):
+    """Raised when an order cannot move from its current status to the one requested."""
+
+    def __init__(self, current, target):
+        self.current = current
+        self.target = target
+        super().__init__(f'Cannot move an order from {current} to {target}.')
@@ -0,0 +1,54 @@
+import asyncio
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """WhiteNoise that can also run in an async middleware chain.
+
+    Upstream WhiteNoise is sync-only, so under ASGI every request, static or
+    not, would pass through the one thread Django keeps for sync code. That
+    serialises the whole worker. Without autorefresh, finding a file is a
+    dictionary lookup and is fine to do on the event loop.
+    """
+
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class ConcurrencyLimitMiddleware:
+    """ASGI middleware admitting at most ``limit`` HTTP requests at a time.
+
+    Django gives every async request its own thread for sync work (rendering,
+    sessions, sync middleware). With hundreds of requests in flight those
+    threads contend for the GIL and starve the event loop, so throughput
+    collapses; requests over the limit wait here as cheap coroutines instead.
+    """
+
+    def __init__(self, app, limit):
+        self.app = app
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        async with self.semaphore:
+            return await self.app(scope, receive, send)
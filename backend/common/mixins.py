@@ -0,0 +1,99 @@
+"""Reusable DRF view mixins."""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.http import Http404
+from rest_framework.relations import ManyRelatedField
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def _relations(model, serializer, prefix=''):
+    """Collect ``select_related`` paths and ``prefetch_related`` lookups for ``serializer``."""
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = f'{prefix}{field.source}'
+        if isinstance(field, ListSerializer):
+            related = model_field.related_model._default_manager.all()
+            prefetch.append(Prefetch(path, queryset=eager_load(related, field.child)))
+        elif isinstance(field, ManyRelatedField):
+            prefetch.append(path)
+        elif isinstance(field, BaseSerializer) and (model_field.many_to_one or model_field.one_to_one):
+            select.append(path)
+            nested_select, nested_prefetch = _relations(model_field.related_model, field, f'{path}__')
+            select.extend(nested_select)
+            prefetch.extend(nested_prefetch)
+    return select, prefetch
+
+
+def eager_load(queryset, serializer):
+    """Apply the eager loading ``serializer`` (a class or instance) needs to ``queryset``.
+
+    Nested single-object serializers on forward relations become
+    ``select_related`` joins; nested ``many=True`` serializers become
+    ``Prefetch`` objects whose querysets are optimized the same way, so
+    arbitrarily deep nesting is loaded in a fixed number of queries.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    select, prefetch = _relations(queryset.model, serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class EagerLoadingMixin:
+    """Eager-load whatever the view's serializer nests.
+
+    Applied in ``filter_queryset`` so it composes with custom ``get_queryset``
+    implementations and covers list, retrieve and any action using
+    ``get_object()``.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return eager_load(queryset, self.get_serializer_class())
+
+
+class RowSerializerMixin:
+    """Serve ``list`` and ``retrieve`` from a ``RowSerializer`` over ``values()`` rows.
+
+    Set ``row_serializer`` on the viewset; ``serializer_class`` is still used
+    for writes, schemas and any action that does not opt in. Object-level
+    permissions are not checked on the row path.
+    """
+
+    row_serializer = None
+
+    def get_row_queryset(self):
+        return self.row_serializer.values(self.filter_queryset(self.get_queryset()))
+
+    def serialize_rows(self, rows):
+        return self.row_serializer.serialize(rows, self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_queryset()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page))
+        return Response(self.serialize_rows(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = self.get_row_queryset().filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).first()
+        if row is None:
+            raise Http404
+        return Response(self.serialize_rows([row])[0])
@@ -0,0 +1,137 @@
+"""Shared DRF pagination classes."""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over ``(created_at, id)``.
+
+    Each page is fetched with a range condition on the composite index
+    instead of an ``OFFSET``, so deep pages cost the same as the first one.
+    The total ``count`` is included unless the client passes ``?count=false``.
+    Pages may hold model instances or ``values()`` rows.
+
+    Keyset paging needs a stable ``(created_at, id)`` ordering; when the
+    queryset is ordered any other way (``?ordering=price``, ranked search
+    results) pagination falls back to ``PageNumberPagination``.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    keyset_fields = ('created_at', 'id')
+    fallback_class = PageNumberPagination
+
+    def __init__(self):
+        self.fallback = None
+
+    def keyset_direction(self, queryset):
+        """Return ``'-'`` or ``''`` if ``queryset`` is ordered by the keyset, else ``None``."""
+        order_by = list(queryset.query.order_by or queryset.model._meta.ordering)
+        for sign in ('-', ''):
+            fields = [f'{sign}{field}' for field in self.keyset_fields]
+            if order_by in (fields, fields[:1]):
+                return sign
+        return None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            created_at, pk = obj['created_at'], obj['id']
+        else:
+            created_at, pk = obj.created_at, obj.pk
+        raw = f'{created_at.isoformat()}|{pk}|{int(reverse)}'
+        cursor = urlsafe_b64encode(raw.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk, reverse = urlsafe_b64decode(encoded.encode()).decode().split('|')
+            position = (parse_datetime(created_at), int(pk), reverse == '1')
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+        if position[0] is None:
+            raise NotFound('Invalid cursor')
+        return position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        sign = self.keyset_direction(queryset)
+        if sign is None:
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() not in ('false', '0'):
+            self.count = queryset.count()
+
+        cursor = self.decode_cursor(request)
+        descending = sign == '-'
+        reverse = bool(cursor and cursor[2])
+        # Walking backwards flips the scan direction; the page is re-reversed below.
+        scan_descending = descending != reverse
+        if cursor:
+            created_at, pk, _ = cursor
+            if scan_descending:
+                after = Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+            else:
+                after = Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(pk__gt=pk))
+            queryset = queryset.filter(after)
+
+        prefix = '-' if scan_descending else ''
+        rows = list(queryset.order_by(f'{prefix}created_at', f'{prefix}pk')[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return self.fallback_class().get_paginated_response_schema(schema)
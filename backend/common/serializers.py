@@ -0,0 +1,149 @@
+"""Compiled read-only serializers for hot read paths."""
+
+from decimal import Decimal
+from functools import cached_property
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, fields
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+# Fields whose representation of a database value is the value itself.
+PASSTHROUGH_FIELDS = (
+    fields.BooleanField, fields.CharField, fields.IntegerField,
+    fields.ReadOnlyField, PrimaryKeyRelatedField,
+)
+
+
+def datetime_converter(field):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601 or hasattr(field, 'timezone'):
+        return None
+
+    def bind(context):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+        def convert(value):
+            if tz is not None and timezone.is_aware(value):
+                value = value.astimezone(tz)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+    return bind
+
+
+def decimal_converter(field):
+    coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce or field.localize or field.normalize_output or field.decimal_places is None:
+        return None
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    return lambda context: lambda value: f'{value.quantize(exponent):f}'
+
+
+def file_converter(field, model_field):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda context: lambda value: value or None
+    storage = model_field.storage
+
+    def bind(context):
+        request = context.get('request')
+        host = request.build_absolute_uri('/')[:-1] if request is not None else ''
+
+        def convert(value):
+            if not value:
+                return None
+            url = storage.url(value)
+            return host + url if url.startswith('/') else url
+        return convert
+    return bind
+
+
+class RowSerializer:
+    """Produce a ``ModelSerializer``'s read output straight from ``values()`` rows.
+
+    The serializer's readable fields are inspected once and compiled into a
+    flat plan of ``(key, column, converter)`` steps; nested serializers on
+    forward foreign keys become joined columns. Serializing a row is then a
+    dict build with no model instances and no per-field
+    ``to_representation`` dispatch, while the output keeps the declared
+    serializer's shape. The declared serializer stays in charge of writes.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def compiled(self):
+        columns = []
+        plan = self._compile(self.serializer_class(), self.serializer_class.Meta.model, '', columns)
+        return plan, columns
+
+    @property
+    def columns(self):
+        return self.compiled[1]
+
+    def _compile(self, serializer, model, prefix, columns):
+        plan = []
+        for key, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f'{key}: dotted and "*" sources cannot be read from rows.')
+            column = f'{prefix}{field.source}'
+            columns.append(column)
+
+            model_field = model._meta.get_field(field.source)
+            if isinstance(field, BaseSerializer):
+                if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                    raise ImproperlyConfigured(f'{key}: only forward foreign keys can be nested.')
+                nested = self._compile(field, model_field.related_model, f'{column}__', columns)
+                plan.append((key, column, None, nested))
+            else:
+                plan.append((key, column, self._converter(field, model_field), None))
+        return plan
+
+    def _converter(self, field, model_field):
+        converter = None
+        if isinstance(field, fields.DateTimeField):
+            converter = datetime_converter(field)
+        elif isinstance(field, fields.DecimalField):
+            converter = decimal_converter(field)
+        elif isinstance(field, fields.FileField):
+            return file_converter(field, model_field)
+        elif isinstance(field, PASSTHROUGH_FIELDS):
+            return None
+        # Anything without a fast path keeps DRF's own conversion.
+        return converter or (lambda context: field.to_representation)
+
+    def _bind(self, plan, context):
+        steps = []
+        for key, column, converter, nested in plan:
+            if nested is not None:
+                steps.append((key, column, None, self._bind(nested, context)))
+            else:
+                steps.append((key, column, converter(context) if converter else None, None))
+
+        def build(row):
+            data = {}
+            for key, column, convert, nested in steps:
+                value = row[column]
+                if value is None:
+                    data[key] = None
+                elif nested is not None:
+                    data[key] = nested(row)
+                elif convert is None:
+                    data[key] = value
+                else:
+                    data[key] = convert(value)
+            return data
+        return build
+
+    def values(self, queryset):
+        """Return ``queryset`` as ``values()`` rows carrying every column the plan reads."""
+        return queryset.values(*self.columns)
+
+    def serialize(self, rows, context=None):
+        """Serialize an iterable of rows from ``values()``."""
+        build = self._bind(self.compiled[0], context or {})
+        return [build(row) for row in rows]
@@ -1,3 +1,35 @@
 """Utility functions placeholder for formatting, money helpers, etc."""
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+from django.template.loader import render_to_string
 
+# Rendering runs context processors that read the session, the user and the
+# database synchronously, so async views render in a worker thread.
+arender = sync_to_async(render)
+arender_to_string = sync_to_async(render_to_string)
+
+
+def get_page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return 1
+
+
+def get_page_url(request, page):
+    params = request.GET.copy()
+    params['page'] = page
+    return f'?{params.urlencode()}'
+
+
+def for_server(sync_view, async_view):
+    """Return the variant of a view that suits ``SERVER_PROFILE``.
+
+    Under ``'asgi'`` (uvicorn workers) the async variant is used, so a
+    request waiting on the cache or database does not hold a worker; under
+    ``'wsgi'`` the sync one, which avoids running an event loop per request.
+    Chosen when the URLconf is imported.
+    """
+    return async_view if settings.SERVER_PROFILE == 'asgi' else sync_view
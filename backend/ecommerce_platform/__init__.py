@@ -1,3 +1,5 @@
 """Project root package for the Django monolith (Architectural Design requirement)."""
 
+from .celery import app as celery_app
 
+__all__ = ('celery_app',)
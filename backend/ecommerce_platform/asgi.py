@@ -1,9 +1,13 @@
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_platform.settings.local')
 
 application = get_asgi_application()
 
+if settings.ASGI_MAX_CONCURRENCY:
+    from common.middleware import ConcurrencyLimitMiddleware
 
+    application = ConcurrencyLimitMiddleware(application, settings.ASGI_MAX_CONCURRENCY)
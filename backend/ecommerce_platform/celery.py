@@ -0,0 +1,9 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_platform.settings.local')
+
+app = Celery('ecommerce_platform')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks(['apps.core'])
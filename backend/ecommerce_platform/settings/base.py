@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     'rest_framework',
     'django_htmx',
     'allauth',
@@ -39,7 +40,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'common.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,12 +65,24 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'apps.catalog.context_processors.categories',
+                'apps.orders.context_processors.cart_summary',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'ecommerce_platform.wsgi.application'
+ASGI_APPLICATION = 'ecommerce_platform.asgi.application'
+
+# How the app is served, read by gunicorn.conf.py and the URLconfs:
+#   'wsgi' - gunicorn sync workers and sync views
+#   'asgi' - gunicorn with uvicorn workers, and async variants of the hot
+#            catalog, cart and payment status views (common.utils.for_server)
+SERVER_PROFILE = os.environ.get('SERVER_PROFILE', 'wsgi')
+
+# Requests each uvicorn worker processes at once; the rest queue on its event
+# loop. 0 disables the limit.
+ASGI_MAX_CONCURRENCY = int(os.environ.get('ASGI_MAX_CONCURRENCY', '16'))
 
 DATABASES = {
     'default': {
@@ -137,3 +150,101 @@ REST_FRAMEWORK = {
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '').strip().replace('\n', '').replace('\r', '')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '').strip().replace('\n', '').replace('\r', '')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '').strip().replace('\n', '').replace('\r', '')
+
+# 'stripe' for the SDK, or a dotted path such as 'apps.payments.fake.stripe' to run offline
+STRIPE_CLIENT = os.environ.get('STRIPE_CLIENT', 'stripe')
+
+# Stripe gateway (apps/payments/services/gateway.py). Timeouts are in
+# seconds; retries are per call, with jittered backoff. Give each
+# environment sharing a Stripe account its own idempotency namespace.
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get('STRIPE_CONNECT_TIMEOUT', '3'))
+STRIPE_READ_TIMEOUT = float(os.environ.get('STRIPE_READ_TIMEOUT', '10'))
+STRIPE_MAX_RETRIES = int(os.environ.get('STRIPE_MAX_RETRIES', '2'))
+STRIPE_POOL_SIZE = int(os.environ.get('STRIPE_POOL_SIZE', '10'))
+STRIPE_IDEMPOTENCY_NAMESPACE = os.environ.get('STRIPE_IDEMPOTENCY_NAMESPACE', 'ecommerce')
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Redis when REDIS_URL is configured, otherwise a per-process memory cache.
+# Short socket timeouts keep request latency bounded if Redis goes away;
+# catalog cache reads fall back to the database on errors.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ecommerce',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'socket_connect_timeout': 0.5,
+                'socket_timeout': 0.5,
+            },
+        },
+        # Sessions (and so carts) get their own alias so they can live on a
+        # Redis instance that never evicts; expiry is set per session.
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('SESSION_REDIS_URL', REDIS_URL),
+            'KEY_PREFIX': 'ecommerce',
+            'OPTIONS': {
+                'socket_connect_timeout': 0.5,
+                'socket_timeout': 0.5,
+            },
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_PREFIX': 'ecommerce',
+            'TIMEOUT': 300,
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sessions',
+            'KEY_PREFIX': 'ecommerce',
+        },
+    }
+
+# Where sessions, and the carts inside them, are stored:
+#   'redis'     - only in the 'sessions' cache; no database writes per cart change
+#   'cached_db' - read through the 'sessions' cache, written to both; survives a
+#                 Redis flush and falls back to the database if Redis is down
+#   'db'        - the database only (Django's default)
+# Defaults to 'redis' when REDIS_URL is set. Without Redis the 'sessions'
+# alias is per-process memory, so keep 'db' there unless running one process.
+SESSION_STORE = os.environ.get('SESSION_STORE', 'redis' if os.environ.get('REDIS_URL') else 'db')
+SESSION_ENGINES = {
+    'redis': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STORE]
+SESSION_CACHE_ALIAS = 'sessions'
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
+CELERY_TASK_IGNORE_RESULT = True
+# Run tasks in-process instead of queueing them (no worker needed locally)
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-stock-reservations': {
+        'task': 'apps.core.tasks.release_expired_stock_reservations',
+        'schedule': 60.0,
+    },
+    'process-pending-webhook-events': {
+        'task': 'apps.core.tasks.process_pending_webhook_events',
+        'schedule': 60.0,
+    },
+}
+
+# Dotted path to a catalog search backend, or 'auto' to choose by database
+CATALOG_SEARCH_BACKEND = os.environ.get('CATALOG_SEARCH_BACKEND', 'auto')
+
+# Stream the product list page so the layout flushes before product rows are read
+CATALOG_STREAM_PRODUCT_LIST = os.environ.get('CATALOG_STREAM_PRODUCT_LIST', 'False') == 'True'
+
+# Widths in pixels of the WebP/JPEG thumbnails generated for product uploads
+CATALOG_THUMBNAIL_WIDTHS = [320, 640, 960]
+
+# Seconds a cart holds stock before the sweeper releases it
+STOCK_RESERVATION_TTL = int(os.environ.get('STOCK_RESERVATION_TTL', '900'))
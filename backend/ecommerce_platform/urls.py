@@ -13,6 +13,7 @@ urlpatterns = [
     path('api/orders/', include('apps.orders.urls')),
     path('payments/', include('apps.payments.urls')),
     path('api/payments/', include('apps.payments.urls')),
+    path('api/core/', include('apps.core.urls')),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,21 @@
+"""Gunicorn settings; the worker type follows the ``SERVER_PROFILE`` setting.
+
+Run ``gunicorn`` from ``backend/`` (it picks this file up by default).
+``GUNICORN_WORKERS`` and ``GUNICORN_BIND`` override the defaults.
+"""
+
+import importlib
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_platform.settings.local')
+profile = getattr(importlib.import_module(os.environ['DJANGO_SETTINGS_MODULE']), 'SERVER_PROFILE', 'wsgi')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+
+if profile == 'asgi':
+    wsgi_app = 'ecommerce_platform.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'ecommerce_platform.wsgi:application'
+    worker_class = 'sync'